@@ -0,0 +1,589 @@
+import hashlib
+import json
+from multiprocessing import shared_memory
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Tuple, Union
+import numpy as np
+
+import utils as ut
+
+
+# Newton iteration of calculate_qcp_max_eigenvalues(): relative precision and max iterations
+qcp_eigenvalue_precision = 1e-11
+qcp_max_iterations = 50
+
+# Approximate memory of calculate_rmsd_block() per pair: covariances and QCP temporaries, float64.
+rmsd_block_bytes_per_pair = 400
+
+# Progress of calculate_rmsd_matrix_on_disk(): "x.npy" -> "x.npy.molli_manifest.json"
+rmsd_matrix_manifest_file_suffix = ".molli_manifest.json"
+
+# Increase when the format of the manifest or matrix file changes: old files are then recomputed.
+rmsd_matrix_manifest_version = 1
+
+
+def center_coords(coords: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+  '''
+    coords: (..., num_atoms, 3)
+    Returns (centered coords, centroids (..., 1, 3))
+  '''
+  centroids = np.mean(coords, axis=-2, keepdims=True)
+  return coords - centroids, centroids
+
+
+def calculate_rotation_matrices(
+                                coords: np.ndarray,
+                                target_coords: np.ndarray
+                              ) -> np.ndarray:
+  '''
+    Kabsch algorithm for a batch of structures, both inputs centered:
+      coords: (..., num_atoms, 3), target_coords: (num_atoms, 3) or (..., num_atoms, 3)
+    Returns rotation matrices R (..., 3, 3) that minimize rmsd of coords @ R.T and target_coords.
+
+    Covariance matrices are computed with one einsum and decomposed with one batched svd.
+  '''
+  covariances = np.einsum("...ni,...nj->...ij", coords, target_coords)
+  u, _, vt = np.linalg.svd(covariances)
+
+  # reflection correction: det(R) = +1
+  signs = np.sign(np.linalg.det(u) * np.linalg.det(vt))
+  signs = np.where(signs == 0, 1.0, signs)
+  d = np.ones(u.shape[:-1])
+  d[..., -1] = signs
+
+  # R = V @ diag(d) @ U.T
+  return np.einsum("...ki,...k,...jk->...ij", vt, d, u)
+
+
+def align_coords(
+                  target_coords: np.ndarray,
+                  coords: np.ndarray
+                ) -> Dict[str, np.ndarray]:
+  '''
+    Aligns coords with target_coords, based on min rmsd:
+    same result as ase.build.minimize_rotation_and_translation(), without periodic boundary conditions.
+      target_coords: (num_atoms, 3)
+      coords: (num_atoms, 3) or stack of structures (num_structures, num_atoms, 3)
+
+    Returns Dictionary {
+      "coords": aligned coordinates, same shape as coords,
+      "rotations": rotation matrices (3, 3) or (num_structures, 3, 3),
+    }
+    aligned = (coords - centroid) @ rotation.T + target centroid
+  '''
+  target_coords = np.asarray(target_coords, dtype=float)
+  coords = np.asarray(coords, dtype=float)
+
+  target_centered, target_centroid = center_coords(target_coords)
+  centered, _ = center_coords(coords)
+
+  rotations = calculate_rotation_matrices(coords=centered, target_coords=target_centered)
+
+  return {
+    "coords": np.matmul(centered, np.swapaxes(rotations, -1, -2)) + target_centroid,
+    "rotations": rotations,
+  }
+
+
+def calculate_qcp_max_eigenvalues(
+                                  covariances: np.ndarray,
+                                  e0: np.ndarray
+                                ) -> np.ndarray:
+  '''
+    Quaternion characteristic polynomial (QCP, Theobald 2005, Liu et al. 2010):
+    largest eigenvalue of 4x4 key matrix of each inner product matrix in covariances (..., 3, 3),
+    found by Newton iteration on the characteristic polynomial, starting from e0 = (|x|^2 + |y|^2) / 2.
+    Returns np.ndarray (...), same as s1 + s2 + sign(det(H)) * s3 of calculate_rmsd_block().
+  '''
+  sxx, sxy, sxz = covariances[..., 0, 0], covariances[..., 0, 1], covariances[..., 0, 2]
+  syx, syy, syz = covariances[..., 1, 0], covariances[..., 1, 1], covariances[..., 1, 2]
+  szx, szy, szz = covariances[..., 2, 0], covariances[..., 2, 1], covariances[..., 2, 2]
+
+  sxx2, syy2, szz2 = sxx * sxx, syy * syy, szz * szz
+  sxy2, syz2, sxz2 = sxy * sxy, syz * syz, sxz * sxz
+  syx2, szy2, szx2 = syx * syx, szy * szy, szx * szx
+
+  syzszymsyyszz2 = 2.0 * (syz * szy - syy * szz)
+  sxx2syy2szz2syz2szy2 = syy2 + szz2 - sxx2 + syz2 + szy2
+  sxy2sxz2syx2szx2 = sxy2 + sxz2 - syx2 - szx2
+
+  sxzpszx, syzpszy, sxypsyx = sxz + szx, syz + szy, sxy + syx
+  syzmszy, sxzmszx, sxymsyx = syz - szy, sxz - szx, sxy - syx
+  sxxpsyy, sxxmsyy = sxx + syy, sxx - syy
+
+  # characteristic polynomial: x^4 + c2 * x^2 + c1 * x + c0
+  c2 = -2.0 * (sxx2 + syy2 + szz2 + sxy2 + syx2 + sxz2 + szx2 + syz2 + szy2)
+  c1 = 8.0 * (sxx * syz * szy + syy * szx * sxz + szz * sxy * syx \
+              - sxx * syy * szz - syz * szx * sxy - szy * syx * sxz)
+  c0 = sxy2sxz2syx2szx2 * sxy2sxz2syx2szx2 \
+        + (sxx2syy2szz2syz2szy2 + syzszymsyyszz2) * (sxx2syy2szz2syz2szy2 - syzszymsyyszz2) \
+        + (-sxzpszx * syzmszy + sxymsyx * (sxxmsyy - szz)) * (-sxzmszx * syzpszy + sxymsyx * (sxxmsyy + szz)) \
+        + (-sxzpszx * syzpszy - sxypsyx * (sxxpsyy - szz)) * (-sxzmszx * syzmszy - sxypsyx * (sxxpsyy + szz)) \
+        + (sxypsyx * syzpszy + sxzpszx * (sxxmsyy + szz)) * (-sxymsyx * syzmszy + sxzpszx * (sxxpsyy + szz)) \
+        + (sxypsyx * syzmszy + sxzmszx * (sxxmsyy - szz)) * (-sxymsyx * syzpszy + sxzmszx * (sxxpsyy - szz))
+
+  res = np.array(e0, dtype=float, copy=True)
+  for _ in range(qcp_max_iterations):
+    x2 = res * res
+    b = (x2 + c2) * res
+    a = b + c1
+    denominator = 2.0 * x2 * res + b + a
+    delta = np.divide(a * res + c0, denominator, out=np.zeros_like(res), where=denominator != 0)
+    res -= delta
+    if np.all(np.abs(delta) <= np.abs(qcp_eigenvalue_precision * res)):
+      break
+
+  return res
+
+
+def calculate_rmsd_qcp(
+                        coords1: np.ndarray,
+                        coords2: np.ndarray
+                      ) -> Union[float, np.ndarray]:
+  '''
+    Rmsd after alignment of coords1 and coords2 by QCP, aligned coordinates are not built:
+      (num_atoms, 3) and (num_atoms, 3): returns float
+      (num_atoms, 3) and (num_structures, num_atoms, 3), or both stacked: returns np.ndarray (num_structures,)
+    Same accuracy as calculate_rmsd_block(), i.e. not exact for (nearly) identical structures.
+  '''
+  centered1, _ = center_coords(np.asarray(coords1, dtype=float))
+  centered2, _ = center_coords(np.asarray(coords2, dtype=float))
+  num_atoms = centered1.shape[-2]
+
+  covariances = np.einsum("...ni,...nj->...ij", centered1, centered2)
+  e0 = (np.sum(centered1**2, axis=(-2, -1)) + np.sum(centered2**2, axis=(-2, -1))) / 2.0
+  e0 = np.broadcast_to(e0, covariances.shape[:-2])
+
+  msd = 2.0 * (e0 - calculate_qcp_max_eigenvalues(covariances=covariances, e0=e0)) / num_atoms
+  res = np.sqrt(np.maximum(msd, 0.0))
+
+  return float(res) if res.ndim == 0 else res
+
+
+def calculate_rmsd_block(
+                          centered1: np.ndarray,
+                          sq_norms1: np.ndarray,
+                          centered2: np.ndarray,
+                          sq_norms2: np.ndarray
+                        ) -> np.ndarray:
+  '''
+    Rmsd after alignment of every structure in centered1 (b, num_atoms, 3)
+    with every structure in centered2 (m, num_atoms, 3), sq_norms: sum of squared centered coords.
+    Returns np.ndarray (b, m)
+
+    Aligned coordinates are not built: msd = (|x|^2 + |y|^2 - 2 * lambda_max) / num_atoms,
+    lambda_max = s1 + s2 + sign(det(H)) * s3, where s1 >= s2 >= s3 are singular values of covariance matrix H,
+    found by QCP, see calculate_qcp_max_eigenvalues().
+    Because of the subtraction, absolute error grows as rmsd goes to 0: about 1e-13 at rmsd 0.01,
+    about 1e-9 at rmsd 1e-6 and about 1e-7 for identical structures (coordinates of a few Angstroms).
+    Use align_coords() (Kabsch) where small rmsd values must be exact.
+  '''
+  b, num_atoms, _ = centered1.shape
+  m = centered2.shape[0]
+
+  # all covariance matrices of the block with one matrix product: (b*3, n) @ (n, m*3)
+  covariances = np.matmul(
+                    centered1.transpose(0, 2, 1).reshape(b * 3, num_atoms),
+                    centered2.transpose(1, 0, 2).reshape(num_atoms, m * 3)
+                  ).reshape(b, 3, m, 3).transpose(0, 2, 1, 3)
+
+  e0 = (sq_norms1[:, None] + sq_norms2[None, :]) / 2.0
+  msd = 2.0 * (e0 - calculate_qcp_max_eigenvalues(covariances=covariances, e0=e0)) / num_atoms
+
+  return np.sqrt(np.maximum(msd, 0.0))
+
+
+def calculate_rmsd_many_to_many(
+                                coords1: np.ndarray,
+                                coords2: np.ndarray,
+                                max_block_pairs: int=2**18
+                              ) -> np.ndarray:
+  '''
+    Rmsd after alignment of every structure in coords1 (m1, num_atoms, 3)
+    with every structure in coords2 (m2, num_atoms, 3).
+    Returns np.ndarray (m1, m2)
+
+    max_block_pairs: rows of coords1 are processed in blocks of about that many pairs.
+  '''
+  centered1, _ = center_coords(np.asarray(coords1, dtype=float))
+  centered2, _ = center_coords(np.asarray(coords2, dtype=float))
+  sq_norms1 = np.sum(centered1**2, axis=(1, 2))
+  sq_norms2 = np.sum(centered2**2, axis=(1, 2))
+
+  num_rows, num_cols = len(centered1), len(centered2)
+  res = np.zeros((num_rows, num_cols))
+  block_size = max(1, max_block_pairs // max(num_cols, 1))
+  for i0 in range(0, num_rows, block_size):
+    i1 = min(i0 + block_size, num_rows)
+    res[i0:i1] = calculate_rmsd_block(centered1[i0:i1], sq_norms1[i0:i1], centered2, sq_norms2)
+
+  return res
+
+
+def calculate_rmsd_matrix_rows(
+                                centered: np.ndarray,
+                                sq_norms: np.ndarray,
+                                res: np.ndarray,
+                                row_start: int,
+                                row_end: int,
+                                max_block_pairs: int=2**18,
+                                full_rows: bool=False
+                              ) -> None:
+  '''
+    Fills rows row_start..row_end of the upper triangle of calculate_rmsd_matrix() into res,
+    full (m, m) matrix, or condensed if res.ndim == 1.
+    Rows are processed in blocks of about max_block_pairs pairs.
+
+    full_rows: rows of full matrix res are computed completely, incl. lower triangle,
+      i.e. twice the pairs, but res is written row by row, e.g. disk-backed np.memmap.
+  '''
+  num_structures = len(centered)
+
+  if full_rows:
+    block_size = max(1, max_block_pairs // max(num_structures, 1))
+    for i0 in range(row_start, row_end, block_size):
+      i1 = min(i0 + block_size, row_end)
+      values = calculate_rmsd_block(centered[i0:i1], sq_norms[i0:i1], centered, sq_norms)
+      values[np.arange(i1 - i0), np.arange(i0, i1)] = 0.0
+      res[i0:i1] = values
+    return
+
+  row_end = min(row_end, num_structures - 1)
+
+  i0 = row_start
+  while i0 < row_end:
+    # rows i0..i1 against columns i0+1..m: block grows towards the end of the upper triangle
+    num_cols = num_structures - i0 - 1
+    i1 = min(i0 + max(1, max_block_pairs // num_cols), row_end)
+    values = calculate_rmsd_block(centered[i0:i1], sq_norms[i0:i1], centered[(i0 + 1):], sq_norms[(i0 + 1):])
+
+    for i in range(i0, i1):
+      row = values[i - i0, (i - i0):]
+      if res.ndim == 1:
+        start = i * num_structures - i * (i + 1) // 2
+        res[start:(start + len(row))] = row
+      else:
+        res[i, (i + 1):] = row
+        res[(i + 1):, i] = row
+
+    i0 = i1
+
+
+def calculate_rmsd_matrix_tile(task: Dict) -> Tuple[int, int]:
+  '''
+    Worker of calculate_rmsd_matrix() and calculate_rmsd_matrix_on_disk():
+    attaches to shared memory or disk-backed arrays of the task, see attach_shared_array(),
+    and fills rows task["row_start"]..task["row_end"].
+  '''
+  handles = []
+  arrays = {}
+  try:
+    for key in ["centered", "sq_norms", "res"]:
+      arrays[key], handle = attach_shared_array(task[key])
+      handles.append(handle)
+
+    calculate_rmsd_matrix_rows(
+                                centered=arrays["centered"],
+                                sq_norms=arrays["sq_norms"],
+                                res=arrays["res"],
+                                row_start=task["row_start"],
+                                row_end=task["row_end"],
+                                max_block_pairs=task["max_block_pairs"],
+                                full_rows=task.get("full_rows", False)
+                              )
+
+    if isinstance(arrays["res"], np.memmap):
+      arrays["res"].flush()
+  finally:
+    # views of the shared memory must be released before close
+    arrays.clear()
+    for handle in handles:
+      if handle != None:
+        handle.close()
+
+  return task["row_start"], task["row_end"]
+
+
+def split_upper_triangle_rows(
+                              num_structures: int,
+                              num_tiles: int
+                            ) -> List[Tuple[int, int]]:
+  '''
+    Splits rows of the upper triangle of (num_structures, num_structures) matrix
+    into (row_start, row_end) tiles with about the same number of pairs:
+    first rows are longer, so first tiles have fewer rows.
+  '''
+  num_rows = max(num_structures - 1, 0)
+  pairs_cumulative = np.cumsum(np.arange(num_rows, 0, -1))
+  if num_rows == 0:
+    return []
+
+  num_tiles = max(1, min(num_tiles, num_rows))
+  targets = pairs_cumulative[-1] * np.arange(1, num_tiles) / num_tiles
+  boundaries = [0] + sorted(set((np.searchsorted(pairs_cumulative, targets) + 1).tolist())) + [num_rows]
+
+  return [(r0, r1) for r0, r1 in zip(boundaries[:-1], boundaries[1:]) if r1 > r0]
+
+
+def create_shared_array(arr: np.ndarray) -> Tuple[np.ndarray, shared_memory.SharedMemory, Dict]:
+  '''
+    Copies arr into new shared memory block.
+    Returns (array backed by shared memory, shared memory handle, spec for attach_shared_array()).
+    Caller must close() and unlink() the handle.
+  '''
+  handle = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+  res = np.ndarray(arr.shape, dtype=arr.dtype, buffer=handle.buf)
+  res[...] = arr
+
+  spec = {
+    "name": handle.name,
+    "shape": arr.shape,
+    "dtype": arr.dtype.str,
+  }
+
+  return res, handle, spec
+
+
+def attach_shared_array(spec: Dict) -> Tuple[np.ndarray, Union[shared_memory.SharedMemory, None]]:
+  '''
+    Array in shared memory created by create_shared_array(), without copying.
+    Returns (array, shared memory handle), caller must close() the handle after array is not used.
+
+    spec with "file_path" instead of "name": disk-backed np.memmap opened for writing, handle is None.
+  '''
+  if "file_path" in spec:
+    return np.memmap(spec["file_path"], dtype=spec["dtype"], mode="r+", shape=tuple(spec["shape"])), None
+
+  handle = shared_memory.SharedMemory(name=spec["name"])
+  return np.ndarray(spec["shape"], dtype=spec["dtype"], buffer=handle.buf), handle
+
+
+def calculate_rmsd_matrix(
+                          coords: np.ndarray,
+                          condensed: bool=False,
+                          max_block_pairs: int=2**18,
+                          workers: int=1
+                        ) -> np.ndarray:
+  '''
+    Symmetric matrix of rmsd after alignment between all structures in coords (m, num_atoms, 3).
+    Only the upper triangle is computed, rows in blocks of about max_block_pairs pairs.
+
+    workers > 1: centered coordinates and result are placed in shared memory,
+      rows are split into tiles with equal number of pairs (split_upper_triangle_rows()),
+      computed in process pool, i.e. workers get the coordinates without copying or pickling.
+
+    Returns np.ndarray:
+      condensed=False: (m, m), zeros on the diagonal.
+      condensed=True: (m * (m - 1) / 2,) upper triangle row by row,
+        same as scipy.spatial.distance.squareform(matrix).
+  '''
+  centered, _ = center_coords(np.asarray(coords, dtype=float))
+  sq_norms = np.sum(centered**2, axis=(1, 2))
+
+  num_structures = len(centered)
+  res = np.zeros(num_structures * (num_structures - 1) // 2) \
+          if condensed \
+          else np.zeros((num_structures, num_structures))
+
+  if workers == None or workers <= 1 or num_structures < 3:
+    calculate_rmsd_matrix_rows(
+                                centered=centered,
+                                sq_norms=sq_norms,
+                                res=res,
+                                row_start=0,
+                                row_end=num_structures - 1,
+                                max_block_pairs=max_block_pairs
+                              )
+    return res
+
+  handles = []
+  shared_arrays = {}
+  try:
+    specs = {}
+    for key, arr in [("centered", centered), ("sq_norms", sq_norms), ("res", res)]:
+      shared_arrays[key], handle, specs[key] = create_shared_array(arr)
+      handles.append(handle)
+
+    # more tiles than workers: tiles finishing at different times are balanced
+    tasks = [
+              {
+                **specs,
+                "row_start": row_start,
+                "row_end": row_end,
+                "max_block_pairs": max_block_pairs,
+              } for row_start, row_end in split_upper_triangle_rows(num_structures, num_tiles=4 * workers)
+            ]
+
+    for _ in ut.map_parallel(func=calculate_rmsd_matrix_tile, items=tasks, workers=workers):
+      pass
+
+    res = shared_arrays["res"].copy()
+  finally:
+    # views of shared memory must be released before close()
+    shared_arrays.clear()
+    for handle in handles:
+      handle.close()
+      try:
+        handle.unlink()
+      except FileNotFoundError:
+        # already removed by resource tracker of a worker process (spawn start method)
+        pass
+
+  return res
+
+
+def get_rmsd_matrix_manifest_path(output_path: Union[str, Path]) -> Path:
+  return ut.get_sidecar_file_path(output_path, rmsd_matrix_manifest_file_suffix)
+
+
+def read_rmsd_matrix_manifest(output_path: Union[str, Path]) -> Union[Dict, None]:
+  '''
+    Returns manifest of calculate_rmsd_matrix_on_disk(), None if not found or unreadable.
+  '''
+  try:
+    res = ut.read_json_file_to_dict(get_rmsd_matrix_manifest_path(output_path))
+  except (OSError, ValueError):
+    res = None
+
+  return res
+
+
+def write_rmsd_matrix_manifest(output_path: Union[str, Path], manifest: Dict) -> None:
+  '''
+    Manifest is replaced atomically: interrupted write leaves the previous version.
+  '''
+  manifest_path = get_rmsd_matrix_manifest_path(output_path)
+  tmp_path = manifest_path.with_name(f"{manifest_path.name}.tmp")
+  ut.write_text_file(tmp_path, json.dumps(manifest))
+  os.replace(tmp_path, manifest_path)
+
+
+def calculate_rmsd_matrix_on_disk(
+                                  coords: np.ndarray,
+                                  output_path: Union[str, Path],
+                                  condensed: bool=True,
+                                  dtype: str="float32",
+                                  memory_budget: int=2**30,
+                                  workers: int=1
+                                ) -> np.memmap:
+  '''
+    Same as calculate_rmsd_matrix(), for matrices that don't fit into memory:
+    values are written in tiles into raw binary file output_path, returned as read-only np.memmap.
+      condensed=True: upper triangle only, (m * (m - 1) / 2,)
+      condensed=False: full (m, m) matrix, rows are computed completely (twice the pairs),
+        so that the file is written row by row.
+
+    Completed tiles are recorded in manifest next to output_path (rmsd_matrix_manifest_file_suffix):
+    interrupted run with the same coords and parameters continues from the next unfinished tile.
+
+    memory_budget: bytes per worker, for block temporaries and not yet flushed tile values,
+      determines the size of blocks and tiles.
+    workers > 1: tiles are computed in process pool, coordinates in shared memory.
+  '''
+  output_path = Path(output_path)
+  centered, _ = center_coords(np.asarray(coords, dtype=float))
+  sq_norms = np.sum(centered**2, axis=(1, 2))
+  num_structures = len(centered)
+
+  shape = (num_structures * (num_structures - 1) // 2,) if condensed else (num_structures, num_structures)
+  item_size = np.dtype(dtype).itemsize
+  max_block_pairs = max(1, memory_budget // (2 * rmsd_block_bytes_per_pair))
+  max_tile_pairs = max(max_block_pairs, memory_budget // (2 * item_size))
+
+  if condensed:
+    num_pairs = shape[0]
+    tiles = split_upper_triangle_rows(num_structures, num_tiles=-(-num_pairs // max_tile_pairs))
+  else:
+    rows_per_tile = max(1, max_tile_pairs // max(num_structures, 1))
+    tiles = [(r0, min(r0 + rows_per_tile, num_structures)) for r0 in range(0, num_structures, rows_per_tile)]
+
+  manifest = {
+    "version": rmsd_matrix_manifest_version,
+    "file_name": output_path.name,
+    "coords_hash": hashlib.sha256(np.ascontiguousarray(coords, dtype=float).tobytes()).hexdigest(),
+    "num_structures": num_structures,
+    "condensed": condensed,
+    "dtype": np.dtype(dtype).str,
+    "shape": list(shape),
+    "tiles": [list(x) for x in tiles],
+    "completed_tiles": [],
+  }
+
+  previous_manifest = read_rmsd_matrix_manifest(output_path)
+  is_resumed = previous_manifest != None \
+                and {k: v for k, v in previous_manifest.items() if k != "completed_tiles"} \
+                      == {k: v for k, v in manifest.items() if k != "completed_tiles"} \
+                and output_path.is_file() \
+                and output_path.stat().st_size == int(np.prod(shape)) * item_size
+
+  if is_resumed:
+    manifest["completed_tiles"] = previous_manifest["completed_tiles"]
+  else:
+    # new file, zeros
+    np.memmap(output_path, dtype=dtype, mode="w+", shape=shape).flush()
+    write_rmsd_matrix_manifest(output_path, manifest)
+
+  completed_tiles = set(manifest["completed_tiles"])
+  handles = []
+  try:
+    specs = {}
+    for key, arr in [("centered", centered), ("sq_norms", sq_norms)]:
+      _, handle, specs[key] = create_shared_array(arr)
+      handles.append(handle)
+
+    specs["res"] = {
+      "file_path": str(output_path),
+      "shape": shape,
+      "dtype": np.dtype(dtype).str,
+    }
+
+    tasks = [
+              {
+                **specs,
+                "row_start": row_start,
+                "row_end": row_end,
+                "max_block_pairs": max_block_pairs,
+                "full_rows": not condensed,
+              } for i, (row_start, row_end) in enumerate(tiles) if i not in completed_tiles
+            ]
+    tile_idxs = [i for i in range(len(tiles)) if i not in completed_tiles]
+
+    for task_idx, _ in ut.map_parallel_as_completed(func=calculate_rmsd_matrix_tile, items=tasks, workers=workers):
+      manifest["completed_tiles"].append(tile_idxs[task_idx])
+      write_rmsd_matrix_manifest(output_path, manifest)
+  finally:
+    for handle in handles:
+      handle.close()
+      try:
+        handle.unlink()
+      except FileNotFoundError:
+        pass
+
+  return np.memmap(output_path, dtype=dtype, mode="r", shape=shape)
+
+
+def find_condensed_values_below(
+                                values: np.ndarray,
+                                num_structures: int,
+                                max_value: float,
+                                chunk_size: int=2**24
+                              ) -> List[Tuple[int, int, float]]:
+  '''
+    values: condensed upper triangle, see calculate_rmsd_matrix(), e.g. np.memmap.
+    Returns [(i, j, value)] of pairs with value < max_value, in the order of values.
+    values are read in chunks, i.e. only the matching pairs are kept in memory.
+  '''
+  # condensed index of the first pair of each row
+  row_nrs = np.arange(num_structures)
+  row_starts = row_nrs * num_structures - row_nrs * (row_nrs + 1) // 2
+
+  res = []
+  for start in range(0, len(values), chunk_size):
+    chunk = np.asarray(values[start:(start + chunk_size)])
+    idxs = np.flatnonzero(chunk < max_value) + start
+    rows = np.searchsorted(row_starts, idxs, side="right") - 1
+    cols = idxs - row_starts[rows] + rows + 1
+    res.extend(zip(rows.tolist(), cols.tolist(), chunk[idxs - start].tolist()))
+
+  return res
@@ -1,14 +1,15 @@
-from copy import deepcopy
+from itertools import chain, islice
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Set, Tuple, Union
+from typing import Any, Callable, Dict, Iterator, List, Set, Tuple, Union
 import numpy as np
 
 from ase import Atoms
-from ase.build import minimize_rotation_and_translation
 from ase.geometry.analysis import Analysis
 
+import alignment
 import constants as C
 from dataset import Dataset
+import fchk_parser
 from file_source import MultiItemFileSource
 import utils as ut
 import metrics as ms
@@ -23,14 +24,36 @@ def align_2_molecules_min_rmsd(
   '''
     Aligns atoms_to_align with target, based on min rmsd.
     Returns copy of atoms_to_align with new position coordinates.
+    For many molecules use get_aligned_positions().
   '''
 
-  res = deepcopy(atoms_to_align)
-  minimize_rotation_and_translation(target, res)
+  res = atoms_to_align.copy()
+  res.positions = alignment.align_coords(
+                                          target_coords=target.positions,
+                                          coords=atoms_to_align.positions
+                                        )["coords"]
 
   return res
 
 
+def get_aligned_positions(
+                          target: Atoms,
+                          mols: List[Atoms]
+                        ) -> np.ndarray:
+  '''
+    Positions of mols aligned with target, based on min rmsd, mols are not changed.
+    All mols are aligned in one batch, see alignment.align_coords().
+    Returns np.ndarray (len(mols), num_atoms, 3)
+  '''
+  if len(mols) == 0:
+    return np.zeros((0, len(target), 3))
+
+  return alignment.align_coords(
+                                target_coords=target.positions,
+                                coords=np.stack([m.positions for m in mols])
+                              )["coords"]
+
+
 def calculate_metric_between_two_molecules(
                     target: Atoms,
                     mol: Atoms,
@@ -73,15 +96,28 @@ def calculate_metric_one_to_many(
       and return float.
     
     align: True/False, whether to align target and mol before metric calculation.
-    alignment is done by align_2_molecules_min_rmsd()
+    alignment is done for all mols in one batch by get_aligned_positions(),
+    metric_function gets one reused Atoms object with aligned positions as mol2.
   '''
 
-  return [calculate_metric_between_two_molecules(
-                target=target,
-                mol=m,
-                align=align,
-                metric_function=metric_function
-                ) for m in mols]
+  if not align or len(mols) == 0:
+    return [calculate_metric_between_two_molecules(
+                  target=target,
+                  mol=m,
+                  align=align,
+                  metric_function=metric_function
+                  ) for m in mols]
+
+  aligned_positions = get_aligned_positions(target=target, mols=mols)
+  aligned_mol = Atoms(numbers=mols[0].numbers, positions=aligned_positions[0])
+
+  res = []
+  for m, positions in zip(mols, aligned_positions):
+    aligned_mol.numbers = m.numbers
+    aligned_mol.positions = positions
+    res.append(metric_function(mol1=target, mol2=aligned_mol))
+
+  return res
 
 
 def calculate_metric_many_to_many(
@@ -109,10 +145,25 @@ def calculate_metric_many_to_many(
             ) for t in targets]
 
 
+def is_rmsd_of_aligned_positions(align: bool, metric_function: Callable) -> bool:
+  '''
+    Whether calculate_metric_* helpers can use vectorized rmsd from alignment module.
+  '''
+  return align and metric_function == ms.rmsd_of_positions
+
+
+def get_positions_stacked(mols: List[Atoms]) -> np.ndarray:
+  '''
+    Returns np.ndarray (len(mols), num_atoms, 3), all mols must have the same number of atoms.
+  '''
+  return np.stack([m.positions for m in mols]) if len(mols) > 0 else np.zeros((0, 0, 3))
+
+
 def calculate_metric_cross(
                             mols: List[Atoms],
                             align: bool,
                             metric_function: Callable,
+                            workers: int=1,
                           ) -> Dict:
   '''
     Same as calculate_metric_matrix but returns sparse dictionary instead of
@@ -127,6 +178,9 @@ def calculate_metric_cross(
     
     align: True/False, whether to align target and mol before metric calculation.
     alignment is done by align_2_molecules_min_rmsd()
+    rmsd_of_positions with align: upper triangle is computed by alignment.calculate_rmsd_matrix(),
+      in parallel if workers > 1 (coordinates in shared memory).
+      Other metrics are computed in the current process.
 
     returns Dictionary {
       names: List[str],
@@ -146,6 +200,12 @@ def calculate_metric_cross(
     "values": {},
   }
 
+  if is_rmsd_of_aligned_positions(align=align, metric_function=metric_function):
+    values = alignment.calculate_rmsd_matrix(coords=get_positions_stacked(mols), condensed=True, workers=workers)
+    rows, cols = np.triu_indices(len(mols), k=1)
+    res["values"] = dict(zip(zip(rows.tolist(), cols.tolist()), values.tolist()))
+    return res
+
   for i, mol1 in enumerate(mols[:-1]):
     for j in range(i + 1, len(mols)):
       res["values"][(i ,j)] = calculate_metric_between_two_molecules(
@@ -162,6 +222,7 @@ def calculate_metric_matrix(
                             mols: List[Atoms],
                             align: bool,
                             metric_function: Callable,
+                            workers: int=1,
                           ) -> List[List[float]]:
   '''
     Applies metric_function on every item in mols with every other item in mols:
@@ -174,12 +235,18 @@ def calculate_metric_matrix(
     
     align: True/False, whether to align target and mol before metric calculation.
     alignment is done by align_2_molecules_min_rmsd()
+    rmsd_of_positions with align: upper triangle is computed by alignment.calculate_rmsd_matrix(),
+      in parallel if workers > 1 (coordinates in shared memory).
+      Other metrics are computed in the current process.
 
     returns distance matrix as List[List[float]]
     }
        
   '''
 
+  if is_rmsd_of_aligned_positions(align=align, metric_function=metric_function):
+    return alignment.calculate_rmsd_matrix(coords=get_positions_stacked(mols), workers=workers).tolist()
+
   return calculate_metric_many_to_many(
             targets=mols,
             mols=mols,
@@ -197,14 +264,20 @@ def calculate_metric_xyz_files(
 
   target_mols = create_ase_atoms_list_from_xyz_file(
                                                     input_path=target_mols_path,
-                                                    name=target_mols_path.stem
+                                                    name=ut.get_file_stem(target_mols_path)
                                                   )
 
   mols = create_ase_atoms_list_from_xyz_file(
                                               input_path=mols_path,
-                                              name=mols_path.stem
+                                              name=ut.get_file_stem(mols_path)
                                             )
 
+  if is_rmsd_of_aligned_positions(align=align, metric_function=metric_function):
+    return alignment.calculate_rmsd_many_to_many(
+                                    coords1=get_positions_stacked(target_mols),
+                                    coords2=get_positions_stacked(mols)
+                                  ).tolist()
+
   return calculate_metric_many_to_many(
                                     targets=target_mols,
                                     mols=mols,
@@ -219,7 +292,56 @@ def calculate_metric_between_xyz_files(
                                       max_value: float,
                                       align: bool,
                                       metric_function: Callable,
+                                      matrix_path: Union[str, Path, None]=None,
+                                      memory_budget: int=2**30,
+                                      workers: int=1,
                                     ) -> Dict:
+  '''
+    Same file, rmsd_of_positions with align:
+      matrix_path: condensed upper triangle is written to disk in float32 tiles,
+        see alignment.calculate_rmsd_matrix_on_disk(), interrupted run is resumed.
+        "all_values" is then read-only np.memmap instead of List[List[float]].
+      memory_budget, workers: see alignment.calculate_rmsd_matrix_on_disk().
+  '''
+
+  is_same_file = True if target_xyz_path == xyz_path else False
+
+  if is_same_file and is_rmsd_of_aligned_positions(align=align, metric_function=metric_function):
+    # symmetric: only the upper triangle is computed
+    if matrix_path != None:
+      # coordinates only, without Atoms objects, see xyz_parser.read_xyz_file_as_arrays()
+      xyz_data = xyz_parser.read_xyz_file_as_arrays(input_path=xyz_path)
+      if not xyz_data["stacked"]:
+        raise ValueError(f"All xyz blocks must have the same atoms: {xyz_path}")
+
+      num_structures = len(xyz_data["coords"])
+      values = alignment.calculate_rmsd_matrix_on_disk(
+                                                        coords=xyz_data["coords"],
+                                                        output_path=matrix_path,
+                                                        memory_budget=memory_budget,
+                                                        workers=workers
+                                                      )
+      less_than_max_value = [("target_source_value", i, j, val) \
+                              for i, j, val in alignment.find_condensed_values_below(values, num_structures, max_value)]
+
+      return {
+        "less_than_max_value": sorted(less_than_max_value, key=lambda x: x[3]),
+        "all_values": values,
+      }
+
+    mols = create_ase_atoms_list_from_xyz_file(
+                                                input_path=xyz_path,
+                                                name=ut.get_file_stem(xyz_path)
+                                              )
+
+    values = alignment.calculate_rmsd_matrix(coords=get_positions_stacked(mols), workers=workers)
+    rows, cols = np.nonzero(np.triu(values < max_value, k=1))
+    less_than_max_value = [("target_source_value", i, j, values[i, j]) for i, j in zip(rows.tolist(), cols.tolist())]
+
+    return {
+      "less_than_max_value": sorted(less_than_max_value, key=lambda x: x[3]),
+      "all_values": values.tolist(),
+    }
 
   values = calculate_metric_xyz_files(
                       target_mols_path=target_xyz_path,
@@ -229,7 +351,6 @@ def calculate_metric_between_xyz_files(
                     )
 
   less_than_max_value = []
-  is_same_file = True if target_xyz_path == xyz_path else False
   for i, vals_i in enumerate(values):
     j_start = i + 1 if is_same_file else 0
     for j in range(j_start, len(vals_i)):
@@ -251,15 +372,24 @@ def calculate_metric_xyz_file(
                               xyz_path: Path,
                               max_value: float,
                               align: bool,
-                              metric_function: Callable
+                              metric_function: Callable,
+                              matrix_path: Union[str, Path, None]=None,
+                              memory_budget: int=2**30,
+                              workers: int=1,
                             ) -> Dict:
+  '''
+    matrix_path, memory_budget, workers: see calculate_metric_between_xyz_files().
+  '''
 
   res = calculate_metric_between_xyz_files(
       target_xyz_path=xyz_path,
       xyz_path=xyz_path,
       max_value=max_value,
       align=align,
-      metric_function=metric_function
+      metric_function=metric_function,
+      matrix_path=matrix_path,
+      memory_budget=memory_budget,
+      workers=workers
     )
 
   keys = set()
@@ -324,6 +454,29 @@ def create_ase_atoms_from_xyz_data(xyz_data: Dict) -> Atoms:
                         )
 
 
+def create_ase_atoms_from_fchk_file(
+                                    input_path: Union[str, Path],
+                                    name: str=None
+                                  ) -> Atoms:
+  '''
+    Returns Atoms of the current geometry in Gaussian formatted checkpoint file,
+    see fchk_parser.read_fchk_file_as_arrays(). The log file is not needed.
+    Atoms info: name (file stem if not given), description (energy), source.
+  '''
+
+  fchk = fchk_parser.read_fchk_file_as_arrays(file_path=input_path)
+
+  return create_ase_atoms(
+                          atomic_nrs=fchk["atomic_nrs"],
+                          coords=fchk["coords"],
+                          info={
+                            "name": ut.get_file_stem(input_path) if name == None else name,
+                            "description": f"{fchk['energy']}",
+                            "source": fchk["source"],
+                          }
+                        )
+
+
 def create_ase_atoms_list_from_xyz_file(
                                           input_path: Path,
                                           name: str,
@@ -341,71 +494,103 @@ def create_ase_atoms_list_from_xyz_file(
     Useful for generating equal length lists when comparing different opt trajectories.
   '''
 
-  parsed_xyz_data = [x for x in xyz_parser.read_xyz_file(
-                                              input_path=input_path,
-                                              convert_coords_to_float=True
-                                            )
-        ]
-  add_item_nr_to_name = True if len(parsed_xyz_data) > 1 else False
+  # subset of items: only these xyz blocks are decoded
+  xyz_index = xyz_parser.XyzIndex(file_path=input_path, convert_coords_to_float=True) \
+                if item_idxs and not ut.is_compressed_file(input_path) \
+                else None
 
-  # multiple xyz blocks in the file: trajectory, optimization steps, conformers etc.
-  # append idx+1 numeric value to the name: idx=0, "name" -> "name_1"
-  # idx is zero based, added number will be 1-based.
-  for xyz in parsed_xyz_data:
-    if add_item_nr_to_name and "idx" in xyz:
-      item_nr = xyz["idx"] + 1
-      xyz["name"] = f"{name}_{item_nr}"
-    else:
-      # single xyz geometry or no idx information
-      xyz["name"] = name
+  xyz_data = xyz_parser.read_xyz_file_as_arrays(input_path=input_path) \
+                if xyz_index == None \
+                else None
+
+  num_items = len(xyz_index) if xyz_index != None else len(xyz_data["descriptions"])
+  add_item_nr_to_name = True if num_items > 1 else False
 
   idxs = None
   # If item_idxs is integer then means num_items and generates linspaced 
-  # list of integers between 0 and len(parsed_xyz_data)
+  # list of integers between 0 and num_items
   if item_idxs:
     if isinstance(item_idxs, int) and item_idxs > 1:
-      idxs = ut.linspace_idxs(start_idx=0, end_idx=(len(parsed_xyz_data) - 1), num_items=item_idxs)
+      idxs = ut.linspace_idxs(start_idx=0, end_idx=(num_items - 1), num_items=item_idxs)
     elif isinstance(item_idxs, list) and len(item_idxs) > 0:
       idxs = item_idxs
 
+  item_nrs = list(range(num_items))
   # Filters by given list of item_idxs
   if idxs and len(idxs) > 0:
-    parsed_xyz_data = ut.get_list_slice_by_idxs(
-                          input_list=parsed_xyz_data,
+    item_nrs = ut.get_list_slice_by_idxs(
+                          input_list=item_nrs,
                           idxs=idxs
                           )
 
-  res = [create_ase_atoms_from_xyz_data(x) for x in parsed_xyz_data]
+  # multiple xyz blocks in the file: trajectory, optimization steps, conformers etc.
+  # append idx+1 numeric value to the name: idx=0, "name" -> "name_1"
+  # idx is zero based, added number will be 1-based.
+  names = [f"{name}_{i + 1}" if add_item_nr_to_name else name for i in item_nrs]
+
+  if xyz_index != None:
+    with xyz_index:
+      parsed_xyz_data = xyz_index.get_items(item_nrs)
+    for xyz, item_name in zip(parsed_xyz_data, names):
+      xyz["name"] = item_name
+
+    return [create_ase_atoms_from_xyz_data(x) for x in parsed_xyz_data]
+
+  res = [create_ase_atoms(
+                          atomic_nrs=xyz_data["atomic_nrs"] if xyz_data["stacked"] else xyz_data["atomic_nrs"][i],
+                          coords=xyz_data["coords"][i],
+                          info={
+                            "name": item_name,
+                            "description": xyz_data["descriptions"][i],
+                            "source": xyz_data["source"],
+                          }
+                        ) for i, item_name in zip(item_nrs, names)]
 
   return res
 
 
+def create_ase_atoms_list_from_file_source(source: MultiItemFileSource) -> List[Atoms]:
+  return create_ase_atoms_list_from_xyz_file(
+                                              input_path=source.file_path,
+                                              name=source.name,
+                                              item_idxs=source.item_idxs
+                                            )
+
+
 def create_ase_atoms_list_from_xyz_files(
-                                          input_paths: List[Path]
+                                          input_paths: List[Path],
+                                          workers: int=1,
+                                          use_threads: bool=True
                                         ) -> List[Atoms]:
+  '''
+    workers, use_threads: files are read in parallel, see load_ase_atoms_lists().
+  '''
 
   return ut.flatten_list(
-              [
-                create_ase_atoms_list_from_xyz_file(
-                                                    input_path=p,
-                                                    name=p.stem
-                                                  )
-                    for p in input_paths
-              ]
+              load_ase_atoms_lists(
+                sources=[MultiItemFileSource(file_path=p, name=ut.get_file_stem(p)) for p in input_paths],
+                workers=workers,
+                use_threads=use_threads
+              )
             )
 
 
-def create_ase_atoms_list_from_dataset(dataset: Dataset) -> List[Atoms]:
-
-  res = []
-  for i in range(len(dataset)):
-    mols_from_file = create_ase_atoms_list_from_xyz_file(
-                                                          input_path=dataset[i],
-                                                          name=dataset.names[i]
-                                                        )
-    res.append(mols_from_file)
+def create_ase_atoms_list_from_dataset(
+                                        dataset: Dataset,
+                                        workers: int=1,
+                                        use_threads: bool=True
+                                      ) -> List[Atoms]:
+  '''
+    workers, use_threads: files are read in parallel, see load_ase_atoms_lists().
+  '''
 
-  return ut.flatten_list(res)
+  return ut.flatten_list(
+              load_ase_atoms_lists(
+                sources=[MultiItemFileSource(file_path=dataset[i], name=dataset.names[i]) for i in range(len(dataset))],
+                workers=workers,
+                use_threads=use_threads
+              )
+            )
 
 
 def compare_if_molecules_are_equal(mol1: Atoms, mol2: Atoms) -> bool:
@@ -421,16 +606,106 @@ def compare_if_molecules_are_equal(mol1: Atoms, mol2: Atoms) -> bool:
 
 
 def extract_mols_from_xyz_files(
-      sources: List[MultiItemFileSource]
+      sources: List[MultiItemFileSource],
+      workers: int=1,
+      use_threads: bool=True
     ) -> List[List[Atoms]]:
+  '''
+    workers, use_threads: files are read in parallel, see load_ase_atoms_lists().
+  '''
 
-  res = [create_ase_atoms_list_from_xyz_file(
-                    input_path=src.file_path,
-                    name=src.name,
-                    item_idxs=src.item_idxs)
-          for src in sources]
+  return load_ase_atoms_lists(
+                sources=sources,
+                workers=workers,
+                use_threads=use_threads
+              )
 
-  return res
+
+def iter_ase_atoms_from_xyz_file(
+                                    input_path: Union[str, Path],
+                                    name: str
+                                  ) -> Iterator[Atoms]:
+  '''
+    Streaming version of create_ase_atoms_list_from_xyz_file(): yields Atoms one at a time,
+    memory use is bounded by the size of one xyz block, see xyz_parser.iter_xyz_frames().
+    Names are the same: name_1, name_2, ... if the file contains more than one xyz block.
+  '''
+
+  frames = xyz_parser.iter_xyz_frames(input_path=input_path, as_arrays=True)
+
+  # look ahead one xyz block: item nr is added to the name only if there are more than one
+  first_frames = list(islice(frames, 2))
+  add_item_nr_to_name = True if len(first_frames) > 1 else False
+
+  for xyz in chain(first_frames, frames):
+    yield create_ase_atoms(
+                          atomic_nrs=xyz["atomic_nrs"],
+                          coords=xyz["coords"],
+                          info={
+                            "name": f"{name}_{xyz['idx'] + 1}" if add_item_nr_to_name else name,
+                            "description": xyz["description"],
+                            "source": xyz["source"],
+                          }
+                        )
+
+
+def iter_ase_atoms_from_xyz_files(
+                                    input_paths: List[Path]
+                                  ) -> Iterator[Atoms]:
+  '''
+    Streaming version of create_ase_atoms_list_from_xyz_files().
+  '''
+
+  for p in input_paths:
+    yield from iter_ase_atoms_from_xyz_file(input_path=p, name=ut.get_file_stem(p))
+
+
+def iter_ase_atoms_from_dataset(dataset: Dataset) -> Iterator[Atoms]:
+  '''
+    Streaming version of create_ase_atoms_list_from_dataset().
+  '''
+
+  for i in range(len(dataset)):
+    yield from iter_ase_atoms_from_xyz_file(input_path=dataset[i], name=dataset.names[i])
+
+
+def iter_ase_atoms_lists_as_completed(
+                                        sources: List[MultiItemFileSource],
+                                        workers: int=1,
+                                        use_threads: bool=True
+                                      ) -> Iterator[Tuple[int, List[Atoms]]]:
+  '''
+    Same as load_ase_atoms_lists(), but yields (source idx, Atoms list) as soon as each file is read.
+  '''
+
+  yield from ut.map_parallel_as_completed(
+                func=create_ase_atoms_list_from_file_source,
+                items=sources,
+                workers=workers,
+                use_threads=use_threads
+              )
+
+
+def load_ase_atoms_lists(
+                          sources: List[MultiItemFileSource],
+                          workers: int=1,
+                          use_threads: bool=True
+                        ) -> List[List[Atoms]]:
+  '''
+    Returns list of Atoms for each source, in the order of sources,
+    see create_ase_atoms_list_from_xyz_file().
+
+    workers: number of files read in parallel.
+    use_threads: threads for I/O bound reading, e.g. many small files on network storage.
+      If False then processes, for CPU bound parsing of large files.
+  '''
+
+  return list(ut.map_parallel(
+                func=create_ase_atoms_list_from_file_source,
+                items=sources,
+                workers=workers,
+                use_threads=use_threads
+              ))
 
 
 def get_info_item_from_atoms(mol: Atoms, info_key: str) -> str:
@@ -457,14 +732,36 @@ def get_source_from_atoms(mol: Atoms) -> str:
 
 def write_ase_atoms_to_xyz_file(
             atoms_list: List[Atoms],
-            output_path: Union[str, Path]
+            output_path: Union[str, Path],
+            coords: Union[List[np.ndarray], np.ndarray, None]=None,
+            use_bulk_writer: bool=False
             ) -> str:
 
+  '''
+    coords: written instead of positions of atoms_list, e.g. from get_aligned_positions().
+    use_bulk_writer: if True, then xyz_parser.write_xyz_arrays() is used: much faster for
+      large numbers of molecules, coordinates are written with fixed 8 decimals.
+      If False, then the format of xyz_parser.convert_xyz_coords_to_str().
+  '''
+
+  positions = [mol.positions for mol in atoms_list] if coords is None else coords
+  descriptions = [
+    f"{get_name_from_atoms(mol)}, {get_description_from_atoms(mol)}, source: {get_source_from_atoms(mol)}" \
+      for mol in atoms_list
+  ]
+
+  if use_bulk_writer:
+    return xyz_parser.write_xyz_arrays(
+              output_path=output_path,
+              symbols=[mol.get_chemical_symbols() for mol in atoms_list],
+              coords=positions,
+              descriptions=descriptions
+            )
+
   res = []
-  for mol in atoms_list:
-    description = f"{get_name_from_atoms(mol)}, {get_description_from_atoms(mol)}, source: {get_source_from_atoms(mol)}"
+  for mol, mol_positions, description in zip(atoms_list, positions, descriptions):
     lines = [xyz_parser.convert_xyz_coords_to_str(el, x, y, z) \
-              for el, (x,y,z) in zip(mol.get_chemical_symbols(), list(mol.positions))]
+              for el, (x,y,z) in zip(mol.get_chemical_symbols(), list(mol_positions))]
 
     res.append(len(lines))
     res.append(description)
@@ -476,23 +773,23 @@ def write_ase_atoms_to_xyz_file(
 def write_aligned_xyz_file(
             input_path: Union[str, Path],
             output_path: Union[str, Path],
+            use_bulk_writer: bool=False
           ):
 
+  '''
+    use_bulk_writer: see write_ase_atoms_to_xyz_file().
+  '''
+
   mols = create_ase_atoms_list_from_xyz_file(
                   input_path=input_path,
-                  name=input_path.stem
+                  name=ut.get_file_stem(input_path)
                 )
 
-  aligned_mols = [
-      align_2_molecules_min_rmsd(
-                                  target=mols[0],
-                                  atoms_to_align=x
-                                ) for x in mols
-    ]
-
   return write_ase_atoms_to_xyz_file(
-            atoms_list=aligned_mols,
-            output_path=output_path
+            atoms_list=mols,
+            output_path=output_path,
+            coords=get_aligned_positions(target=mols[0], mols=mols),
+            use_bulk_writer=use_bulk_writer
           )
 
 
@@ -0,0 +1,302 @@
+from pathlib import Path
+from typing import Any, Dict, List, Tuple, Union
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+from ase import Atoms
+
+import alignment
+import ase_utils as au
+import utils as ut
+
+
+# Clustering methods of cluster_coords()
+clustering_methods = ["butina", "single_linkage"]
+
+
+def calculate_rmsd_lower_bounds(
+                                profiles1: np.ndarray,
+                                profiles2: np.ndarray
+                              ) -> np.ndarray:
+  '''
+    profiles: distances of atoms from the centroid (num_pairs, num_atoms), see find_neighbor_pairs().
+    Rotation doesn't change these distances, so for every pair:
+      rmsd after alignment >= sqrt(mean((profile1 - profile2)^2)) >= |Rg1 - Rg2|
+    Returns np.ndarray (num_pairs,)
+  '''
+  return np.sqrt(np.mean((profiles1 - profiles2)**2, axis=-1))
+
+
+def find_neighbor_pairs(
+                        coords: np.ndarray,
+                        threshold: float,
+                        max_block_pairs: int=2**18
+                      ) -> Dict[str, np.ndarray]:
+  '''
+    Finds all pairs (i < j) of structures in coords (m, num_atoms, 3) with rmsd after alignment < threshold.
+    Pairs are pruned before alignment:
+      1. radius of gyration: only pairs within threshold in sorted Rg are considered,
+      2. distances of atoms from the centroid, see calculate_rmsd_lower_bounds().
+    Remaining pairs are aligned in blocks of max_block_pairs by alignment.calculate_rmsd_qcp().
+
+    Returns Dictionary {
+      "rows", "cols": np.ndarray of structure idxs, rows < cols,
+      "values": rmsd of the pairs,
+      "num_pairs_total": all pairs, m * (m - 1) / 2,
+      "num_pairs_aligned": pairs left after pruning,
+    }
+  '''
+  centered, _ = alignment.center_coords(np.asarray(coords, dtype=float))
+  num_structures = len(centered)
+  profiles = np.linalg.norm(centered, axis=-1)
+  radii = np.sqrt(np.mean(profiles**2, axis=-1))
+
+  order = np.argsort(radii, kind="stable")
+  radii_sorted = radii[order]
+  # candidates of position p in sorted order: p+1..window_ends[p]
+  window_ends = np.searchsorted(radii_sorted, radii_sorted + threshold, side="left")
+  num_candidates = np.maximum(window_ends - np.arange(num_structures) - 1, 0)
+
+  rows, cols, values = [], [], []
+  num_pairs_aligned = 0
+  p0 = 0
+  while p0 < num_structures:
+    # positions p0..p1 with about max_block_pairs candidate pairs
+    cumulative = np.cumsum(num_candidates[p0:])
+    p1 = p0 + max(1, int(np.searchsorted(cumulative, max_block_pairs, side="right")))
+    counts = num_candidates[p0:p1]
+    num_pairs = int(np.sum(counts))
+    if num_pairs > 0:
+      positions1 = np.repeat(np.arange(p0, p1), counts)
+      # offsets 1..count within each window
+      offsets = np.arange(num_pairs) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+      idxs1 = order[positions1]
+      idxs2 = order[positions1 + offsets]
+
+      is_candidate = calculate_rmsd_lower_bounds(profiles[idxs1], profiles[idxs2]) < threshold
+      idxs1, idxs2 = idxs1[is_candidate], idxs2[is_candidate]
+      num_pairs_aligned += len(idxs1)
+
+      if len(idxs1) > 0:
+        rmsd = np.atleast_1d(alignment.calculate_rmsd_qcp(centered[idxs1], centered[idxs2]))
+        is_neighbor = rmsd < threshold
+        rows.append(np.minimum(idxs1, idxs2)[is_neighbor])
+        cols.append(np.maximum(idxs1, idxs2)[is_neighbor])
+        values.append(rmsd[is_neighbor])
+
+    p0 = p1
+
+  return {
+    "rows": np.concatenate(rows) if len(rows) > 0 else np.zeros(0, dtype=int),
+    "cols": np.concatenate(cols) if len(cols) > 0 else np.zeros(0, dtype=int),
+    "values": np.concatenate(values) if len(values) > 0 else np.zeros(0),
+    "num_pairs_total": num_structures * (num_structures - 1) // 2,
+    "num_pairs_aligned": num_pairs_aligned,
+  }
+
+
+def create_neighbor_graph(
+                          rows: np.ndarray,
+                          cols: np.ndarray,
+                          num_structures: int
+                        ) -> csr_matrix:
+  '''
+    Symmetric sparse adjacency matrix of neighbor pairs, see find_neighbor_pairs().
+  '''
+  data = np.ones(2 * len(rows), dtype=np.int8)
+  return csr_matrix(
+            (data, (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+            shape=(num_structures, num_structures)
+          )
+
+
+def cluster_butina(graph: csr_matrix) -> Tuple[np.ndarray, List[int]]:
+  '''
+    Butina (leader) clustering: structures in order of decreasing number of neighbors,
+    each unassigned structure becomes a leader of new cluster with its unassigned neighbors.
+    Returns (labels np.ndarray (m,), leader idx of each cluster), cluster 0 is the first leader.
+  '''
+  num_structures = graph.shape[0]
+  num_neighbors = np.diff(graph.indptr)
+  labels = np.full(num_structures, -1, dtype=int)
+  leaders = []
+
+  for i in np.argsort(-num_neighbors, kind="stable"):
+    if labels[i] >= 0:
+      continue
+
+    neighbors = graph.indices[graph.indptr[i]:graph.indptr[i + 1]]
+    label = len(leaders)
+    labels[neighbors[labels[neighbors] < 0]] = label
+    labels[i] = label
+    leaders.append(int(i))
+
+  return labels, leaders
+
+
+def cluster_single_linkage(graph: csr_matrix) -> np.ndarray:
+  '''
+    Single-linkage clustering: connected components of the neighbor graph.
+    Returns labels np.ndarray (m,)
+  '''
+  _, labels = connected_components(graph, directed=False)
+  return labels
+
+
+def calculate_rmsd_sums_from_pairs(
+                                  pairs: Dict[str, np.ndarray],
+                                  labels: np.ndarray,
+                                  threshold: float
+                                ) -> np.ndarray:
+  '''
+    Approximate sum of rmsd of each structure to the other members of its cluster,
+    from the neighbor pairs of find_neighbor_pairs() only, without further alignments:
+    members that are not neighbors have rmsd >= threshold, they are counted as threshold.
+    Exact if all members of the cluster are neighbors of each other.
+    Returns np.ndarray (m,)
+  '''
+  num_structures = len(labels)
+  rows, cols, values = pairs["rows"], pairs["cols"], pairs["values"]
+  is_same_cluster = labels[rows] == labels[cols]
+  rows, cols, values = rows[is_same_cluster], cols[is_same_cluster], values[is_same_cluster]
+
+  sums = np.bincount(rows, weights=values, minlength=num_structures) \
+          + np.bincount(cols, weights=values, minlength=num_structures)
+  num_neighbors = np.bincount(rows, minlength=num_structures) + np.bincount(cols, minlength=num_structures)
+  num_others = np.bincount(labels, minlength=1)[labels] - 1
+
+  return sums + threshold * (num_others - num_neighbors)
+
+
+def find_cluster_medoids(
+                          coords: np.ndarray,
+                          labels: np.ndarray,
+                          max_block_pairs: int=2**18,
+                          rmsd_sums: np.ndarray=None,
+                          max_dense_cluster_size: int=1000
+                        ) -> List[int]:
+  '''
+    Medoid of each cluster: member with the smallest sum of rmsd after alignment to other members.
+    Sums are computed in blocks of rows, i.e. without the full matrix of large clusters.
+    rmsd_sums: (m,) e.g. from calculate_rmsd_sums_from_pairs(), used instead for clusters
+      larger than max_dense_cluster_size, i.e. the number of alignments stays bounded.
+      If None, then sums of all clusters are computed.
+    Returns List of structure idxs, by label.
+  '''
+  coords = np.asarray(coords, dtype=float)
+  num_clusters = int(np.max(labels)) + 1 if len(labels) > 0 else 0
+  order = np.argsort(labels, kind="stable")
+  starts = np.searchsorted(labels[order], np.arange(num_clusters + 1))
+
+  res = []
+  for k in range(num_clusters):
+    members = order[starts[k]:starts[k + 1]]
+    if rmsd_sums is not None and len(members) > max_dense_cluster_size:
+      res.append(int(members[np.argmin(rmsd_sums[members])]))
+      continue
+
+    member_coords = coords[members]
+    block_size = max(1, max_block_pairs // len(members))
+    sums = np.concatenate([
+              np.sum(alignment.calculate_rmsd_many_to_many(member_coords[i:(i + block_size)], member_coords), axis=1) \
+                for i in range(0, len(members), block_size)
+            ])
+    res.append(int(members[np.argmin(sums)]))
+
+  return res
+
+
+def cluster_coords(
+                    coords: np.ndarray,
+                    threshold: float,
+                    method: str="butina",
+                    max_dense_cluster_size: int=1000
+                  ) -> Dict:
+  '''
+    Clusters structures in coords (m, num_atoms, 3) by rmsd after alignment:
+    structures with rmsd < threshold are neighbors, see find_neighbor_pairs().
+      method="butina": see cluster_butina(), every member is a neighbor of the cluster leader.
+      method="single_linkage": see cluster_single_linkage(), chains of neighbors.
+    max_dense_cluster_size: medoids of larger clusters are approximated from the neighbor
+      pairs, see calculate_rmsd_sums_from_pairs().
+
+    Returns Dictionary {
+      "labels": np.ndarray (m,) cluster of each structure,
+      "medoids": List[int] structure idx of each cluster, see find_cluster_medoids(),
+      "cluster_sizes": List[int],
+      "num_clusters", "num_neighbor_pairs", "num_pairs_total", "num_pairs_aligned": int,
+    }
+  '''
+  if method not in clustering_methods:
+    raise ValueError(f"Unknown clustering method: {method}, expected one of {clustering_methods}")
+
+  coords = np.asarray(coords, dtype=float)
+  num_structures = len(coords)
+  pairs = find_neighbor_pairs(coords=coords, threshold=threshold)
+  graph = create_neighbor_graph(rows=pairs["rows"], cols=pairs["cols"], num_structures=num_structures)
+
+  if method == "butina":
+    labels, _ = cluster_butina(graph)
+  else:
+    labels = cluster_single_linkage(graph)
+
+  return {
+    "labels": labels,
+    "medoids": find_cluster_medoids(
+                                    coords=coords,
+                                    labels=labels,
+                                    rmsd_sums=calculate_rmsd_sums_from_pairs(pairs=pairs, labels=labels, threshold=threshold),
+                                    max_dense_cluster_size=max_dense_cluster_size
+                                  ),
+    "cluster_sizes": np.bincount(labels).tolist() if num_structures > 0 else [],
+    "num_clusters": int(np.max(labels)) + 1 if num_structures > 0 else 0,
+    "num_neighbor_pairs": len(pairs["rows"]),
+    "num_pairs_total": pairs["num_pairs_total"],
+    "num_pairs_aligned": pairs["num_pairs_aligned"],
+  }
+
+
+def cluster_mols(
+                  mols: List[Atoms],
+                  threshold: float,
+                  method: str="butina"
+                ) -> Dict:
+  '''
+    Same as cluster_coords(), all mols must have the same atoms in the same order.
+    Additional key "medoid_mols": List[Atoms], e.g. for au.write_ase_atoms_to_xyz_file().
+  '''
+  res = cluster_coords(
+                        coords=au.get_positions_stacked(mols),
+                        threshold=threshold,
+                        method=method
+                      )
+  res["medoid_mols"] = [mols[i] for i in res["medoids"]]
+
+  return res
+
+
+def cluster_xyz_file(
+                      xyz_path: Union[str, Path],
+                      threshold: float,
+                      method: str="butina",
+                      output_path: Union[str, Path, None]=None
+                    ) -> Dict:
+  '''
+    Clusters xyz blocks of xyz_path, see cluster_mols().
+    output_path: medoids are written into xyz file, "output_path" in the result.
+  '''
+  mols = au.create_ase_atoms_list_from_xyz_file(
+                                                input_path=xyz_path,
+                                                name=ut.get_file_stem(xyz_path)
+                                              )
+
+  res = cluster_mols(mols=mols, threshold=threshold, method=method)
+
+  if output_path != None:
+    res["output_path"] = au.write_ase_atoms_to_xyz_file(
+                                                        atoms_list=res["medoid_mols"],
+                                                        output_path=output_path
+                                                      )
+
+  return res
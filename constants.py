@@ -19,6 +19,8 @@ hartree_in_kcal_per_mol = ase_units.Hartree * ase_units.mol / ase_units.kcal
 
 hartree_in_kJ_per_mol = ase_units.Hartree * ase_units.mol / ase_units.kJ
 
+bohr_in_angstrom = ase_units.Bohr
+
 
 def convert_elements_to_numbers():
   elem2nr = {}
@@ -0,0 +1,148 @@
+import math
+import numpy as np
+from pathlib import Path
+from typing import Any, Dict, List, Tuple, Union
+
+import constants as C
+import utils as ut
+
+
+# Values per line of fchk arrays, by data type: integer, real, character, logical, hollerith
+fchk_values_per_line = {"I": 6, "R": 5, "C": 5, "L": 72, "H": 9}
+
+
+def expand_lower_triangle(values: np.ndarray, n: int) -> np.ndarray:
+  '''
+    Lower triangle, row by row (as "Cartesian Force Constants" in fchk) -> symmetric (n, n) matrix.
+  '''
+  if len(values) != n * (n + 1) // 2:
+    raise ValueError(f"Lower triangle of {n}x{n} matrix has {n * (n + 1) // 2} values, got {len(values)}")
+
+  res = np.zeros((n, n), dtype=values.dtype)
+  rows, cols = np.tril_indices(n)
+  res[rows, cols] = values
+  res[cols, rows] = values
+
+  return res
+
+
+def read_fchk_file(
+                    file_path: Union[str, Path],
+                    array_labels: Union[List[str], None]=None
+                  ) -> Dict[str, Any]:
+  '''
+    Reads Gaussian formatted checkpoint file.
+    Returns Dictionary { label: value }, e.g. "Number of atoms": 12, "Atomic numbers": np.ndarray
+      "title", "job_type", "method", "basis": from the first two lines.
+
+    Numeric arrays are converted in bulk with numpy, one conversion per array.
+    array_labels: only these arrays are converted, e.g. MO coefficients can be skipped.
+      default = None, i.e. all arrays.
+  '''
+
+  with ut.open_text_file(file_path) as f:
+    lines = f.read().splitlines()
+
+  res = {}
+  if len(lines) > 1:
+    res["title"] = lines[0].strip()
+    res["job_type"] = lines[1][:10].strip()
+    res["method"] = lines[1][10:40].strip()
+    res["basis"] = lines[1][40:].strip()
+
+  i = 2
+  while i < len(lines):
+    line = lines[i]
+    i += 1
+    if len(line) < 44 or line[0] == " ":
+      continue
+
+    # label: columns 1-40, data type: column 44, "N=" in columns 48-49 if array
+    label = line[:40].strip()
+    data_type = line[43]
+    value = line[49:].strip()
+
+    if line[47:49] != "N=":
+      res[label] = int(value) if data_type == "I" \
+                    else float(value) if data_type == "R" \
+                    else value
+      continue
+
+    num_values = int(value)
+    num_lines = math.ceil(num_values / fchk_values_per_line.get(data_type, 5))
+    value_lines = lines[i:(i + num_lines)]
+    i += num_lines
+
+    if array_labels != None and label not in array_labels:
+      continue
+
+    if data_type in ["I", "R"]:
+      arr = np.fromstring(" ".join(value_lines), dtype=int if data_type == "I" else float, sep=" ")
+      if len(arr) != num_values:
+        raise ValueError(f"{label}: expected {num_values} values, got {len(arr)} in {Path(file_path).name}")
+      res[label] = arr
+    else:
+      res[label] = "".join(value_lines)
+
+  return res
+
+
+def read_fchk_file_as_arrays(
+                    file_path: Union[str, Path],
+                    include_hessian: bool=False,
+                    include_mo_coefficients: bool=False
+                  ) -> Dict[str, Any]:
+  '''
+    Returns Dictionary {
+      "atomic_nrs": np.ndarray (num_atoms,)
+      "coords": np.ndarray (num_atoms, 3), Angstroms
+      "energy": "Total Energy", Hartree
+      "scf_energy": "SCF Energy", Hartree, None if not found
+      "gradient": np.ndarray (num_atoms, 3), Hartree/Bohr, None if not found
+      "hessian": np.ndarray (3*num_atoms, 3*num_atoms), Hartree/Bohr^2, if include_hessian
+      "mo_coefficients": np.ndarray (num_mos, num_basis_functions), if include_mo_coefficients
+      "mo_coefficients_beta": same for beta orbitals, None if restricted
+      "charge", "multiplicity", "title", "method", "basis", "source": file name
+    }
+  '''
+
+  array_labels = ["Atomic numbers", "Current cartesian coordinates", "Cartesian Gradient"]
+  if include_hessian:
+    array_labels.append("Cartesian Force Constants")
+  if include_mo_coefficients:
+    array_labels.extend(["Alpha MO coefficients", "Beta MO coefficients"])
+
+  data = read_fchk_file(file_path=file_path, array_labels=array_labels)
+
+  atomic_nrs = data["Atomic numbers"]
+  num_atoms = len(atomic_nrs)
+
+  res = {
+    "atomic_nrs": atomic_nrs,
+    "coords": data["Current cartesian coordinates"].reshape(num_atoms, 3) * C.bohr_in_angstrom,
+    "energy": data.get("Total Energy", None),
+    "scf_energy": data.get("SCF Energy", None),
+    "gradient": data["Cartesian Gradient"].reshape(num_atoms, 3) \
+                  if "Cartesian Gradient" in data \
+                  else None,
+    "charge": data.get("Charge", None),
+    "multiplicity": data.get("Multiplicity", None),
+    "title": data.get("title", ""),
+    "method": data.get("method", ""),
+    "basis": data.get("basis", ""),
+    "source": Path(file_path).name,
+  }
+
+  if include_hessian:
+    res["hessian"] = expand_lower_triangle(data["Cartesian Force Constants"], n=3 * num_atoms) \
+                      if "Cartesian Force Constants" in data \
+                      else None
+
+  if include_mo_coefficients:
+    num_basis_functions = data["Number of basis functions"]
+    for label, key in [("Alpha MO coefficients", "mo_coefficients"), ("Beta MO coefficients", "mo_coefficients_beta")]:
+      res[key] = data[label].reshape(-1, num_basis_functions) \
+                  if label in data \
+                  else None
+
+  return res
@@ -0,0 +1,655 @@
+from bisect import bisect_left
+from dataclasses import dataclass, field
+import mmap
+from pathlib import Path
+import re
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+import utils as ut
+
+
+# Sidecar file of GaussianLogIndex: "x.log" -> "x.log.molli_index.json"
+gaussian_log_index_file_suffix = ".molli_index.json"
+
+# Increase when the format of the sidecar index changes: old files are then rebuilt.
+gaussian_log_index_version = 1
+
+# Marker phrases looked up by the extractors in gaussian_utils.
+# All of them are indexed in a single pass when the log is read.
+gaussian_log_markers = [
+    "Standard orientation:",
+    "SCF Done:",
+    "Stationary point found",
+    "Elapsed time:",
+    "Job cpu time:",
+    "Error termination via",
+    "Unable to Open any file for archive entry.",
+    "The archive entry for this job was punched.",
+    "GradGradGradGradGradGradGradGradGradGradGrad",
+    "Framework group",
+    "Cite this work as:",
+    "Rotational constants",
+    " #",
+  ]
+
+
+def index_marker_line_nrs(
+                          lines: List[str],
+                          markers: List[str],
+                          ) -> Dict[str, List[int]]:
+  '''
+    Scans lines once and returns line numbers for every marker:
+      { marker: [line_nr, ...] }
+    Same result as calling ut.get_block_start_line_nrs() for each marker,
+    but the lines are traversed only once.
+  '''
+
+  res = {m: [] for m in markers}
+  any_marker = re.compile("|".join(re.escape(m) for m in markers))
+
+  for i, line in enumerate(lines):
+    if any_marker.search(line):
+      # rare case: line matches, check which markers it contains
+      for m in markers:
+        if m in line:
+          res[m].append(i)
+
+  return res
+
+
+def index_marker_byte_offsets(
+                              mapped_file: mmap.mmap,
+                              markers: List[str],
+                              ) -> Dict[str, List[int]]:
+  '''
+    Bytes-level version of index_marker_line_nrs():
+    searches markers in one pass over the memory-mapped file
+    and returns byte offsets of the lines containing them:
+      { marker: [line_start_offset, ...] }
+  '''
+
+  res = {m: [] for m in markers}
+
+  # markers starting with whitespace (e.g. " #") would make the regex stop at every space,
+  # these are rare in the log and searched separately.
+  markers_bytes = {m.encode(): m for m in markers if not m[:1].isspace()}
+  other_markers_bytes = {m.encode(): m for m in markers if m[:1].isspace()}
+
+  def add_match(marker: str, match_offset: int):
+    line_start = mapped_file.rfind(b"\n", 0, match_offset) + 1
+    offsets = res[marker]
+    # same marker more than once in a line
+    if len(offsets) < 1 or offsets[-1] != line_start:
+      offsets.append(line_start)
+
+  if len(markers_bytes) > 0:
+    any_marker = re.compile(b"|".join(re.escape(m) for m in markers_bytes))
+    for match in any_marker.finditer(mapped_file):
+      add_match(markers_bytes[match.group()], match.start())
+
+  for marker_bytes, marker in other_markers_bytes.items():
+    match_offset = mapped_file.find(marker_bytes)
+    while match_offset >= 0:
+      add_match(marker, match_offset)
+      match_offset = mapped_file.find(marker_bytes, match_offset + len(marker_bytes))
+
+  return res
+
+
+def index_block_byte_ranges(
+                            mapped_file: mmap.mmap,
+                            markers: Dict[str, List[int]],
+                            ) -> Dict[str, List[List[int]]]:
+  '''
+    Returns [offset, length] of blocks, based on marker offsets from index_marker_byte_offsets():
+      "Standard orientation:": whole xyz block incl. header and the closing line.
+      "SCF Done:": the line.
+      "archive": archive entry, from "Unable to Open any file for archive entry."
+                 up to "The archive entry for this job was punched." line.
+  '''
+
+  file_size = len(mapped_file)
+
+  def get_line_end(offset: int) -> int:
+    end = mapped_file.find(b"\n", offset) if offset >= 0 else -1
+    return file_size if end < 0 else end + 1
+
+  dashes = b"--------------------------------------------"
+  orientation_blocks = []
+  for offset in markers["Standard orientation:"]:
+    # 3 dashed lines: before header, after header, end of block
+    end = offset
+    for _ in range(3):
+      dashes_offset = mapped_file.find(dashes, end)
+      end = get_line_end(dashes_offset)
+    orientation_blocks.append([offset, end - offset])
+
+  archive_blocks = []
+  archive_end_offsets = markers["The archive entry for this job was punched."]
+  for offset in markers["Unable to Open any file for archive entry."]:
+    end_idx = bisect_left(archive_end_offsets, offset)
+    end = get_line_end(archive_end_offsets[end_idx]) \
+            if end_idx < len(archive_end_offsets) \
+            else file_size
+    archive_blocks.append([offset, end - offset])
+
+  return {
+    "Standard orientation:": orientation_blocks,
+    "SCF Done:": [[x, get_line_end(x) - x] for x in markers["SCF Done:"]],
+    "archive": archive_blocks,
+  }
+
+
+def get_energy_from_scf_done_line(line: str) -> str:
+  '''
+    " SCF Done:  E(RB-P86) =  -115.729831748     A.U. after   10 cycles" -> "-115.729831748"
+  '''
+  return line.split("=")[1].strip().split()[0].strip()
+
+
+@dataclass
+class GaussianLog():
+  '''
+    Gaussian log file read into memory once.
+    Line numbers of gaussian_log_markers are indexed on load,
+    so that extractors in gaussian_utils don't need to re-read or re-scan the file.
+  '''
+  file_path: Path
+  lines: List[str] = field(init=False, repr=False)
+  markers: Dict[str, List[int]] = field(init=False, repr=False)
+
+
+  def __post_init__(self):
+    self.file_path = Path(self.file_path)
+    self.lines = ut.read_text_file_as_lines(file_path=self.file_path)
+    self.markers = index_marker_line_nrs(
+                                          lines=self.lines,
+                                          markers=gaussian_log_markers
+                                        )
+
+
+  def __enter__(self):
+    return self
+
+
+  def __exit__(self, *args):
+    pass
+
+
+  def __getitem__(self, i: Union[int, slice]) -> Union[str, List[str]]:
+    return self.lines[i]
+
+
+  def __len__(self) -> int:
+    return len(self.lines)
+
+
+  @property
+  def name(self) -> str:
+    return self.file_path.name
+
+
+  def get_block_start_line_nrs(
+                                self,
+                                search_text: str,
+                                between_lines: Tuple[int, int]=None
+                              ) -> List[int]:
+    '''
+      Returns line numbers containing search_text.
+      Uses marker index if search_text is one of the gaussian_log_markers,
+      otherwise scans the lines.
+      between_lines: (start_line_nr, end_line_nr), end is exclusive.
+    '''
+
+    start_nr, end_nr = between_lines if between_lines else (0, len(self.lines))
+
+    if search_text in self.markers:
+      line_nrs = self.markers[search_text]
+      return line_nrs[bisect_left(line_nrs, start_nr):bisect_left(line_nrs, end_nr)]
+
+    return [start_nr + i for i in ut.get_block_start_line_nrs(
+                                                    lines=self.lines[start_nr:end_nr],
+                                                    search_text=search_text
+                                                  )]
+
+
+def read_gaussian_log(file_path: Union[str, Path, GaussianLog]) -> GaussianLog:
+  '''
+    Returns GaussianLog for file_path.
+    If file_path is already a GaussianLog, then returns it as is.
+  '''
+
+  return file_path \
+          if isinstance(file_path, GaussianLog) \
+          else GaussianLog(file_path=file_path)
+
+
+@dataclass
+class GaussianLogIndex():
+  '''
+    Byte offsets of gaussian_log_markers in a memory-mapped log file.
+    Unlike GaussianLog, lines are not read into memory: extractors decode only
+    the small regions they need, so memory use does not depend on the log size.
+    Use as context manager, or call close(), to release the memory map.
+    Compressed files are not supported.
+
+    use_sidecar: if True, then index is saved next to the log file
+      (gaussian_log_index_file_suffix) and loaded from there next time,
+      i.e. the log is not scanned again. Sidecar is rebuilt if the log file
+      size or modification time has changed.
+  '''
+  file_path: Path
+  use_sidecar: bool = False
+  file_size: int = field(init=False)
+  markers: Dict[str, List[int]] = field(init=False, repr=False)
+  blocks: Dict[str, List[List[int]]] = field(init=False, repr=False)
+  mapped_file: mmap.mmap = field(init=False, repr=False, default=None)
+
+
+  def __post_init__(self):
+    self.file_path = Path(self.file_path)
+    if ut.is_compressed_file(self.file_path):
+      raise ValueError(f"Compressed file can't be memory-mapped: {self.file_path.name}, use GaussianLog instead.")
+
+    if self.use_sidecar and self.load_sidecar():
+      return
+
+    self.file_size = self.file_path.stat().st_size
+    if self.file_size > 0:
+      self.markers = index_marker_byte_offsets(
+                                            mapped_file=self.get_mapped_file(),
+                                            markers=gaussian_log_markers
+                                          )
+      self.blocks = index_block_byte_ranges(
+                                            mapped_file=self.get_mapped_file(),
+                                            markers=self.markers
+                                          )
+    else:
+      self.markers = {m: [] for m in gaussian_log_markers}
+      self.blocks = {k: [] for k in ["Standard orientation:", "SCF Done:", "archive"]}
+
+    if self.use_sidecar:
+      self.save_sidecar()
+
+
+  def __enter__(self):
+    return self
+
+
+  def __exit__(self, *args):
+    self.close()
+
+
+  @property
+  def name(self) -> str:
+    return self.file_path.name
+
+
+  def close(self):
+    if self.mapped_file != None:
+      self.mapped_file.close()
+      self.mapped_file = None
+
+
+  def get_mapped_file(self) -> mmap.mmap:
+    if self.mapped_file == None:
+      with open(self.file_path, "rb") as f:
+        self.mapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    return self.mapped_file
+
+
+  def get_marker_offsets(
+                          self,
+                          search_text: str,
+                          between_offsets: Tuple[int, int]=None
+                        ) -> List[int]:
+    '''
+      Returns byte offsets of the lines containing search_text,
+      search_text must be one of the gaussian_log_markers.
+      between_offsets: (start_offset, end_offset), end is exclusive.
+    '''
+
+    offsets = self.markers[search_text]
+
+    if not between_offsets:
+      return list(offsets)
+
+    start, end = between_offsets
+    return offsets[bisect_left(offsets, start):bisect_left(offsets, end)]
+
+
+  def get_num_steps(self) -> int:
+    return len(self.markers["Standard orientation:"])
+
+
+  def get_sidecar_path(self) -> Path:
+    return ut.get_sidecar_file_path(
+                                    file_path=self.file_path,
+                                    sidecar_suffix=gaussian_log_index_file_suffix
+                                  )
+
+
+  def load_sidecar(self) -> bool:
+    '''
+      Loads index from the sidecar file.
+      Returns False if sidecar doesn't exist or is stale.
+    '''
+    data = ut.read_sidecar_file(
+                                file_path=self.file_path,
+                                sidecar_suffix=gaussian_log_index_file_suffix,
+                                version=gaussian_log_index_version
+                              )
+    if data == None:
+      return False
+
+    self.file_size = data["signature"]["size"]
+    self.markers = data["markers"]
+    self.blocks = data["blocks"]
+    return True
+
+
+  def read_block(self, block_name: str, idx: int) -> List[str]:
+    '''
+      Decodes lines of block idx, block_name is one of the keys in self.blocks:
+      "Standard orientation:", "SCF Done:", "archive".
+    '''
+    offset, length = self.blocks[block_name][idx]
+    return self.read_text(start=offset, end=offset + length).splitlines()
+
+
+  def read_line(self, offset: int) -> str:
+    return self.read_lines(offset=offset, num_lines=1)[0]
+
+
+  def read_lines(self, offset: int, num_lines: int) -> List[str]:
+    '''
+      Decodes num_lines lines starting at byte offset.
+      Returns fewer lines if end of file is reached.
+    '''
+
+    if offset >= self.file_size:
+      return []
+
+    mapped_file = self.get_mapped_file()
+    res = []
+    while len(res) < num_lines and offset < self.file_size:
+      end = mapped_file.find(b"\n", offset)
+      end = self.file_size if end < 0 else end
+      res.append(mapped_file[offset:end].decode().rstrip("\r"))
+      offset = end + 1
+
+    return res
+
+
+  def read_lines_before(self, offset: int, num_lines: int) -> List[str]:
+    '''
+      Decodes up to num_lines lines before the line starting at byte offset.
+      Returns fewer lines if start of file is reached.
+    '''
+
+    if offset < 1:
+      return []
+
+    mapped_file = self.get_mapped_file()
+    start = offset
+    for _ in range(num_lines):
+      if start < 1:
+        break
+      start = mapped_file.rfind(b"\n", 0, start - 1) + 1
+
+    if start >= offset:
+      return []
+
+    text = self.read_text(start=start, end=offset)
+    # split on "\n" only, as lines of GaussianLog
+    res = text.split("\n")
+    if text.endswith("\n"):
+      res = res[:-1]
+
+    return [x.rstrip("\r") for x in res]
+
+
+  def read_last_lines(self, num_lines: int) -> List[str]:
+    '''
+      Decodes up to num_lines last lines of the file, same as lines[-num_lines:] of GaussianLog.
+    '''
+    return self.read_lines_before(offset=self.file_size, num_lines=num_lines)
+
+
+  def read_lines_until(
+                        self,
+                        offset: int,
+                        search_text: str,
+                        skip_lines: int=0
+                      ) -> List[str]:
+    '''
+      Decodes lines starting at byte offset, skips the first skip_lines lines
+      and returns the following lines up to (not including) the line containing search_text.
+    '''
+
+    mapped_file = self.get_mapped_file()
+    for _ in range(skip_lines):
+      offset = mapped_file.find(b"\n", offset) + 1
+      if offset < 1:
+        return []
+
+    end = mapped_file.find(search_text.encode(), offset)
+    end = self.file_size if end < 0 else mapped_file.rfind(b"\n", offset, end) + 1
+    return self.read_text(start=offset, end=end).splitlines() if end > offset else []
+
+
+  def read_text(self, start: int, end: int) -> str:
+    return self.get_mapped_file()[start:end].decode()
+
+
+  def save_sidecar(self) -> Union[Path, None]:
+    '''
+      Writes index to the sidecar file, returns its path.
+      Returns None if it could not be written, e.g. read-only directory.
+    '''
+    return ut.write_sidecar_file(
+                                file_path=self.file_path,
+                                sidecar_suffix=gaussian_log_index_file_suffix,
+                                version=gaussian_log_index_version,
+                                data={"markers": self.markers, "blocks": self.blocks}
+                              )
+
+
+def open_gaussian_log(file_path: Union[str, Path]) -> Union[GaussianLog, GaussianLogIndex]:
+  '''
+    Returns GaussianLogIndex (memory-mapped, lines are not read into memory) for uncompressed files
+    and GaussianLog for compressed files. Use as context manager.
+  '''
+
+  return GaussianLog(file_path=file_path) \
+          if ut.is_compressed_file(file_path) \
+          else GaussianLogIndex(file_path=file_path)
+
+
+@dataclass
+class OptimizationStep():
+  '''
+    Geometry of one "Standard orientation:" block and its SCF energy.
+    energy: as string, same as in the log, "" if not found.
+    coords: List of [x, y, z] in Angstroms.
+  '''
+  step_idx: int
+  energy: str = ""
+  atomic_nrs: List[int] = field(default_factory=list)
+  coords: List[List[float]] = field(default_factory=list)
+
+
+@dataclass
+class OptimizationStepParser():
+  '''
+    Incremental parser of optimization steps: log lines are fed one at a time
+    by parse_line(), only the current step is kept in memory.
+
+    Energy of a step is the first "SCF Done:" after its "Standard orientation:" block.
+    If not found, then energy of the previous step is used: if optimization converged
+    then last two xyz blocks are identical and SCF Done is not shown for the last.
+  '''
+  num_steps: int = 0
+  current_step: OptimizationStep = None
+  previous_step_energy: str = ""
+  state: str = "search"
+  num_lines_to_skip: int = 0
+
+
+  def complete_step(self) -> Union[OptimizationStep, None]:
+    '''
+      Returns the current step and starts waiting for the next one.
+      Called when next step begins or at the end of the log.
+    '''
+    res = self.current_step
+    if res != None:
+      step_energy = res.energy
+      if len(res.energy) < 1 and res.step_idx > 0:
+        res.energy = self.previous_step_energy
+      self.previous_step_energy = step_energy
+
+    self.current_step = None
+    self.state = "search"
+    return res
+
+
+  def parse_line(self, line: str) -> Union[OptimizationStep, None]:
+    '''
+      Returns previous step when line starts a new step, otherwise None.
+    '''
+
+    if self.state == "block":
+      if "--------------------------------------------" in line:
+        self.state = "search"
+      else:
+        _, atomic_nr, _, x, y, z = line.split()[:6]
+        self.current_step.atomic_nrs.append(int(atomic_nr))
+        self.current_step.coords.append([float(x), float(y), float(z)])
+
+    elif self.state == "header":
+      # 4 lines between "Standard orientation:" and the first row of the xyz block
+      self.num_lines_to_skip -= 1
+      if self.num_lines_to_skip < 1:
+        self.state = "block"
+
+    elif "Standard orientation:" in line:
+      res = self.complete_step()
+      self.current_step = OptimizationStep(step_idx=self.num_steps)
+      self.num_steps += 1
+      self.state = "header"
+      self.num_lines_to_skip = 4
+      return res
+
+    elif "SCF Done:" in line \
+      and self.current_step != None \
+      and len(self.current_step.energy) < 1:
+      try:
+        self.current_step.energy = get_energy_from_scf_done_line(line)
+      except:
+        pass
+
+    return None
+
+
+def count_marker_lines(file_path: Union[str, Path], search_text: str) -> int:
+  '''
+    Returns number of lines containing search_text, one of the gaussian_log_markers.
+    Uses GaussianLogIndex, compressed files are streamed instead.
+  '''
+
+  if ut.is_compressed_file(file_path):
+    with ut.open_text_file(file_path) as f:
+      return sum(1 for line in f if search_text in line)
+
+  with GaussianLogIndex(file_path=file_path) as index:
+    return len(index.get_marker_offsets(search_text=search_text))
+
+
+def find_energy_lines(file_path: Union[str, Path], max_num_scf_lines: int=0) -> Dict:
+  '''
+    Finds only what is needed for ranking by energy, without reading the whole log into memory.
+    Returns Dictionary {
+      "scf_done_first": first "SCF Done:" line, "" if not found
+      "scf_done_last": last "SCF Done:" line, or line nr max_num_scf_lines if > 0
+      "num_scf_done": number of "SCF Done:" lines, at most max_num_scf_lines if > 0
+      "stationary_point_found": bool
+      "elapsed_time_found": bool
+    }
+
+    Uncompressed file is memory-mapped and no lines are decoded except the two SCF Done lines,
+    phrases near the end of the log are searched backwards from the end. Compressed files are streamed.
+  '''
+
+  res = {
+    "scf_done_first": "",
+    "scf_done_last": "",
+    "num_scf_done": 0,
+    "stationary_point_found": False,
+    "elapsed_time_found": False,
+  }
+
+  if ut.is_compressed_file(file_path):
+    with ut.open_text_file(file_path) as f:
+      for line in f:
+        if "SCF Done:" in line and (max_num_scf_lines < 1 or res["num_scf_done"] < max_num_scf_lines):
+          res["num_scf_done"] += 1
+          res["scf_done_last"] = line.rstrip("\n")
+          if res["num_scf_done"] == 1:
+            res["scf_done_first"] = res["scf_done_last"]
+        elif "Stationary point found" in line:
+          res["stationary_point_found"] = True
+        elif "Elapsed time:" in line:
+          res["elapsed_time_found"] = True
+    return res
+
+  if Path(file_path).stat().st_size < 1:
+    return res
+
+  with open(file_path, "rb") as f:
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+
+      def read_line_at(offset: int) -> str:
+        start = mapped_file.rfind(b"\n", 0, offset) + 1
+        end = mapped_file.find(b"\n", offset)
+        return mapped_file[start:(len(mapped_file) if end < 0 else end)].decode()
+
+      marker = b"SCF Done:"
+      first_offset = mapped_file.find(marker)
+      last_offset = first_offset
+      if first_offset >= 0:
+        # count forward, stop at max_num_scf_lines
+        num_scf_done = 1
+        offset = mapped_file.find(marker, first_offset + len(marker))
+        while offset >= 0 and (max_num_scf_lines < 1 or num_scf_done < max_num_scf_lines):
+          num_scf_done += 1
+          last_offset = offset
+          offset = mapped_file.find(marker, offset + len(marker))
+
+        res["num_scf_done"] = num_scf_done
+        res["scf_done_first"] = read_line_at(first_offset)
+        res["scf_done_last"] = read_line_at(last_offset)
+
+      res["stationary_point_found"] = mapped_file.rfind(b"Stationary point found") >= 0
+      res["elapsed_time_found"] = mapped_file.rfind(b"Elapsed time:") >= 0
+
+  return res
+
+
+def iter_optimization_steps(file_path: Union[str, Path]) -> Iterator[OptimizationStep]:
+  '''
+    Reads Gaussian log file line by line and yields optimization steps one at a time.
+    Memory use is bounded by the size of one step.
+  '''
+
+  parser = OptimizationStepParser()
+  with ut.open_text_file(file_path) as f:
+    for line in f:
+      step = parser.parse_line(line)
+      if step != None:
+        yield step
+
+  step = parser.complete_step()
+  if step != None:
+    yield step
+
@@ -0,0 +1,245 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+import time
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+from gaussian_log import OptimizationStep, OptimizationStepParser
+
+
+@dataclass
+class GaussianLogFollower():
+  '''
+    Follows a running Gaussian job: each poll() parses only the lines appended
+    to the log since the previous poll. Byte offset and parser state are kept
+    between polls, so the cost of a poll depends on the amount of new output,
+    not on the total log size.
+
+    Only complete lines are parsed, partially written last line is left for the next poll.
+    If the log is replaced (other inode) or gets shorter, then follower starts from the beginning.
+    If only the modification time has changed, then the last tail_window_size parsed bytes
+    are compared with the file: follower starts from the beginning only if they differ
+    (log overwritten in place), not if the file was just touched.
+
+    Termination line is final only if it is the end of the log: output of the next job
+    step (Link1, "Initial command") clears it. The job is reported as terminated once
+    the log has not been modified for quiet_period_seconds after the termination line.
+  '''
+  file_path: Path
+  chunk_size: int = 2**24
+  quiet_period_seconds: float = 30
+  tail_window_size: int = 4096
+  offset: int = field(init=False, default=0)
+  tail_bytes: bytes = field(init=False, repr=False, default=b"")
+  file_mtime: float = field(init=False, default=0)
+  file_inode: int = field(init=False, default=0)
+  parser: OptimizationStepParser = field(init=False, repr=False, default_factory=OptimizationStepParser)
+  steps_energies: List[str] = field(init=False, repr=False, default_factory=list)
+  latest_step: OptimizationStep = field(init=False, repr=False, default=None)
+  optimization_converged: bool = field(init=False, default=False)
+  termination_line: str = field(init=False, default="")
+  terminated: str = field(init=False, default="")
+
+
+  def __post_init__(self):
+    self.file_path = Path(self.file_path)
+
+
+  @property
+  def num_steps(self) -> int:
+    return self.parser.num_steps
+
+
+  def get_latest_energy(self) -> str:
+    '''
+      SCF energy of the latest step: step being parsed, if its SCF Done is already in the log.
+    '''
+    current_step = self.parser.current_step
+    if current_step != None and len(current_step.energy) > 0:
+      return current_step.energy
+
+    return self.steps_energies[-1] if len(self.steps_energies) > 0 else ""
+
+
+  def get_latest_step(self) -> Union[OptimizationStep, None]:
+    '''
+      Latest complete geometry: step being parsed, if its xyz block has been read.
+    '''
+    current_step = self.parser.current_step
+    if current_step != None and self.parser.state == "search":
+      return current_step
+
+    return self.latest_step
+
+
+  def parse_line(self, line: str) -> Union[OptimizationStep, None]:
+    if "Stationary point found" in line:
+      self.optimization_converged = True
+    elif "Normal termination of Gaussian" in line or "Error termination" in line:
+      self.termination_line = line.strip()
+    elif len(self.termination_line) > 0 and ("Initial command" in line or "Link1" in line):
+      # next job step of the same log
+      self.termination_line = ""
+      self.terminated = ""
+
+    return self.parser.parse_line(line)
+
+
+  def poll(self) -> Dict:
+    '''
+      Parses lines appended since the previous poll.
+      Returns dictionary:
+        new_steps: steps completed during this poll.
+        num_steps: number of geometries ("Standard orientation:" blocks) so far.
+        energies: SCF energies of all completed steps.
+        latest_energy, latest_step: latest energy and geometry, incl. step not yet completed.
+        optimization_converged: "Stationary point found" has been seen.
+        terminated: termination line of the log, "" if job is still running,
+          see quiet_period_seconds.
+    '''
+
+    new_steps = []
+    file_size, file_mtime, file_inode = 0, 0, 0
+    if self.file_path.is_file():
+      stat = self.file_path.stat()
+      file_size, file_mtime, file_inode = stat.st_size, stat.st_mtime, stat.st_ino
+
+    if file_size < self.offset or (self.offset > 0 and file_inode != self.file_inode):
+      self.reset()
+    elif self.offset > 0 and file_mtime != self.file_mtime and not self.is_parsed_tail_unchanged():
+      self.reset()
+
+    self.file_mtime = file_mtime
+    self.file_inode = file_inode
+
+    if file_size > self.offset:
+      with open(self.file_path, "rb") as f:
+        f.seek(self.offset)
+
+        while file_size > self.offset:
+          data = f.read(min(self.chunk_size, file_size - self.offset))
+          # parse complete lines only
+          end = data.rfind(b"\n") + 1
+          if end < 1:
+            break
+
+          f.seek(self.offset + end)
+          self.offset += end
+          self.tail_bytes = (self.tail_bytes + data[:end])[-self.tail_window_size:]
+
+          for line in data[:end].decode().splitlines():
+            step = self.parse_line(line)
+            if step != None:
+              new_steps.append(step)
+
+    if len(self.terminated) < 1 and len(self.termination_line) > 0 \
+        and time.time() - self.file_mtime >= self.quiet_period_seconds:
+      self.terminated = self.termination_line
+      # end of log: step being parsed is complete
+      step = self.parser.complete_step()
+      if step != None:
+        new_steps.append(step)
+
+    for step in new_steps:
+      self.steps_energies.append(step.energy)
+      self.latest_step = step
+
+    return {
+      "file_path": str(self.file_path),
+      "new_steps": new_steps,
+      "num_steps": self.num_steps,
+      "energies": list(self.steps_energies),
+      "latest_energy": self.get_latest_energy(),
+      "latest_step": self.get_latest_step(),
+      "optimization_converged": self.optimization_converged,
+      "terminated": self.terminated,
+    }
+
+
+  def is_parsed_tail_unchanged(self) -> bool:
+    '''
+      Compares the last parsed bytes (tail_bytes) with the same byte range of the file.
+    '''
+    with open(self.file_path, "rb") as f:
+      f.seek(self.offset - len(self.tail_bytes))
+      return f.read(len(self.tail_bytes)) == self.tail_bytes
+
+
+  def reset(self):
+    self.offset = 0
+    self.tail_bytes = b""
+    self.parser = OptimizationStepParser()
+    self.steps_energies = []
+    self.latest_step = None
+    self.optimization_converged = False
+    self.termination_line = ""
+    self.terminated = ""
+
+
+@dataclass
+class GaussianLogMonitor():
+  '''
+    Follows many running Gaussian jobs, see GaussianLogFollower.
+  '''
+  file_paths: List[Path] = field(default_factory=list)
+  quiet_period_seconds: float = 30
+  followers: Dict[str, GaussianLogFollower] = field(init=False, repr=False, default_factory=dict)
+
+
+  def __post_init__(self):
+    paths = self.file_paths
+    self.file_paths = []
+    for p in paths:
+      self.add(p)
+
+
+  def __len__(self) -> int:
+    return len(self.followers)
+
+
+  def add(self, file_path: Union[str, Path]):
+    key = str(Path(file_path))
+    if key not in self.followers:
+      self.followers[key] = GaussianLogFollower(
+                                    file_path=file_path,
+                                    quiet_period_seconds=self.quiet_period_seconds
+                                  )
+      self.file_paths.append(Path(file_path))
+
+
+  def is_running(self) -> bool:
+    return any(len(x.terminated) < 1 for x in self.followers.values())
+
+
+  def iter_updates(
+                    self,
+                    poll_interval_seconds: float=60,
+                    max_polls: int=None
+                  ) -> Iterator[Dict[str, Dict]]:
+    '''
+      Polls all logs every poll_interval_seconds and yields results of poll(),
+      until all jobs have terminated or max_polls is reached.
+    '''
+    num_polls = 0
+    while max_polls == None or num_polls < max_polls:
+      yield self.poll()
+      num_polls += 1
+      if not self.is_running():
+        break
+      time.sleep(poll_interval_seconds)
+
+
+  def poll(self) -> Dict[str, Dict]:
+    '''
+      Returns { file_path: GaussianLogFollower.poll() result }
+      Logs that don't exist yet are skipped.
+    '''
+    return {
+      k: x.poll() for k, x in self.followers.items() if x.file_path.is_file()
+    }
+
+
+  def remove(self, file_path: Union[str, Path]):
+    key = str(Path(file_path))
+    if key in self.followers:
+      self.followers.pop(key)
+      self.file_paths = [x for x in self.file_paths if str(x) != key]
@@ -1,14 +1,20 @@
 import copy
+from collections import deque
 from datetime import datetime
+from functools import partial
 from itertools import chain
 import json
 import numpy as np
 import os
 from pathlib import Path
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Dict, Iterable, List, Tuple, Union
 
 import ase_utils as au
 import constants as C
+from gaussian_log import GaussianLog, GaussianLogIndex, OptimizationStep, open_gaussian_log, read_gaussian_log
+from gaussian_log import count_marker_lines, find_energy_lines, get_energy_from_scf_done_line, iter_optimization_steps
+from result_cache import ResultCache
+from result_journal import ResultJournal
 import utils as ut
 import xyz_parser
 
@@ -17,8 +23,117 @@ import xyz_parser
 ################################################################
 
 
+def get_block_start_line_nrs(
+                              lines: Union[List[str], GaussianLog],
+                              search_text: str,
+                              between_lines: Tuple[int,int]=None
+                              ) -> List[int]:
+  '''
+    Same as ut.get_block_start_line_nrs(), but uses the marker index if lines is GaussianLog.
+    between_lines: (start_line_nr, end_line_nr), end is exclusive.
+  '''
+
+  if isinstance(lines, GaussianLog):
+    return lines.get_block_start_line_nrs(
+                                          search_text=search_text,
+                                          between_lines=between_lines
+                                          )
+
+  if not between_lines:
+    return ut.get_block_start_line_nrs(lines=lines, search_text=search_text)
+
+  start_nr, end_nr = between_lines
+  return [start_nr + i for i in ut.get_block_start_line_nrs(
+                                                    lines=lines[start_nr:end_nr],
+                                                    search_text=search_text
+                                                  )]
+
+
+def get_marker_positions(
+                          lines: Union[List[str], GaussianLog, GaussianLogIndex],
+                          search_text: str
+                          ) -> List[int]:
+  '''
+    Positions of the lines containing search_text, for read_line_at():
+    line numbers, or byte offsets if lines is GaussianLogIndex.
+  '''
+
+  if isinstance(lines, GaussianLogIndex):
+    return lines.get_marker_offsets(search_text=search_text)
+
+  return get_block_start_line_nrs(lines=lines, search_text=search_text)
+
+
+def read_line_at(
+                  lines: Union[List[str], GaussianLog, GaussianLogIndex],
+                  position: int
+                  ) -> str:
+  '''
+    Line at position from get_marker_positions().
+  '''
+
+  return lines.read_line(offset=position) \
+          if isinstance(lines, GaussianLogIndex) \
+          else lines[position]
+
+
+def read_marker_lines(
+                      lines: Union[List[str], GaussianLog, GaussianLogIndex],
+                      search_text: str,
+                      num_lines: int=1
+                      ) -> List[str]:
+  '''
+    Returns num_lines lines, starting from the first line containing search_text.
+    Raises IndexError if search_text is not found.
+  '''
+
+  position = get_marker_positions(lines=lines, search_text=search_text)[0]
+
+  return lines.read_lines(offset=position, num_lines=num_lines) \
+          if isinstance(lines, GaussianLogIndex) \
+          else lines[position:(position + num_lines)]
+
+
+def read_last_lines(
+                    lines: Union[List[str], GaussianLog, GaussianLogIndex],
+                    num_lines: int
+                    ) -> List[str]:
+
+  return lines.read_last_lines(num_lines=num_lines) \
+          if isinstance(lines, GaussianLogIndex) \
+          else lines[-num_lines:]
+
+
+def read_step_summary_lines(
+                            lines: Union[List[str], GaussianLog, GaussianLogIndex],
+                            position: int
+                            ) -> List[str]:
+  '''
+    Lines around "SCF Done:" line at position: from the preceding dashed line
+    (at most 100 lines back) up to 2 lines after the "SCF Done:" line.
+  '''
+
+  if isinstance(lines, GaussianLogIndex):
+    res = lines.read_lines_before(offset=position, num_lines=100)
+    for i in range(len(res) - 1, -1, -1):
+      if "------------------------" in res[i]:
+        res = res[(i + 1):]
+        break
+
+    return res + lines.read_lines(offset=position, num_lines=3)
+
+  start_line = position
+  for j in range(100):
+    start_line -= 1
+    if "------------------------" in lines[start_line] or start_line < 0:
+      start_line += 1
+      break
+
+  return lines[start_line:(position + 3)]
+
+
 def write_xyz_from_gaussian_logfile(
-                                    log_file_path: Union[str, Path],
+                                    log_file_path: Union[str, Path, GaussianLog, GaussianLogIndex],
                                     output_path: Union[str, Path]
                                     ) -> int:
 
@@ -76,6 +191,10 @@ def transform_xyz_block_row(row: str) -> str:
   _, atomic_nr, _, x, y, z = row.lstrip().rstrip().split()[:6]
   element = C.atomic_numbers_to_elements[int(atomic_nr)]
 
+  return format_xyz_block_row(element=element, x=x, y=y, z=z)
+
+
+def format_xyz_block_row(element: str, x: str, y: str, z: str) -> str:
   len_el = len(element)
   len_x = len(x)
   len_y = len(y)
@@ -111,16 +230,36 @@ def extract_opt_step_as_xyz_lines(
   return final_xyz_block
 
 
-def extract_elapsed_time(lines: List[str]) -> str:
+def convert_optimization_step_to_xyz_lines(
+                                    step: OptimizationStep,
+                                    num_steps: int,
+                                    source_name: str
+                                  ) -> List[str]:
+  '''
+    Same xyz lines as extract_opt_step_as_xyz_lines(), from parsed OptimizationStep.
+    Coordinates are written with 6 decimals, as in "Standard orientation:" block.
+  '''
+
+  block = [format_xyz_block_row(
+                                element=C.atomic_numbers_to_elements[atomic_nr],
+                                x=f"{x:.6f}",
+                                y=f"{y:.6f}",
+                                z=f"{z:.6f}"
+                              ) for atomic_nr, (x, y, z) in zip(step.atomic_nrs, step.coords)]
+
+  description = f"{step.energy}, opt step {step.step_idx + 1} of {num_steps}, source: {source_name}"
+
+  return prepend_xyz_info(
+                          block,
+                          description=description
+                        )
+
+
+def extract_elapsed_time(lines: Union[List[str], GaussianLog, GaussianLogIndex]) -> str:
   res = ""
 
   try:
-    line_nr = ut.get_block_start_line_nrs(
-                                          lines=lines,
-                                          search_text="Elapsed time:"
-                                          )[0]
-
-    res = lines[line_nr].strip().replace(" days", "d").replace(" hours", "h").replace(" minutes", "m").replace(" seconds.", "s")
+    res = read_marker_lines(lines=lines, search_text="Elapsed time:")[0].strip().replace(" days", "d").replace(" hours", "h").replace(" minutes", "m").replace(" seconds.", "s")
     res = res.split(":")[1].strip()
   except:
     res = ""
@@ -128,19 +267,15 @@ def extract_elapsed_time(lines: List[str]) -> str:
   return res
 
 
-def extract_job_completion_datetime(lines: List[str]) -> str:
+def extract_job_completion_datetime(lines: Union[List[str], GaussianLog, GaussianLogIndex]) -> str:
   res = ""
 
   try:
     # completion time usually last line
-    res = lines[-1].strip()
+    res = read_last_lines(lines=lines, num_lines=1)[0].strip()
     if not "Normal termination of Gaussian" in res:
       # try error termination
-      line_nr = ut.get_block_start_line_nrs(
-                                            lines=lines,
-                                            search_text="Error termination via"
-                                            )[0]
-      res = lines[line_nr]
+      res = read_marker_lines(lines=lines, search_text="Error termination via")[0]
 
     res = res.split(" at ")[1]
     res = res.replace(".", "").strip()
@@ -153,16 +288,11 @@ def extract_job_completion_datetime(lines: List[str]) -> str:
   return res
 
 
-def extract_job_cpu_time(lines: List[str]) -> str:
+def extract_job_cpu_time(lines: Union[List[str], GaussianLog, GaussianLogIndex]) -> str:
   res = ""
 
   try:
-    line_nr = ut.get_block_start_line_nrs(
-                                          lines=lines,
-                                          search_text="Job cpu time:"
-                                          )[0]
-
-    res = lines[line_nr].strip().replace(" days", "d").replace(" hours", "h").replace(" minutes", "m").replace(" seconds.", "s")
+    res = read_marker_lines(lines=lines, search_text="Job cpu time:")[0].strip().replace(" days", "d").replace(" hours", "h").replace(" minutes", "m").replace(" seconds.", "s")
     res = res.split(":")[1].strip()
 
   except:
@@ -193,7 +323,7 @@ def get_total_minutes_from_elapsed_time(elapsed_time: str) -> int:
 
 
 def extract_final_xyz(
-                      file_path: Union[str, Path],
+                      file_path: Union[str, Path, GaussianLog, GaussianLogIndex],
                       ) -> List[str]:
 
   results_key = "results"
@@ -207,19 +337,34 @@ def extract_final_xyz(
 
   try:
 
-    lines = ut.read_text_file_as_lines(file_path=file_path)
+    if isinstance(file_path, GaussianLogIndex):
+      lines = file_path
+      start_offset = lines.get_marker_offsets(
+                    search_text="Unable to Open any file for archive entry."
+                    )[0]
+
+      end_offset = lines.get_marker_offsets(
+                    search_text="The archive entry for this job was punched."
+                    )[0]
 
-    start_line = ut.get_block_start_line_nrs(
-                  lines=lines,
-                  search_text="Unable to Open any file for archive entry."
-                  )[0]
+      archive_lines = lines.read_text(start=start_offset, end=end_offset).splitlines()
+
+    else:
+      lines = read_gaussian_log(file_path=file_path)
 
-    end_line = ut.get_block_start_line_nrs(
-                  lines=lines,
-                  search_text="The archive entry for this job was punched."
-                  )[0]
+      start_line = get_block_start_line_nrs(
+                    lines=lines,
+                    search_text="Unable to Open any file for archive entry."
+                    )[0]
 
-    new_str = "".join([lines[i].strip() for i in range(start_line, end_line)])
+      end_line = get_block_start_line_nrs(
+                    lines=lines,
+                    search_text="The archive entry for this job was punched."
+                    )[0]
+
+      archive_lines = lines[start_line:end_line]
+
+    new_str = "".join([x.strip() for x in archive_lines])
     new_lines = new_str.split("\\")
     new_lines = [x.strip() for x in new_lines]
     
@@ -245,7 +390,7 @@ def extract_final_xyz(
       ) for line in new_lines]
 
     num_atoms = len(new_lines)
-    description = f"final xyz from {file_path.name}"
+    description = f"final xyz from {lines.name}"
 
     res[results_key] = [f"{num_atoms}"] + [description] + new_lines
 
@@ -255,17 +400,20 @@ def extract_final_xyz(
   return res
 
 
-def extract_energy(lines: List[str]) -> str:
+def extract_energy(
+                    lines: Union[List[str], GaussianLog],
+                    between_lines: Tuple[int,int]=None
+                  ) -> str:
   res = ""
 
   try:
-    res = lines[ut.get_block_start_line_nrs(
+    res = lines[get_block_start_line_nrs(
                                             lines=lines,
-                                            search_text="SCF Done:"
+                                            search_text="SCF Done:",
+                                            between_lines=between_lines
                                             )[0]]
 
-    res = res.split("=")[1].strip()
-    res = res.split()[0].strip()
+    res = get_energy_from_scf_done_line(res)
 
   except:
     res = ""
@@ -273,13 +421,147 @@ def extract_energy(lines: List[str]) -> str:
   return res
 
 
-def extract_optimization_steps_as_xyz(
+def extract_energy_from_index(
+                              index: GaussianLogIndex,
+                              between_offsets: Tuple[int,int]=None
+                              ) -> str:
+  '''
+    Same as extract_energy(), but decodes only the "SCF Done:" line.
+  '''
+  res = ""
+
+  try:
+    res = index.read_line(index.get_marker_offsets(
+                                            search_text="SCF Done:",
+                                            between_offsets=between_offsets
+                                            )[0])
+
+    res = get_energy_from_scf_done_line(res)
+
+  except:
+    res = ""
+
+  return res
+
+
+def extract_optimization_steps_as_xyz_from_index(
+                                      index: GaussianLogIndex,
+                                      collect_to_single_list: bool
+                                      ) -> List[str]:
+  '''
+    Same as extract_optimization_steps_as_xyz(), but works on byte offsets of
+    memory-mapped log file: only xyz blocks and SCF Done lines are decoded.
+  '''
+
+  res = []
+  for i in range(index.get_num_steps()):
+    xyz = extract_optimization_step_as_xyz_from_index(index=index, step_idx=i)
+    res.extend(xyz) if collect_to_single_list else res.append(xyz)
+
+  return res
+
+
+def extract_optimization_step_as_xyz_from_index(
+                                      index: GaussianLogIndex,
+                                      step_idx: int
+                                      ) -> List[str]:
+  '''
+    Returns xyz lines of one optimization step, same as extract_optimization_steps_as_xyz()[step_idx].
+    Only the xyz block and the SCF Done lines of this step are decoded.
+    Raises IndexError if step_idx is out of range.
+  '''
+
+  # not copied by get_marker_offsets(): callers loop over all steps of long optimizations
+  xyz_block_offsets = index.markers["Standard orientation:"]
+  start_offset = xyz_block_offsets[step_idx]
+
+  num_steps = len(xyz_block_offsets)
+  i = step_idx % num_steps
+  end_offset = xyz_block_offsets[i + 1] if i < num_steps - 1 else index.file_size
+  energy = extract_energy_from_index(index=index, between_offsets=(start_offset, end_offset))
+  if len(energy) < 1 and i > 0:
+    # try previous: if converged then last two xyz blocks are identical and SCF Done is not shown for the last.
+    energy = extract_energy_from_index(index=index, between_offsets=(xyz_block_offsets[i - 1], start_offset))
+
+  # block: title, dashes, 2 header lines, dashes, xyz rows, dashes
+  block = index.read_block(block_name="Standard orientation:", idx=i)
+  if len(block) < 6:
+    raise ValueError(f"Incomplete xyz block of optimization step {i + 1} in {index.name}")
+
+  return prepend_xyz_info(
+                          [transform_xyz_block_row(x) for x in block[5:-1]],
+                          description=f"{energy}, opt step {i + 1} of {num_steps}, source: {index.name}"
+                        )
+
+
+def extract_optimization_steps_by_idxs(
+                                      file_path: Union[str, Path],
+                                      step_idxs: List[int],
+                                      use_sidecar_index: bool=False
+                                      ) -> Dict[int, List[str]]:
+  '''
+    Returns { step_idx: xyz lines } of selected optimization steps only,
+    same xyz lines as in extract_optimization_steps_as_xyz().
+    step_idxs are 0-based, negative values count from the end: -1 is the last step.
+    Indices out of range are left out.
+
+    Uncompressed log is not parsed: blocks are read directly at byte offsets of GaussianLogIndex,
+    that is saved next to the log file if use_sidecar_index is True (see GaussianLogIndex.use_sidecar).
+  '''
+
+  if ut.is_compressed_file(file_path):
+    xyz_steps = extract_optimization_steps_as_xyz(file_path=file_path, collect_to_single_list=False)
+    return {i: xyz_steps[i] for i in step_idxs if -len(xyz_steps) <= i < len(xyz_steps)}
+
+  res = {}
+  with GaussianLogIndex(file_path=file_path, use_sidecar=use_sidecar_index) as index:
+    num_steps = index.get_num_steps()
+    for step_idx in step_idxs:
+      if -num_steps <= step_idx < num_steps:
+        res[step_idx] = extract_optimization_step_as_xyz_from_index(index=index, step_idx=step_idx)
+
+  return res
+
+
+def extract_optimization_step_as_xyz(
                                       file_path: Union[str, Path],
+                                      step_nr: int
+                                      ) -> List[str]:
+  '''
+    Returns xyz lines of one optimization step, see select_optimization_step().
+    Streams the log file: only the selected step is kept in memory.
+  '''
+
+  num_steps = 0
+  selected_step = None
+  for step in iter_optimization_steps(file_path=file_path):
+    num_steps += 1
+    if selected_step == None or step_nr < 1 or step.step_idx < step_nr:
+      selected_step = step
+
+  if selected_step == None:
+    raise ValueError(f"Optimization steps not found in {Path(file_path).name}")
+
+  return convert_optimization_step_to_xyz_lines(
+                                    step=selected_step,
+                                    num_steps=num_steps,
+                                    source_name=Path(file_path).name
+                                  )
+
+
+def extract_optimization_steps_as_xyz(
+                                      file_path: Union[str, Path, GaussianLog, GaussianLogIndex],
                                       collect_to_single_list: bool
                                       ) -> List[str]:
 
-  lines = ut.read_text_file_as_lines(file_path=file_path)
-  xyz_block_lines = ut.get_block_start_line_nrs(
+  if isinstance(file_path, GaussianLogIndex):
+    return extract_optimization_steps_as_xyz_from_index(
+                                      index=file_path,
+                                      collect_to_single_list=collect_to_single_list
+                                      )
+
+  lines = read_gaussian_log(file_path=file_path)
+  xyz_block_lines = get_block_start_line_nrs(
                                                 lines=lines,
                                                 search_text="Standard orientation:"
                                                 )
@@ -289,12 +571,12 @@ def extract_optimization_steps_as_xyz(
   for i in range(num_steps):
     start_line = xyz_block_lines[i]
     end_line = xyz_block_lines[i + 1] if i < num_steps - 1 else len(lines)
-    energy = extract_energy(lines=lines[start_line:end_line])
+    energy = extract_energy(lines=lines, between_lines=(start_line, end_line))
     if len(energy) < 1 and i > 0:
       # try previous: if converged then last two xyz blocks are identical and SCF Done is not shown for the last.
-      energy = extract_energy(lines=lines[xyz_block_lines[i - 1]:start_line])
+      energy = extract_energy(lines=lines, between_lines=(xyz_block_lines[i - 1], start_line))
 
-    description = f"{energy}, opt step {i + 1} of {num_steps}, source: {file_path.name}"
+    description = f"{energy}, opt step {i + 1} of {num_steps}, source: {lines.name}"
     xyz = extract_opt_step_as_xyz_lines(
                                         lines=lines,
                                         between_lines=(start_line, end_line),
@@ -305,14 +587,102 @@ def extract_optimization_steps_as_xyz(
   return res
 
 
-def extract_chemical_formula(lines: List[str]) -> str:
+def extract_optimization_steps_as_arrays(
+                                      file_path: Union[str, Path, GaussianLog, GaussianLogIndex]
+                                      ) -> Dict:
+  '''
+    Numeric version of extract_optimization_steps_as_xyz():
+    rows of all "Standard orientation:" blocks are converted to numbers in bulk,
+    without intermediate xyz strings.
+
+    Returns Dictionary {
+      "coords": np.ndarray (num_steps, num_atoms, 3), Angstroms
+      "atomic_nrs": np.ndarray (num_atoms,)
+      "energies": np.ndarray (num_steps,), np.nan if not found
+      "source": file name
+    }
+  '''
+
+  if isinstance(file_path, GaussianLogIndex):
+    lines = file_path
+    block_offsets = lines.get_marker_offsets(search_text="Standard orientation:")
+    block_bounds = [
+      (x, block_offsets[i + 1] if i < len(block_offsets) - 1 else lines.file_size)
+      for i, x in enumerate(block_offsets)
+    ]
+
+    blocks_text = "".join(["\n".join(lines.read_lines_until(
+                                                offset=x,
+                                                search_text="--------------------------------------------",
+                                                skip_lines=5
+                                              )) + "\n" for x, _ in block_bounds])
+
+    energies = [extract_energy_from_index(index=lines, between_offsets=x) for x in block_bounds]
+
+  else:
+    lines = read_gaussian_log(file_path=file_path)
+    block_line_nrs = get_block_start_line_nrs(lines=lines, search_text="Standard orientation:")
+    block_bounds = [
+      (x, block_line_nrs[i + 1] if i < len(block_line_nrs) - 1 else len(lines))
+      for i, x in enumerate(block_line_nrs)
+    ]
+
+    blocks_text = ""
+    for x in block_bounds:
+      start_nr, end_nr = get_start_end_line_nr_for_xyz_block(lines=lines.lines, between_lines=x)
+      blocks_text += "".join(lines[start_nr:end_nr])
+
+    energies = [extract_energy(lines=lines, between_lines=x) for x in block_bounds]
+
+  # if converged then last two xyz blocks are identical and SCF Done is not shown for the last.
+  energies = [x if len(x) > 0 or i < 1 else energies[i - 1] for i, x in enumerate(energies)]
+
+  num_steps = len(block_bounds)
+  # columns: center nr, atomic nr, atomic type, x, y, z
+  rows = np.fromstring(blocks_text, sep=" ")
+  if num_steps < 1 or rows.size % (num_steps * 6) != 0:
+    raise ValueError(f"Unexpected format of Standard orientation blocks in {lines.name}")
+
+  rows = rows.reshape(num_steps, -1, 6)
+
+  return {
+    "coords": rows[:, :, 3:6].copy(),
+    "atomic_nrs": rows[0, :, 1].astype(int),
+    "energies": np.array([float(x) if len(x) > 0 else np.nan for x in energies]),
+    "source": lines.name,
+  }
+
+
+def create_ase_atoms_list_from_gaussian_log(
+                              file_path: Union[str, Path, GaussianLog, GaussianLogIndex],
+                              name: str=None,
+                              ) -> List[Any]:
+  '''
+    Returns optimization steps as list of Atoms, via extract_optimization_steps_as_arrays(),
+    i.e. without writing and parsing xyz text.
+    Atoms info: name (name_1, name_2, ... for steps), description (energy, step nr), source.
+  '''
+
+  steps = extract_optimization_steps_as_arrays(file_path=file_path)
+  num_steps = len(steps["coords"])
+  name = Path(steps["source"]).stem if name == None else name
+
+  return [au.create_ase_atoms(
+                      atomic_nrs=steps["atomic_nrs"],
+                      coords=coords,
+                      info={
+                        "name": f"{name}_{i + 1}" if num_steps > 1 else name,
+                        "description": f"{energy}, opt step {i + 1} of {num_steps}",
+                        "source": steps["source"],
+                      }
+                    ) for i, (coords, energy) in enumerate(zip(steps["coords"], steps["energies"]))]
+
+
+def extract_chemical_formula(lines: Union[List[str], GaussianLog, GaussianLogIndex]) -> str:
   res = ""
 
   try:
-    res = lines[ut.get_block_start_line_nrs(
-                                            lines=lines,
-                                            search_text="Framework group"
-                                            )[0]].strip()
+    res = read_marker_lines(lines=lines, search_text="Framework group")[0].strip()
 
     res = res.split("(")[1]
     res = res.split(")")[0].strip()
@@ -323,14 +693,11 @@ def extract_chemical_formula(lines: List[str]) -> str:
   return res
 
 
-def extract_gaussian_version(lines: List[str]) -> str:
+def extract_gaussian_version(lines: Union[List[str], GaussianLog, GaussianLogIndex]) -> str:
   res = ""
 
   try:
-    res = lines[ut.get_block_start_line_nrs(
-                                            lines=lines,
-                                            search_text="Cite this work as:"
-                                            )[0] + 1].strip()
+    res = read_marker_lines(lines=lines, search_text="Cite this work as:", num_lines=2)[1].strip()
 
   except:
     res = ""
@@ -338,16 +705,13 @@ def extract_gaussian_version(lines: List[str]) -> str:
   return res
 
 
-def extract_dft_info(lines: List[str]) -> str:
+def extract_dft_info(lines: Union[List[str], GaussianLog, GaussianLogIndex]) -> str:
   res = ""
 
   try:
-    dft_info_line_nr = ut.get_block_start_line_nrs(
-                                              lines=lines,
-                                              search_text="Rotational constants"
-                                              )[0] + 1
-    basis_functions_info = lines[dft_info_line_nr].strip()
-    electrons_info = lines[dft_info_line_nr + 1].strip()
+    dft_info_lines = read_marker_lines(lines=lines, search_text="Rotational constants", num_lines=3)
+    basis_functions_info = dft_info_lines[1].strip()
+    electrons_info = dft_info_lines[2].strip()
     res = f"{basis_functions_info}, {electrons_info}"
 
   except:
@@ -356,14 +720,11 @@ def extract_dft_info(lines: List[str]) -> str:
   return res
 
 
-def extract_gaussian_command_and_dft_functional(lines: List[str]) -> Tuple[str, str]:
+def extract_gaussian_command_and_dft_functional(lines: Union[List[str], GaussianLog, GaussianLogIndex]) -> Tuple[str, str]:
   res = ("", "")
 
   try:
-    gaussian_command = lines[ut.get_block_start_line_nrs(
-                                              lines=lines,
-                                              search_text=" #"
-                                              )[0]].strip()
+    gaussian_command = read_marker_lines(lines=lines, search_text=" #")[0].strip()
     dft_functional = gaussian_command.split()[1]
     res = (gaussian_command, dft_functional)
 
@@ -374,17 +735,22 @@ def extract_gaussian_command_and_dft_functional(lines: List[str]) -> Tuple[str,
 
 
 def extract_scf_summary(
-                        file_path: Union[str, Path],
+                        file_path: Union[str, Path, GaussianLog, GaussianLogIndex],
                         collect_to_single_list: bool,
                         max_step_nr: int=0,
                         ignore_shorter_runs: bool=False,
                         return_converged_only: bool=False
                         ) -> List[str]:
+  '''
+    If file_path is a GaussianLogIndex, then only the lines needed for the summary are decoded.
+  '''
 
   skip = False # if error is found then skip subsequent code block
 
   result_summary_dict = {}
-  lines = ut.read_text_file_as_lines(file_path=file_path)
+  lines = file_path \
+            if isinstance(file_path, GaussianLogIndex) \
+            else read_gaussian_log(file_path=file_path)
 
   result_summary_dict["gaussian_version"] = extract_gaussian_version(lines=lines)
 
@@ -395,15 +761,16 @@ def extract_scf_summary(
   result_summary_dict["dft_info"] = extract_dft_info(lines=lines)
   result_summary_dict["chemical_formula"] = extract_chemical_formula(lines=lines)
 
-  block_lines = ut.get_block_start_line_nrs(
-                                            lines=lines,
-                                            search_text="SCF Done:"
-                                            )
+  # line nrs, or byte offsets of GaussianLogIndex
+  block_lines = get_marker_positions(
+                                      lines=lines,
+                                      search_text="SCF Done:"
+                                      )
 
-  converged_line_nrs = ut.get_block_start_line_nrs(
-                                            lines=lines,
-                                            search_text="Stationary point found"
-                                            )
+  converged_line_nrs = get_marker_positions(
+                                      lines=lines,
+                                      search_text="Stationary point found"
+                                      )
 
   is_converged = True \
     if converged_line_nrs and len(converged_line_nrs) > 0 \
@@ -434,8 +801,8 @@ def extract_scf_summary(
   if not skip:
 
     try:
-      energy_start = float(lines[block_lines[0]].split("  ")[2])
-      energy_end = float(lines[block_lines[-1]].split("  ")[2])
+      energy_start = float(read_line_at(lines=lines, position=block_lines[0]).split("  ")[2])
+      energy_end = float(read_line_at(lines=lines, position=block_lines[-1]).split("  ")[2])
       energy_delta = energy_end - energy_start
       energy_delta_str = f"{round(energy_delta, 8)} a.u., {round(energy_delta * C.hartree_in_kcal_per_mol, 2)} kcal/mol, {round(energy_delta * C.hartree_in_kJ_per_mol, 2)} kJ/mol"
 
@@ -480,27 +847,21 @@ def extract_scf_summary(
       result_summary_dict["error"] = str(ex)
 
     scf_data = [separator_row, f"SCF: change in energy = {energy_delta_str}  {elapsed_time_str}  {minutes_per_step} min/step", separator_row] \
-      + [f"{i + 1}:" + " " * (4 - len(str(i + 1))) + lines[x].replace("\n", "") for i,x in enumerate(block_lines)] \
+      + [f"{i + 1}:" + " " * (4 - len(str(i + 1))) + read_line_at(lines=lines, position=x).replace("\n", "") for i,x in enumerate(block_lines)] \
       + ["\n"]
 
     text_lines.extend(scf_data) if collect_to_single_list else text_lines.append(scf_data)
 
     for i in range(num_steps):
-      start_line = block_lines[i]
-      for j in range(100):
-        start_line -= 1
-        if "------------------------" in lines[start_line] or start_line < 0:
-          start_line += 1
-          break
-
-      end_line = block_lines[i] + 3
       description = f"opt step {i + 1} of {num_steps}"
-      summary = [separator_row, description, separator_row] + lines[start_line:end_line] + ["\n"]
+      summary = [separator_row, description, separator_row] \
+                + read_step_summary_lines(lines=lines, position=block_lines[i]) \
+                + ["\n"]
       summary = [x.replace("\n", "") for x in summary]
       text_lines.extend(summary) if collect_to_single_list else text_lines.append(summary)
 
     # final message: wall time etc
-    final_block = [separator_row, "END", separator_row] + lines[-13:]
+    final_block = [separator_row, "END", separator_row] + read_last_lines(lines=lines, num_lines=13)
     final_block = [x.replace("\n", "") for x in final_block]
     text_lines.extend(final_block) if collect_to_single_list else text_lines.append(final_block)
 
@@ -510,8 +871,60 @@ def extract_scf_summary(
   return res
 
 
+def extract_energy_summary(
+                        file_path: Union[str, Path],
+                        max_step_nr: int=0,
+                        ignore_shorter_runs: bool=False,
+                        return_converged_only: bool=False
+                        ) -> Dict:
+  '''
+    Energy-only version of extract_scf_summary(): returns only the fields needed
+    for ranking (energies, number of steps, convergence), text summary is not built.
+    Errors are reported in the same cases as in extract_scf_summary().
+    The log is not read into memory, see gaussian_log.find_energy_lines().
+  '''
+
+  result_summary_dict = {}
+  energy_lines = find_energy_lines(file_path=file_path, max_num_scf_lines=max_step_nr)
+
+  is_converged = energy_lines["stationary_point_found"]
+  result_summary_dict["optimization_converged"] = is_converged
+
+  if return_converged_only and not is_converged:
+    result_summary_dict["error"] = "Optimization not converged"
+    return result_summary_dict
+
+  num_steps = energy_lines["num_scf_done"]
+  if ignore_shorter_runs and max_step_nr > 0 and 1 < num_steps < max_step_nr:
+    result_summary_dict["error"] = f"Too few optimization steps, num_steps_required={max_step_nr}, num_steps_available={num_steps}"
+    return result_summary_dict
+
+  if num_steps < 1:
+    result_summary_dict["error"] = "Did not find the phrase: 'SCF Done:' in the input file."
+    return result_summary_dict
+
+  if not energy_lines["elapsed_time_found"]:
+    result_summary_dict["error"] = "Did not find the phrase: 'Elapsed time:' in the input file."
+
+  try:
+    energy_start = float(energy_lines["scf_done_first"].split("  ")[2])
+    energy_end = float(energy_lines["scf_done_last"].split("  ")[2])
+    energy_delta = energy_end - energy_start
+
+    result_summary_dict["num_steps"] = num_steps
+    result_summary_dict["energy_start"] = energy_start
+    result_summary_dict["energy_end"] = energy_end
+    result_summary_dict["energy_delta"] = energy_delta
+    result_summary_dict["energy_delta_text"] = f"{round(energy_delta, 8)} a.u., {round(energy_delta * C.hartree_in_kcal_per_mol, 2)} kcal/mol, {round(energy_delta * C.hartree_in_kJ_per_mol, 2)} kJ/mol"
+
+  except Exception as ex:
+    result_summary_dict["error"] = str(ex)
+
+  return result_summary_dict
+
+
 def extract_and_write_scf_summary_from_gaussian_logfile(
-                                    log_file_path: Union[str, Path],
+                                    log_file_path: Union[str, Path, GaussianLog, GaussianLogIndex],
                                     output_path: Union[str, Path, None],
                                     max_step_nr: int=0,
                                     ignore_shorter_runs: bool=False,
@@ -550,14 +963,36 @@ def extract_and_write_scf_summary_from_gaussian_logfile(
 
 
 def write_optimization_steps_from_gaussian_logfile(
-                                    log_file_path: Union[str, Path],
+                                    log_file_path: Union[str, Path, GaussianLog, GaussianLogIndex],
                                     output_path: Union[str, Path]
                                     ) -> int:
+  '''
+    If log_file_path is a path, then the log is streamed step by step,
+    otherwise uses the already parsed GaussianLog or GaussianLogIndex.
+  '''
   try:
-    xyz_blocks = extract_optimization_steps_as_xyz(
-                                                  file_path=log_file_path,
-                                                  collect_to_single_list=True
-                                                  )
+    if isinstance(log_file_path, (str, Path)):
+      num_steps = count_marker_lines(
+                                      file_path=log_file_path,
+                                      search_text="Standard orientation:"
+                                    )
+
+      source_name = Path(log_file_path).name
+      xyz_blocks = chain.from_iterable(
+                      convert_optimization_step_to_xyz_lines(
+                                                        step=step,
+                                                        num_steps=num_steps,
+                                                        source_name=source_name
+                                                      )
+                      for step in iter_optimization_steps(file_path=log_file_path)
+                    )
+    elif isinstance(log_file_path, GaussianLogIndex):
+      xyz_blocks = extract_optimization_steps_as_xyz_from_index(index=log_file_path, collect_to_single_list=True)
+    else:
+      xyz_blocks = extract_optimization_steps_as_xyz(
+                                                    file_path=log_file_path,
+                                                    collect_to_single_list=True
+                                                    )
 
     return ut.write_text_file_from_lines(file_path=output_path, lines=xyz_blocks)
 
@@ -566,30 +1001,42 @@ def write_optimization_steps_from_gaussian_logfile(
 
 
 def write_last_optimization_step_from_gaussian_logfile(
-                                    log_file_path: Union[str, Path],
+                                    log_file_path: Union[str, Path, GaussianLog, GaussianLogIndex],
                                     output_path: Union[str, Path]
                                     ) -> int:
+  '''
+    If log_file_path is a path, then the log is streamed step by step,
+    otherwise uses the already parsed GaussianLog or GaussianLogIndex.
+  '''
   try:
-    xyz_blocks = extract_optimization_steps_as_xyz(
-                                                  file_path=log_file_path,
-                                                  collect_to_single_list=False
-                                                  )
+    if isinstance(log_file_path, (str, Path)):
+      last_block = extract_optimization_step_as_xyz(file_path=log_file_path, step_nr=0)
+    elif isinstance(log_file_path, GaussianLogIndex):
+      last_block = extract_optimization_step_as_xyz_from_index(index=log_file_path, step_idx=-1)
+    else:
+      xyz_blocks = extract_optimization_steps_as_xyz(
+                                                    file_path=log_file_path,
+                                                    collect_to_single_list=False
+                                                    )
+      last_block = xyz_blocks[-1]
 
-    last_block = xyz_blocks[-1]
     return ut.write_text_file_from_lines(file_path=output_path, lines=last_block)
 
   except Exception as ex:
     return str(ex)
 
 
-def get_gaussian_log_file_type(file_path: Union[str, Path]) -> str:
-
-  lines = ut.read_text_file_as_lines(file_path=file_path)
+def get_gaussian_log_file_type(file_path: Union[str, Path, GaussianLog, GaussianLogIndex]) -> str:
 
-  optimization_line_nrs = ut.get_block_start_line_nrs(
-        lines=lines,
-        search_text="GradGradGradGradGradGradGradGradGradGradGrad"
-      )
+  if isinstance(file_path, GaussianLogIndex):
+    optimization_line_nrs = file_path.get_marker_offsets(
+          search_text="GradGradGradGradGradGradGradGradGradGradGrad"
+        )
+  else:
+    optimization_line_nrs = get_block_start_line_nrs(
+          lines=read_gaussian_log(file_path=file_path),
+          search_text="GradGradGradGradGradGradGradGradGradGradGrad"
+        )
 
   res = "energy"
   if optimization_line_nrs and len(optimization_line_nrs) > 0:
@@ -598,76 +1045,240 @@ def get_gaussian_log_file_type(file_path: Union[str, Path]) -> str:
   return res
 
 
+def select_optimization_step(
+                              xyz_blocks: Iterable[Any],
+                              step_nr: int
+                              ) -> Any:
+  '''
+    Returns xyz block of the optimization step step_nr (1-based).
+    step_nr=0 or run shorter than step_nr: returns the last step.
+    xyz_blocks can be a list or a generator, e.g. iter_optimization_steps().
+    Generator is consumed only up to the selected step.
+  '''
+
+  if isinstance(xyz_blocks, list):
+    return xyz_blocks[-1] \
+            if step_nr < 1 or len(xyz_blocks) < step_nr \
+            else xyz_blocks[step_nr - 1]
+
+  last_blocks = deque(maxlen=1)
+  for i, x in enumerate(xyz_blocks):
+    last_blocks.append(x)
+    if i + 1 == step_nr:
+      break
+
+  return last_blocks[-1]
+
+
 def process_one_log_file(
                     input_path: Union[str, Path],
                     output_dir: Union[str, Path]=None,
                     extract_summary_step_nr: int=0,
                     ignore_shorter_runs: bool=False,
                     do_only_summary: bool=False,
-                    return_converged_only: bool=False
+                    return_converged_only: bool=False,
+                    return_opt_step_xyz: bool=False,
+                    energy_only: bool=False
                     ) -> Dict:
 
+  '''
+    Processes one Gaussian log file, see process_many_log_files().
+    The log file is indexed only once: all extractors run on the same GaussianLogIndex,
+    that decodes only the lines they need (compressed files: GaussianLog, read into memory).
+
+    return_opt_step_xyz: if True then result contains "opt_step_xyz":
+      xyz lines of the optimization step extract_summary_step_nr (last step if 0),
+      or None if optimization steps could not be extracted.
+
+    energy_only: if True then only energies and convergence are extracted, see extract_energy_summary().
+      No output files are written, do_only_summary is ignored.
+  '''
+
   out_dir = Path(input_path).parent \
               if output_dir == None \
               else Path(output_dir)
 
-  input_file_name_stem = Path(input_path).stem
+  if energy_only:
+    return process_one_log_file_energy_only(
+                                input_path=input_path,
+                                output_dir=out_dir,
+                                extract_summary_step_nr=extract_summary_step_nr,
+                                ignore_shorter_runs=ignore_shorter_runs,
+                                return_converged_only=return_converged_only,
+                                return_opt_step_xyz=return_opt_step_xyz
+                              )
+
+  input_file_name_stem = ut.get_file_stem(input_path)
 
   output_file_name_stem = input_file_name_stem \
                             if len(input_file_name_stem) > 3 \
                             else Path(input_path).parent.parts[-1]
 
-  task_results = {}
+  with open_gaussian_log(file_path=input_path) as log:
+    task_results = {}
 
-  if not do_only_summary:
-    gaussian_log_file_type = get_gaussian_log_file_type(file_path=input_path)
+    if not do_only_summary:
+      gaussian_log_file_type = get_gaussian_log_file_type(file_path=log)
 
-    output_path_xyz = Path(out_dir).joinpath(f"{output_file_name_stem}.xyz")
-    task_results["final_xyz"] = write_xyz_from_gaussian_logfile(
-                                      log_file_path=input_path,
-                                      output_path=output_path_xyz
+      output_path_xyz = Path(out_dir).joinpath(f"{output_file_name_stem}.xyz")
+      task_results["final_xyz"] = write_xyz_from_gaussian_logfile(
+                                        log_file_path=log,
+                                        output_path=output_path_xyz
+                                        )
+
+      if gaussian_log_file_type.startswith("optim"):
+        output_path_opt_steps = Path(out_dir).joinpath(f"{output_file_name_stem}_opt_steps.xyz")
+        task_results["opt_steps"] = write_optimization_steps_from_gaussian_logfile(
+                                          log_file_path=log,
+                                          output_path=output_path_opt_steps
+                                          )
+
+        output_path_last_opt_step = Path(out_dir).joinpath(f"{output_file_name_stem}_last_step.xyz")
+        task_results["last_opt_step"] = write_last_optimization_step_from_gaussian_logfile(
+                                          log_file_path=log,
+                                          output_path=output_path_last_opt_step
+                                          )
+      else:
+        output_path_standard_orientation = Path(out_dir).joinpath(f"{output_file_name_stem}_standard_orientation.xyz")
+        task_results["standard_orientation"] = write_last_optimization_step_from_gaussian_logfile(
+                                          log_file_path=log,
+                                          output_path=output_path_standard_orientation
+                                          )
+
+    output_path_scf = None \
+                      if do_only_summary \
+                      else Path(out_dir).joinpath(f"{output_file_name_stem}_scf_summary.txt")
+
+    task_results["scf_summary"] = extract_and_write_scf_summary_from_gaussian_logfile(
+                                      log_file_path=log,
+                                      output_path=output_path_scf,
+                                      max_step_nr=extract_summary_step_nr,
+                                      ignore_shorter_runs=ignore_shorter_runs,
+                                      return_converged_only=return_converged_only
                                       )
 
-    if gaussian_log_file_type.startswith("optim"):
-      output_path_opt_steps = Path(out_dir).joinpath(f"{output_file_name_stem}_opt_steps.xyz")
-      task_results["opt_steps"] = write_optimization_steps_from_gaussian_logfile(
-                                        log_file_path=input_path,
-                                        output_path=output_path_opt_steps
-                                        )
+    res = {
+        "input_path": str(input_path),
+        "output_dir": str(out_dir),
+        "results": task_results,
+      }
 
-      output_path_last_opt_step = Path(out_dir).joinpath(f"{output_file_name_stem}_last_step.xyz")
-      task_results["last_opt_step"] = write_last_optimization_step_from_gaussian_logfile(
-                                        log_file_path=input_path,
-                                        output_path=output_path_last_opt_step
-                                        )
-    else:
-      output_path_standard_orientation = Path(out_dir).joinpath(f"{output_file_name_stem}_standard_orientation.xyz")
-      task_results["standard_orientation"] = write_last_optimization_step_from_gaussian_logfile(
-                                        log_file_path=input_path,
-                                        output_path=output_path_standard_orientation
-                                        )
+    if return_opt_step_xyz:
+      try:
+        res["opt_step_xyz"] = extract_selected_optimization_step_as_xyz(
+                                                          log=log,
+                                                          step_nr=extract_summary_step_nr
+                                                        )
+      except:
+        res["opt_step_xyz"] = None
+
+  return res
 
-  output_path_scf = None \
-                    if do_only_summary \
-                    else Path(out_dir).joinpath(f"{output_file_name_stem}_scf_summary.txt")
 
-  task_results["scf_summary"] = extract_and_write_scf_summary_from_gaussian_logfile(
-                                    log_file_path=input_path,
-                                    output_path=output_path_scf,
-                                    max_step_nr=extract_summary_step_nr,
-                                    ignore_shorter_runs=ignore_shorter_runs,
-                                    return_converged_only=return_converged_only
-                                    )
+def extract_selected_optimization_step_as_xyz(
+                                              log: Union[GaussianLog, GaussianLogIndex],
+                                              step_nr: int
+                                              ) -> List[str]:
+  '''
+    Returns xyz lines of the optimization step step_nr, see select_optimization_step().
+    From GaussianLogIndex only the selected step is decoded, so an incomplete
+    (e.g. truncated) later step doesn't prevent extracting an earlier one.
+  '''
+
+  if isinstance(log, GaussianLogIndex):
+    num_steps = log.get_num_steps()
+    step_idx = step_nr - 1 if 0 < step_nr <= num_steps else -1
+    return extract_optimization_step_as_xyz_from_index(index=log, step_idx=step_idx)
+
+  return select_optimization_step(
+                                  xyz_blocks=extract_optimization_steps_as_xyz(
+                                                                  file_path=log,
+                                                                  collect_to_single_list=False
+                                                                ),
+                                  step_nr=step_nr
+                                )
+
+
+def process_one_log_file_energy_only(
+                    input_path: Union[str, Path],
+                    output_dir: Union[str, Path],
+                    extract_summary_step_nr: int=0,
+                    ignore_shorter_runs: bool=False,
+                    return_converged_only: bool=False,
+                    return_opt_step_xyz: bool=False
+                    ) -> Dict:
+
+  '''
+    Same result structure as process_one_log_file(), but results contain only "scf_summary"
+    from extract_energy_summary(). Xyz of the selected step is read directly at its offset.
+  '''
+
+  scf_summary = extract_energy_summary(
+                                file_path=input_path,
+                                max_step_nr=extract_summary_step_nr,
+                                ignore_shorter_runs=ignore_shorter_runs,
+                                return_converged_only=return_converged_only
+                              )
 
   res = {
       "input_path": str(input_path),
-      "output_dir": str(out_dir),
-      "results": task_results,
+      "output_dir": str(output_dir),
+      "results": {
+          "scf_summary": {"scf_summary_file": "", **scf_summary},
+        },
     }
 
+  if return_opt_step_xyz:
+    # shorter run than extract_summary_step_nr: last step, as in select_optimization_step()
+    step_idx = extract_summary_step_nr - 1 if extract_summary_step_nr > 0 else -1
+    try:
+      xyz_steps = extract_optimization_steps_by_idxs(
+                                      file_path=input_path,
+                                      step_idxs=[step_idx, -1]
+                                    )
+      res["opt_step_xyz"] = xyz_steps[step_idx] if step_idx in xyz_steps else xyz_steps[-1]
+    except:
+      res["opt_step_xyz"] = None
+
   return res
 
 
+def process_one_log_file_catch_errors(
+                    input_path: Union[str, Path],
+                    output_dir: Union[str, Path]=None,
+                    **kwargs
+                    ) -> Dict:
+
+  '''
+    Same as process_one_log_file(), but does not raise:
+    exception message is returned in results["scf_summary"]["error"],
+    so that process_many_log_files() reports it in "aggregate_error".
+  '''
+
+  try:
+    return process_one_log_file(
+                                input_path=input_path,
+                                output_dir=output_dir,
+                                **kwargs
+                              )
+
+  except Exception as ex:
+    out_dir = Path(input_path).parent \
+                if output_dir == None \
+                else Path(output_dir)
+
+    return {
+        "input_path": str(input_path),
+        "output_dir": str(out_dir),
+        "results": {
+            "scf_summary": {
+                "scf_summary_file": "",
+                "error": str(ex),
+              },
+          },
+      }
+
+
 def process_many_log_files(
                             input_paths: List[Union[str, Path]],
                             output_dir: Union[str, Path]=None,
@@ -677,7 +1288,13 @@ def process_many_log_files(
                             do_only_summary: bool=False,
                             return_converged_only: bool=False,
                             write_last_opt_steps_file_path: Path=None,
-                            show_errors_in_output: bool=True
+                            show_errors_in_output: bool=True,
+                            workers: int=1,
+                            chunksize: int=1,
+                            cache: ResultCache=None,
+                            energy_only: bool=False,
+                            journal_path: Path=None,
+                            use_bulk_writer: bool=False
                             ) -> Dict:
 
   '''
@@ -713,16 +1330,85 @@ def process_many_log_files(
     show_errors_in_output: whether occurred errors are returned in the final output.
       default = True
 
+    workers: number of processes, log files are processed in parallel if workers > 1.
+      Errors of individual log files are then reported in "aggregate_error" of the item,
+      they don't stop processing of the other files.
+      If workers = 1, then exception of a log file is raised (results processed
+      so far are kept in the journal, if journal_path is specified).
+      default = 1
+
+    chunksize: number of log files sent to a worker process at once, if workers > 1.
+      default = 1
+
+    cache: if specified then results of process_one_log_file are taken from the cache,
+      only new or modified log files are processed. Output files of cached items
+      (xyz, scf summary) are not written again.
+      default = None
+
+    energy_only: if True then only energies, number of steps and convergence are extracted
+      for ranking, without the text summaries and output files of each log file.
+      Much faster for large numbers of logs, see extract_energy_summary().
+      default = False
+
+    journal_path: if specified then result of each log file is appended to this
+      json-lines file as soon as it is processed. If the run is interrupted, then
+      call again with the same arguments: log files already in the journal are not processed again.
+      Results with errors are not journaled, these log files are processed again.
+      Journal is kept after the run, delete it to start from scratch.
+      default = None
+
+    use_bulk_writer: if True then the xyz files of write_last_opt_steps_file_path
+      are written with xyz_parser.write_xyz_arrays(), see au.write_ase_atoms_to_xyz_file().
+      default = False
+
   '''
 
-  res = [process_one_log_file(
-            x,
-            output_dir,
-            extract_summary_step_nr=extract_summary_step_nr,
-            ignore_shorter_runs=ignore_shorter_runs,
-            do_only_summary=do_only_summary,
-            return_converged_only=return_converged_only
-          ) for x in input_paths]
+  process_log_file_options = {
+            "output_dir": None if output_dir == None else str(output_dir),
+            "extract_summary_step_nr": extract_summary_step_nr,
+            "ignore_shorter_runs": ignore_shorter_runs,
+            "do_only_summary": do_only_summary,
+            "return_converged_only": return_converged_only,
+            "return_opt_step_xyz": write_last_opt_steps_file_path != None,
+            "energy_only": energy_only,
+          }
+
+  # serial run raises on the first failing log file, as process_one_log_file() does
+  process_log_file = partial(
+            process_one_log_file_catch_errors if workers != None and workers > 1 else process_one_log_file,
+            **process_log_file_options
+          )
+
+  journal = ResultJournal(journal_path=journal_path, options=process_log_file_options) \
+              if journal_path != None \
+              else None
+
+  journal_results = journal.read() if journal != None else {}
+
+  res = [journal_results.get(str(x), None) for x in input_paths]
+
+  if cache != None:
+    res = [cache.get(file_path=x, options=process_log_file_options) if res_item == None else res_item \
+            for x, res_item in zip(input_paths, res)]
+
+  idxs_to_process = [i for i, x in enumerate(res) if x == None]
+
+  processed_items = ut.map_parallel(
+                            func=process_log_file,
+                            items=[input_paths[i] for i in idxs_to_process],
+                            workers=workers,
+                            chunksize=chunksize
+                          )
+
+  for idx, res_item in zip(idxs_to_process, processed_items):
+    res[idx] = res_item
+    if journal != None:
+      journal.append(file_path=input_paths[idx], result=res_item)
+    if cache != None:
+      cache.put(file_path=input_paths[idx], options=process_log_file_options, result=res_item)
+
+  # xyz of the selected opt step is needed only for the aggregate xyz file, not in the json output
+  opt_step_xyz = {x["input_path"]: x.pop("opt_step_xyz", None) for x in res}
 
   summary = {}
   errors = []
@@ -747,7 +1433,7 @@ def process_many_log_files(
       items_with_errors.append(res_item)
     else:
       valid_items.append(res_item)
-      valid_paths.append(input_paths[idx])
+      valid_paths.append(res_item["input_path"])
 
   # items_with_errors = [x for x in res if "energy_end" not in x["results"]["scf_summary"]]
   if len(items_with_errors) > 0:
@@ -794,29 +1480,16 @@ def process_many_log_files(
       valid_paths_sorted = {}
 
     if len(valid_paths_sorted) > 0:
-      valid_paths = [Path(k) for k, _ in valid_paths_sorted.items()]
+      valid_paths = list(valid_paths_sorted.keys())
 
     try:
-      if extract_summary_step_nr > 0:
-        last_opt_steps_all_runs = [extract_optimization_steps_as_xyz(
-                                                      file_path=x,
-                                                      collect_to_single_list=False
-                                                      ) for x in valid_paths]
-
-        # shorter runs should be already filtered out above and reflected in valid_paths
-        # take last run or specified run if available
-        last_opt_steps_xyz = [
-                              x[-1] \
-                                if len(x) < extract_summary_step_nr \
-                                else x[extract_summary_step_nr - 1]
-                              for x in last_opt_steps_all_runs
-                            ]
-
-      else:
-        last_opt_steps_xyz = [extract_optimization_steps_as_xyz(
-                                                      file_path=x,
-                                                      collect_to_single_list=False
-                                                      )[-1] for x in valid_paths]
+      # shorter runs should be already filtered out above and reflected in valid_paths
+      # step xyz is taken from the results of process_one_log_file: last step or the step specified
+      # valid_paths and opt_step_xyz are both keyed by "input_path" of the result
+      last_opt_steps_xyz = [opt_step_xyz[x] for x in valid_paths]
+      missing_paths = [x for x, xyz in zip(valid_paths, last_opt_steps_xyz) if xyz == None]
+      if len(missing_paths) > 0:
+        raise ValueError(f"Optimization steps not found: {missing_paths}")
 
       dicts = [xyz_parser.convert_xyz_lines_to_dict(x, convert_coords_to_float=True) for x in last_opt_steps_xyz]
 
@@ -824,24 +1497,21 @@ def process_many_log_files(
 
       aggregate_xyz_res = au.write_ase_atoms_to_xyz_file(
                 atoms_list=mols,
-                output_path=write_last_opt_steps_file_path
+                output_path=write_last_opt_steps_file_path,
+                use_bulk_writer=use_bulk_writer
               )
 
-      aligned_mols = [
-          au.align_2_molecules_min_rmsd(
-                                      target=mols[0],
-                                      atoms_to_align=x
-                                    ) for x in mols
-        ]
-
-      out_file_stem = write_last_opt_steps_file_path.stem
-      out_file_suffix = write_last_opt_steps_file_path.suffix
+      out_file_stem = ut.get_file_stem(write_last_opt_steps_file_path)
+      # suffix incl. compression suffix, e.g. ".xyz.gz"
+      out_file_suffix = write_last_opt_steps_file_path.name[len(out_file_stem):]
       aligned_file_name = f"{out_file_stem}_aligned{out_file_suffix}"
       aligned_mols_path = write_last_opt_steps_file_path.parent.joinpath(aligned_file_name)
 
       aggregate_xyz_res = au.write_ase_atoms_to_xyz_file(
-                atoms_list=aligned_mols,
-                output_path=aligned_mols_path
+                atoms_list=mols,
+                output_path=aligned_mols_path,
+                coords=au.get_aligned_positions(target=mols[0], mols=mols),
+                use_bulk_writer=use_bulk_writer
               )
 
       summary["last_opt_steps_file"] = aggregate_xyz_res
@@ -871,11 +1541,26 @@ def create_gaussian_job_files_from_xyz_steps(
                               step_nrs_to_write: Union[None, List[int]],
                               job_file_name_prefix: Union[None, str],
                             ) -> List[Path]:
+  '''
+    input_path: xyz file or Gaussian log file (.log, .out).
+    From log file only the steps in step_nrs_to_write are read, see extract_optimization_steps_by_idxs():
+      index of the log is saved next to it, so that job files of other steps are created without re-scanning the log.
+  '''
 
-  xyz_steps = xyz_parser.read_xyz_file(
-                                        input_path=input_path,
-                                        convert_coords_to_float=False
-                                      )
+  if ut.get_file_suffix(input_path) in [".log", ".out"]:
+    xyz_steps = extract_optimization_steps_by_idxs(
+                                      file_path=input_path,
+                                      step_idxs=[x - 1 for x in step_nrs_to_write if x >= 0],
+                                      use_sidecar_index=True
+                                    )
+    xyz_lines_by_step_nr = {k + 1: x[2:] for k, x in xyz_steps.items()}
+  else:
+    xyz_steps = xyz_parser.read_xyz_file(
+                                          input_path=input_path,
+                                          convert_coords_to_float=False
+                                        )
+    xyz_lines_by_step_nr = {x: xyz_steps[x - 1]["xyz_lines"] \
+                              for x in step_nrs_to_write if x >= 0 and x <= len(xyz_steps)}
 
   res = []
 
@@ -885,16 +1570,15 @@ def create_gaussian_job_files_from_xyz_steps(
                         else job_file_name_prefix
 
   for step_nr in step_nrs_to_write:
-    if step_nr >= 0 and step_nr <= len(xyz_steps):
+    if step_nr in xyz_lines_by_step_nr:
       job_file_name = Path(output_dir).joinpath(f"{file_name_prefix}{step_nr}.gjf")
-      xyz = xyz_steps[step_nr - 1]
       name_idx = len(lines_before_xyz_coords) -  3
 
       lines_prepend = [f"{x}_{step_nr}" \
                          if i == name_idx \
                          else x for i,x in enumerate(lines_before_xyz_coords)]
 
-      job_file_lines = lines_prepend + xyz["xyz_lines"] + [" "] # add space in the end just in case. Gaussian may crash if not sapce in the end ?!
+      job_file_lines = lines_prepend + xyz_lines_by_step_nr[step_nr] + [" "] # add space in the end just in case. Gaussian may crash if not sapce in the end ?!
       ut.write_text_file_from_lines(
                                   file_path=job_file_name,
                                   lines=job_file_lines
@@ -1,6 +1,7 @@
+from itertools import chain, islice
 import numpy as np
 from pathlib import Path
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Dict, Iterable, List, Tuple, Union
 import pandas as pd
 
 from ase import Atoms
@@ -100,30 +101,33 @@ def analyze_by_features_to_dataframe(
 
 
 def calculate_values_groupby_features(
-                                      molecules: List[Atoms],
+                                      molecules: Iterable[Atoms],
                                       features_list: List[ft.Feature]
                                       ) -> List[SeriesItem]:
+  '''
+    molecules are iterated only once: can be a generator, e.g. au.iter_ase_atoms_from_xyz_file(),
+    then only one molecule at a time is kept in memory.
+  '''
 
-  res = []
- 
-  labels = [au.get_name_from_atoms(mol=mol) for mol in molecules]
-
-  for ft in features_list:
-    features_values = [ft.calculate_value(mol) for mol in molecules]
+  labels = []
+  features_values = [[] for _ in features_list]
 
-    series_result = SeriesItem(
-                              name=ft.label,
-                              labels=labels,
-                              values=features_values
-                              )
+  for mol in molecules:
+    labels.append(au.get_name_from_atoms(mol=mol))
+    for values, ft in zip(features_values, features_list):
+      values.append(ft.calculate_value(mol))
 
-    res.append(series_result)
+  res = [SeriesItem(
+                    name=ft.label,
+                    labels=labels,
+                    values=values
+                    ) for ft, values in zip(features_list, features_values)]
 
   return res
 
 
 def calculate_values_groupby_molecules(
-                                      molecules: List[Atoms],
+                                      molecules: Iterable[Atoms],
                                       features_list: List[ft.Feature]
                                       ) -> List[SeriesItem]:
 
@@ -145,6 +149,47 @@ def calculate_values_groupby_molecules(
   return res
 
 
+def calculate_dataset_list_streaming(
+                            dataset_list: List[Dataset],
+                            features_list: List[ft.Feature]
+                        ) -> List[Dict]:
+  '''
+    Same as calculate_dataset_list(), but molecules are read from xyz files one at a time
+    and are not kept: result does not contain "molecules", "features_info" is calculated from the first molecule.
+  '''
+
+  res = []
+
+  for dset in dataset_list:
+    dset_dict = {}
+    dset_dict["dataset_description"] = dset.description
+    dset_dict["dataset_sources"] = dset.names
+    dset_dict["features_list"] = features_list
+
+    # single pass over the files: first molecule is taken from the same iterator
+    molecules = au.iter_ase_atoms_from_dataset(dset)
+    first_mols = list(islice(molecules, 1))
+    molecules = chain(first_mols, molecules)
+
+    dset_dict["features_info"] = [x.get_info(first_mols[0]) for x in features_list] \
+                                  if len(first_mols) > 0 \
+                                  else []
+
+    if len(features_list) > 0:
+      dset_dict["calc_by_features"] = calculate_values_groupby_features(
+                                            molecules=molecules,
+                                            features_list=features_list
+                                          )
+      dset_dict["molecules_names"] = dset_dict["calc_by_features"][0].labels
+    else:
+      dset_dict["calc_by_features"] = []
+      dset_dict["molecules_names"] = [au.get_name_from_atoms(x) for x in molecules]
+
+    res.append(dset_dict)
+
+  return res
+
+
 def calculate_dataset_list(
                             dataset_list: List[Dataset],
                             features_list: List[ft.Feature]
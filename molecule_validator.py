@@ -1,6 +1,6 @@
 from dataclasses import dataclass, field
 import numpy as np
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Dict, Iterable, List, Tuple, Union
 from tqdm import tqdm
 
 from ase import Atoms
@@ -105,22 +105,28 @@ def validate_bonds_of_one_mol_with_target_molecule(mol: Atoms) -> Dict:
 
 
 def validate_bonds_of_many_mols_with_target_molecule(
-                  mols_to_validate: List[Atoms],
+                  mols_to_validate: Iterable[Atoms],
                   target_mol: Atoms=None
                 ) -> List[Dict]:
+  '''
+    mols_to_validate are iterated only once: can be a generator, e.g. au.iter_ase_atoms_from_xyz_file(),
+    then only one molecule at a time is kept in memory.
+  '''
 
   progress_bar = tqdm(mols_to_validate)
   invalid_items = []
+  num_mols_total = 0
   #for experiment_dir in tqdm(experimentr_dirs, desc="Processing gaussian log files"):
   for mol in progress_bar:
     progress_bar.set_description(au.get_name_from_atoms(mol))
+    num_mols_total += 1
     validation_result = validate_bonds_of_one_mol_with_target_molecule(mol)
     if not validation_result["is_valid"]:
       invalid_items.append(validation_result)
   
   summary = {
-    "num_mols_total": len(mols_to_validate),
-    "num_mols_valid": len(mols_to_validate) - len(invalid_items),
+    "num_mols_total": num_mols_total,
+    "num_mols_valid": num_mols_total - len(invalid_items),
     "num_mols_invalid": len(invalid_items),
 
   }
@@ -0,0 +1,205 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+import utils as ut
+
+
+# Increase when the format of cached results changes: old entries are then ignored.
+result_cache_version = 1
+
+
+def has_error(result: Any) -> bool:
+  '''
+    True if result contains "error" key at any level of nested dictionaries,
+    e.g. results["scf_summary"]["error"] of gaussian_utils.process_one_log_file().
+  '''
+  if isinstance(result, dict):
+    return "error" in result or any(has_error(x) for x in result.values())
+  if isinstance(result, (list, tuple)):
+    return any(has_error(x) for x in result)
+  return False
+
+
+@dataclass
+class ResultCache():
+  '''
+    On-disk cache of per-file processing results, e.g. results of
+    gaussian_utils.process_one_log_file().
+
+    One json file per input file in cache_dir. Entry is valid as long as size and
+    modification time of the input file are the same. If use_content_hash is True,
+    then content hash is compared as well, and an entry with changed modification
+    time but identical content remains valid.
+
+    Results are stored separately for each set of processing options,
+    e.g. different extract_summary_step_nr values.
+
+    max_size_bytes: least recently used entries are removed when total size
+      of the cache exceeds this value. Sizes and usage order of the entries are
+      read from cache_dir once, and then kept up to date in memory.
+
+    Results that contain an "error" (see has_error()) are not cached,
+    so that failed files are processed again next time.
+  '''
+  cache_dir: Path
+  max_size_bytes: int = 2**30
+  use_content_hash: bool = False
+  total_size_bytes: int = field(init=False)
+  entry_sizes: OrderedDict = field(init=False, repr=False)
+
+
+  def __post_init__(self):
+    self.cache_dir = Path(self.cache_dir)
+    self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    # least recently used first
+    entries = sorted(
+                      [(x.stat(), x.name) for x in self.get_entry_paths()],
+                      key=lambda x: x[0].st_mtime_ns
+                    )
+    self.entry_sizes = OrderedDict((name, stat.st_size) for stat, name in entries)
+    self.total_size_bytes = sum(self.entry_sizes.values())
+
+
+  def __len__(self) -> int:
+    return len(self.entry_sizes)
+
+
+  def clear(self):
+    for x in self.get_entry_paths():
+      x.unlink(missing_ok=True)
+    self.entry_sizes.clear()
+    self.total_size_bytes = 0
+
+
+  def evict(self):
+    '''
+      Removes least recently used entries until total size is below max_size_bytes.
+    '''
+    while self.total_size_bytes > self.max_size_bytes and len(self.entry_sizes) > 0:
+      name, size = self.entry_sizes.popitem(last=False)
+      self.cache_dir.joinpath(name).unlink(missing_ok=True)
+      self.total_size_bytes -= size
+
+
+  def get(self, file_path: Union[str, Path], options: Dict) -> Union[Dict, None]:
+    '''
+      Returns cached result of file_path, processed with options,
+      or None if not in cache or file_path has changed.
+    '''
+    entry = self.read_entry(file_path=file_path)
+    if entry == None:
+      return None
+
+    try:
+      signature = ut.get_file_signature(file_path)
+    except OSError:
+      return None
+
+    if signature != entry["signature"]:
+      if not self.use_content_hash \
+          or signature["size"] != entry["signature"]["size"] \
+          or ut.get_file_hash(file_path) != entry.get("content_hash"):
+        return None
+
+      # content is the same, only modification time changed
+      entry["signature"] = signature
+      self.write_entry(file_path=file_path, entry=entry)
+
+    res = entry["results"].get(self.get_options_key(options), None)
+    if res != None:
+      # mark as recently used, modification time keeps the order for the next session
+      entry_path = self.get_entry_path(file_path)
+      os.utime(entry_path)
+      if entry_path.name in self.entry_sizes:
+        self.entry_sizes.move_to_end(entry_path.name)
+
+    return res
+
+
+  def get_entry_path(self, file_path: Union[str, Path]) -> Path:
+    key = hashlib.sha1(str(Path(file_path).absolute()).encode()).hexdigest()
+    return self.cache_dir.joinpath(f"{key}.json")
+
+
+  def get_entry_paths(self) -> List[Path]:
+    return ut.get_file_paths_in_dir(search_dir=self.cache_dir, file_extension=".json")
+
+
+  def get_options_key(self, options: Dict) -> str:
+    return json.dumps(
+              {"version": result_cache_version, **options},
+              sort_keys=True,
+              default=str
+            )
+
+
+  def invalidate(self, file_path: Union[str, Path]) -> bool:
+    '''
+      Removes all cached results of file_path.
+      Returns True if there was anything to remove.
+    '''
+    entry_path = self.get_entry_path(file_path)
+    if not entry_path.is_file():
+      return False
+
+    self.total_size_bytes -= self.entry_sizes.pop(entry_path.name, 0)
+    entry_path.unlink(missing_ok=True)
+    return True
+
+
+  def put(self, file_path: Union[str, Path], options: Dict, result: Dict) -> bool:
+    '''
+      Stores result of file_path, processed with options.
+      Results for other options are kept if file_path has not changed.
+      Returns False if result was not stored: it has an error or file_path doesn't exist.
+    '''
+    if has_error(result):
+      return False
+
+    try:
+      signature = ut.get_file_signature(file_path)
+    except OSError:
+      # input file does not exist, nothing to cache
+      return False
+
+    entry = self.read_entry(file_path=file_path)
+    if entry == None or entry["signature"] != signature:
+      entry = {
+        "file_path": str(Path(file_path).absolute()),
+        "signature": signature,
+        "results": {},
+      }
+      if self.use_content_hash:
+        entry["content_hash"] = ut.get_file_hash(file_path)
+
+    entry["results"][self.get_options_key(options)] = result
+    self.write_entry(file_path=file_path, entry=entry)
+    self.evict()
+    return True
+
+
+  def read_entry(self, file_path: Union[str, Path]) -> Union[Dict, None]:
+    entry_path = self.get_entry_path(file_path)
+    try:
+      return ut.read_json_file_to_dict(entry_path)
+    except (OSError, ValueError):
+      return None
+
+
+  def write_entry(self, file_path: Union[str, Path], entry: Dict):
+    entry_path = self.get_entry_path(file_path)
+    data = json.dumps(entry).encode()
+
+    # write to temporary file first, interrupted write must not leave a broken entry
+    tmp_path = entry_path.with_suffix(".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, entry_path)
+
+    self.total_size_bytes += len(data) - self.entry_sizes.pop(entry_path.name, 0)
+    self.entry_sizes[entry_path.name] = len(data)
@@ -0,0 +1,85 @@
+from dataclasses import dataclass, field
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Tuple, Union
+
+from result_cache import has_error
+
+
+@dataclass
+class ResultJournal():
+  '''
+    Append-only journal of per-file processing results, one json line per completed file,
+    e.g. results of gaussian_utils.process_one_log_file().
+
+    Each line is written and flushed to disk as soon as the result is available,
+    so an interrupted run can be resumed: read() returns results of the files
+    already processed with the same options.
+
+    Line that could not be parsed (e.g. last line of an interrupted write) is skipped.
+
+    Results that contain an "error" (see result_cache.has_error()) are not written,
+    so that failed files, e.g. logs still being written, are processed again on resume.
+  '''
+  journal_path: Path
+  options: Dict = field(default_factory=dict)
+
+
+  def __post_init__(self):
+    self.journal_path = Path(self.journal_path)
+    self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+    # options as they are after json round trip, for comparison with the journal lines
+    self.options = json.loads(json.dumps(self.options, default=str))
+
+
+  def append(self, file_path: Union[str, Path], result: Dict) -> bool:
+    '''
+      Returns False if result was not written: it has an error.
+    '''
+    if has_error(result):
+      return False
+
+    line = json.dumps({
+              "file_path": str(file_path),
+              "options": self.options,
+              "result": result,
+            })
+
+    with open(self.journal_path, "a+b") as f:
+      # interrupted write may have left the last line without newline
+      if f.tell() > 0:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+          f.write(b"\n")
+
+      f.write(f"{line}\n".encode())
+      f.flush()
+      os.fsync(f.fileno())
+
+    return True
+
+
+  def clear(self):
+    self.journal_path.unlink(missing_ok=True)
+
+
+  def read(self) -> Dict[str, Dict]:
+    '''
+      Returns { file_path: result } of the journal lines with the same options.
+      If file_path is in the journal more than once, then the latest result is returned.
+    '''
+    res = {}
+    if not self.journal_path.is_file():
+      return res
+
+    with open(self.journal_path, "r") as f:
+      for line in f:
+        try:
+          entry = json.loads(line)
+          if entry["options"] == self.options:
+            res[entry["file_path"]] = entry["result"]
+        except (ValueError, KeyError, TypeError):
+          continue
+
+    return res
@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# molli modules are imported flat, e.g. "import utils as ut"
+repo_dir = Path(__file__).resolve().parent.parent
+if str(repo_dir) not in sys.path:
+  sys.path.insert(0, str(repo_dir))
+
+import synthetic_files as sf
+
+
+@pytest.fixture
+def log_dir(tmp_path: Path) -> Path:
+  '''
+    Directory with synthetic Gaussian log files, see synthetic_files.write_gaussian_logs().
+  '''
+  return sf.write_gaussian_logs(tmp_path.joinpath("logs"))
+
+
+@pytest.fixture
+def baseline_dir() -> Path:
+  '''
+    Expected outputs, written by the code of the baseline commit from the same synthetic files.
+  '''
+  return Path(__file__).resolve().parent.joinpath("data", "baseline")
@@ -0,0 +1,135 @@
+import random
+from pathlib import Path
+from typing import List, Union
+
+import numpy as np
+
+# C2H6O
+atomic_nrs = [6, 1, 1, 1, 1, 8, 1]
+element_symbols = {1: "H", 6: "C", 8: "O"}
+
+
+def create_orientation_lines(coords: List[List[float]]) -> List[str]:
+  res = [
+    "                         Standard orientation:                         ",
+    " ---------------------------------------------------------------------",
+    " Center     Atomic      Atomic             Coordinates (Angstroms)",
+    " Number     Number       Type             X           Y           Z",
+    " ---------------------------------------------------------------------",
+  ]
+  for i, (z, (x, y, w)) in enumerate(zip(atomic_nrs, coords)):
+    res.append(f" {i + 1:6d}{z:11d}{0:12d}    {x:12.6f}{y:12.6f}{w:12.6f}")
+  res.append(" ---------------------------------------------------------------------")
+  return res
+
+
+def create_gaussian_log_lines(
+                              num_steps: int,
+                              is_optimization: bool=True,
+                              is_converged: bool=True,
+                              has_elapsed_time: bool=True,
+                              seed: int=0
+                            ) -> List[str]:
+  '''
+    Lines of a minimal Gaussian 16 log: num_steps of Standard orientation + SCF Done,
+    optimization markers, archive entry and Normal termination.
+  '''
+  rnd = random.Random(seed)
+  res = [
+    " Entering Gaussian System, Link 0=g16",
+    " Cite this work as:",
+    " Gaussian 16, Revision C.01,",
+    " M. J. Frisch, et al.",
+    " ------------------------------",
+    " #T BP86/STO-3G opt=(calcfc,maxcycles=25) formcheck" if is_optimization else " #T BP86/STO-3G formcheck",
+    " ------------------------------",
+  ]
+  coords = [[rnd.uniform(-2, 2) for _ in range(3)] for _ in atomic_nrs]
+  energy = -115.0 - rnd.random()
+
+  for _ in range(num_steps):
+    if is_optimization:
+      res += [" GradGradGradGradGradGradGradGradGradGradGradGradGradGradGradGradGradGrad", " Berny optimization."]
+    res += create_orientation_lines(coords)
+    res += [
+      " Rotational constants (GHZ):    123.4567890     23.4567890     22.1234567",
+      "    28 basis functions,    84 primitive gaussians,    28 cartesian basis functions",
+      "     9 alpha electrons        9 beta electrons",
+      " ----------------------------------------------------------------",
+      " some scf output",
+      " Requested convergence on RMS density matrix=1.00D-08",
+      f" SCF Done:  E(RB-P86) =  {energy:.9f}     A.U. after   10 cycles",
+      "            NFock= 10  Conv=0.53D-08     -V/T= 2.0055",
+      " Framework group  C1[X(C2H6O)]",
+    ]
+    energy -= rnd.random() * 0.01
+    coords = [[c + rnd.uniform(-0.05, 0.05) for c in xyz] for xyz in coords]
+
+  if is_optimization and is_converged:
+    res += ["    -- Stationary point found.", " GradGradGradGradGradGradGradGradGradGradGradGradGradGradGradGradGradGrad"]
+    res += create_orientation_lines(coords)
+
+  res += [" Unable to Open any file for archive entry."]
+  archive = "1\\1\\GINC-NODE\\FOpt\\RBP86\\STO-3G\\C2H6O1\\USER\\15-Jan-2023\\0\\\\#T BP86/STO-3G opt\\\\title\\\\0,1\\" + \
+            "\\".join(f"{element_symbols[z]},{x:.10f},{y:.10f},{w:.10f}" for z, (x, y, w) in zip(atomic_nrs, coords)) + \
+            "\\\\Version=ES64L-G16RevC.01\\State=1-A\\HF=-115.1\\RMSD=5.3e-09\\\\@"
+  res += [" " + archive[i:(i + 70)] for i in range(0, len(archive), 70)]
+  res += [" The archive entry for this job was punched.", "", " Job cpu time:       0 days  0 hours  1 minutes 23.4 seconds."]
+  if has_elapsed_time:
+    res += [" Elapsed time:       0 days  0 hours  0 minutes 12.3 seconds."]
+  res += [
+    " File lengths (MBytes):  RWF=     16 Int=      0 D2E=      0 Chk=      1 Scr=      1",
+    " Normal termination of Gaussian 16 at Sun Jan 15 12:34:56 2023.",
+  ]
+  return res
+
+
+def write_gaussian_log(file_path: Union[str, Path], **kwargs) -> Path:
+  Path(file_path).write_text("\n".join(create_gaussian_log_lines(**kwargs)) + "\n")
+  return Path(file_path)
+
+
+def write_gaussian_logs(output_dir: Union[str, Path]) -> Path:
+  '''
+    conf_00..conf_05: converged optimizations of 3..8 steps,
+    conf_energy: single point, conf_noconv: not converged, conf_noelapsed: no Elapsed time line.
+  '''
+  out_dir = Path(output_dir)
+  out_dir.mkdir(parents=True, exist_ok=True)
+  for i in range(6):
+    write_gaussian_log(out_dir.joinpath(f"conf_{i:02d}.log"), num_steps=3 + i, seed=i)
+  write_gaussian_log(out_dir.joinpath("conf_energy.log"), num_steps=1, is_optimization=False, seed=10)
+  write_gaussian_log(out_dir.joinpath("conf_noconv.log"), num_steps=4, is_converged=False, seed=11)
+  write_gaussian_log(out_dir.joinpath("conf_noelapsed.log"), num_steps=4, has_elapsed_time=False, seed=12)
+  return out_dir
+
+
+def create_random_coords(
+                          num_structures: int,
+                          num_atoms: int,
+                          noise: float=0.3,
+                          seed: int=0
+                        ) -> np.ndarray:
+  '''
+    Randomly rotated, translated and perturbed copies of one structure, (num_structures, num_atoms, 3).
+  '''
+  rng = np.random.default_rng(seed)
+  base = rng.normal(size=(num_atoms, 3)) * 2.0
+  q, r = np.linalg.qr(rng.normal(size=(num_structures, 3, 3)))
+  rotations = q * np.sign(np.diagonal(r, axis1=-2, axis2=-1))[:, None, :]
+  rotations[np.linalg.det(rotations) < 0, :, 0] *= -1
+  coords = base + rng.normal(size=(num_structures, num_atoms, 3)) * noise
+  return np.einsum("mij,mnj->mni", rotations, coords) + rng.normal(size=(num_structures, 1, 3)) * 5.0
+
+
+def write_xyz_file(
+                    file_path: Union[str, Path],
+                    coords: np.ndarray,
+                    elements: List[str]
+                  ) -> Path:
+  lines = []
+  for i, xyz in enumerate(coords):
+    lines += [str(len(elements)), f"structure {i}"]
+    lines += [f"{e} {x:.8f} {y:.8f} {z:.8f}" for e, (x, y, z) in zip(elements, xyz)]
+  Path(file_path).write_text("\n".join(lines) + "\n")
+  return Path(file_path)
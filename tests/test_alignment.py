@@ -0,0 +1,181 @@
+import numpy as np
+import pytest
+
+from ase import Atoms
+from ase.build import minimize_rotation_and_translation
+
+import alignment
+import ase_utils as au
+import metrics as ms
+import synthetic_files as sf
+
+
+def calculate_rmsd_ase(target_coords: np.ndarray, coords: np.ndarray) -> np.ndarray:
+  '''
+    Baseline: rmsd after ase.build.minimize_rotation_and_translation() of each structure.
+  '''
+  target = Atoms(positions=target_coords)
+  res = []
+  for x in coords:
+    mol = Atoms(positions=x)
+    minimize_rotation_and_translation(target, mol)
+    res.append(ms.rmsd_of_positions(mol1=target, mol2=mol))
+  return np.array(res)
+
+
+@pytest.mark.parametrize("noise", [1e-4, 1e-2, 0.3])
+def test_qcp_rmsd_matches_ase_alignment(noise):
+  coords = sf.create_random_coords(num_structures=20, num_atoms=15, noise=noise, seed=1)
+  expected = calculate_rmsd_ase(coords[0], coords[1:])
+
+  res = alignment.calculate_rmsd_qcp(coords1=coords[0], coords2=coords[1:])
+  np.testing.assert_allclose(res, expected, rtol=1e-6, atol=1e-12)
+
+
+def test_qcp_rmsd_of_identical_structures_is_not_exact():
+  coords = sf.create_random_coords(num_structures=1, num_atoms=30, seed=2)[0]
+  res = alignment.calculate_rmsd_qcp(coords1=coords, coords2=coords)
+  assert 0.0 <= res < 1e-6
+
+
+def test_metric_of_identical_structures_is_exact():
+  coords = sf.create_random_coords(num_structures=3, num_atoms=30, noise=0.0, seed=3)
+  mols = [Atoms(numbers=[6] * 30, positions=x) for x in coords]
+
+  res = au.calculate_metric_between_two_molecules(
+                                                  target=mols[0],
+                                                  mol=mols[1],
+                                                  align=True,
+                                                  metric_function=ms.rmsd_of_positions
+                                                )
+  assert res < 1e-12
+
+  res = au.calculate_metric_one_to_many(
+                                        target=mols[0],
+                                        mols=mols,
+                                        align=True,
+                                        metric_function=ms.rmsd_of_positions
+                                      )
+  assert max(res) < 1e-12
+
+
+def test_metric_one_to_many_matches_ase_alignment():
+  coords = sf.create_random_coords(num_structures=10, num_atoms=12, seed=4)
+  mols = [Atoms(numbers=[6] * 12, positions=x) for x in coords]
+
+  res = au.calculate_metric_one_to_many(
+                                        target=mols[0],
+                                        mols=mols[1:],
+                                        align=True,
+                                        metric_function=ms.rmsd_of_positions
+                                      )
+  np.testing.assert_allclose(res, calculate_rmsd_ase(coords[0], coords[1:]), rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize("condensed", [True, False])
+def test_rmsd_matrix_on_disk_resumes(tmp_path, condensed):
+  coords = sf.create_random_coords(num_structures=40, num_atoms=10, seed=3)
+  expected = alignment.calculate_rmsd_matrix(coords=coords, condensed=condensed)
+  output_path = tmp_path.joinpath("rmsd.bin")
+
+  values = alignment.calculate_rmsd_matrix_on_disk(coords=coords, output_path=output_path, condensed=condensed, memory_budget=2**10)
+  np.testing.assert_allclose(values, expected, rtol=1e-6, atol=1e-6)
+  manifest = alignment.read_rmsd_matrix_manifest(output_path)
+  assert len(manifest["tiles"]) > 2
+  assert sorted(manifest["completed_tiles"]) == list(range(len(manifest["tiles"])))
+
+  # interrupted after the first tile: only the other tiles are computed again
+  overwritten = np.memmap(output_path, dtype="float32", mode="r+", shape=values.shape)
+  overwritten[:] = -1
+  overwritten.flush()
+  manifest["completed_tiles"] = [0]
+  alignment.write_rmsd_matrix_manifest(output_path, manifest)
+
+  values = alignment.calculate_rmsd_matrix_on_disk(coords=coords, output_path=output_path, condensed=condensed, memory_budget=2**10)
+  row_start, row_end = manifest["tiles"][0]
+  if condensed:
+    num_structures = len(coords)
+    tile_slice = slice(
+                        row_start * num_structures - row_start * (row_start + 1) // 2,
+                        row_end * num_structures - row_end * (row_end + 1) // 2
+                      )
+  else:
+    tile_slice = slice(row_start, row_end)
+
+  assert np.all(values[tile_slice] == -1)
+  is_other_tile = np.ones(len(values), dtype=bool)
+  is_other_tile[tile_slice] = False
+  np.testing.assert_allclose(values[is_other_tile], expected[is_other_tile], rtol=1e-6, atol=1e-6)
+
+
+def test_metric_between_xyz_files_on_disk(tmp_path):
+  coords = sf.create_random_coords(num_structures=30, num_atoms=7, noise=0.1, seed=4)
+  xyz_path = sf.write_xyz_file(tmp_path.joinpath("structures.xyz"), coords, ["C", "C", "O", "H", "H", "H", "H"])
+  kwargs = {
+    "target_xyz_path": xyz_path,
+    "xyz_path": xyz_path,
+    "max_value": 0.2,
+    "align": True,
+    "metric_function": ms.rmsd_of_positions,
+  }
+
+  expected = au.calculate_metric_between_xyz_files(**kwargs)
+  res = au.calculate_metric_between_xyz_files(**kwargs, matrix_path=tmp_path.joinpath("rmsd.bin"))
+  assert len(expected["less_than_max_value"]) > 0
+  assert [x[:3] for x in res["less_than_max_value"]] == [x[:3] for x in expected["less_than_max_value"]]
+  np.testing.assert_allclose(
+                              [x[3] for x in res["less_than_max_value"]],
+                              [x[3] for x in expected["less_than_max_value"]],
+                              rtol=1e-6
+                            )
+
+
+@pytest.mark.parametrize("condensed", [True, False])
+def test_rmsd_matrix_shared_memory_matches_serial(condensed):
+  coords = sf.create_random_coords(num_structures=25, num_atoms=9, seed=5)
+  expected = alignment.calculate_rmsd_matrix(coords=coords, condensed=condensed)
+  res = alignment.calculate_rmsd_matrix(coords=coords, condensed=condensed, workers=2)
+  np.testing.assert_array_equal(res, expected)
+
+  # first row against ase alignment
+  first_row = res[:(len(coords) - 1)] if condensed else res[0, 1:]
+  np.testing.assert_allclose(first_row, calculate_rmsd_ase(coords[0], coords[1:]), rtol=1e-6)
+
+
+def test_align_coords_matches_ase_alignment():
+  coords = sf.create_random_coords(num_structures=12, num_atoms=11, seed=6)
+  # incl. a mirror image: rotation must stay proper
+  coords[-1] = coords[-1] * [1, 1, -1]
+  target = Atoms(positions=coords[0])
+
+  expected = []
+  for x in coords:
+    mol = Atoms(positions=x)
+    minimize_rotation_and_translation(target, mol)
+    expected.append(mol.positions)
+
+  res = alignment.align_coords(target_coords=coords[0], coords=coords)
+  np.testing.assert_allclose(res["coords"], np.array(expected), rtol=0, atol=1e-10)
+  np.testing.assert_allclose(np.linalg.det(res["rotations"]), 1.0, atol=1e-12)
+
+  single = alignment.align_coords(target_coords=coords[0], coords=coords[3])
+  np.testing.assert_allclose(single["coords"], expected[3], rtol=0, atol=1e-10)
+  np.testing.assert_allclose(au.get_aligned_positions(target=target, mols=[Atoms(positions=x) for x in coords]), res["coords"])
+
+
+def test_rmsd_matrix_matches_pairwise_metric():
+  coords = sf.create_random_coords(num_structures=15, num_atoms=9, seed=7)
+  mols = [Atoms(positions=x) for x in coords]
+
+  # not ms.rmsd_of_positions itself: computed pair by pair, with Kabsch alignment
+  def rmsd_pairwise(mol1, mol2):
+    return ms.rmsd_of_positions(mol1=mol1, mol2=mol2)
+
+  expected = np.array(au.calculate_metric_matrix(mols=mols, align=True, metric_function=rmsd_pairwise))
+  res = np.array(au.calculate_metric_matrix(mols=mols, align=True, metric_function=ms.rmsd_of_positions))
+  np.testing.assert_allclose(res, expected, rtol=1e-6, atol=1e-7)
+
+  # blocks of a few pairs
+  condensed = alignment.calculate_rmsd_matrix(coords=coords, condensed=True, max_block_pairs=7)
+  rows, cols = np.triu_indices(len(coords), k=1)
+  np.testing.assert_allclose(condensed, expected[rows, cols], rtol=1e-6)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import clustering
+import synthetic_files as sf
+from test_alignment import calculate_rmsd_ase
+
+
+def create_clustered_coords(cluster_sizes, num_atoms: int=8, noise: float=0.05):
+  '''
+    Perturbed copies of len(cluster_sizes) different structures, shuffled.
+    Returns (coords, cluster idx of each structure)
+  '''
+  coords, groups = [], []
+  for k, size in enumerate(cluster_sizes):
+    coords.append(sf.create_random_coords(num_structures=size, num_atoms=num_atoms, noise=noise, seed=10 + k))
+    groups += [k] * size
+
+  order = np.random.default_rng(0).permutation(len(groups))
+  return np.concatenate(coords)[order], np.array(groups)[order]
+
+
+@pytest.mark.parametrize("method", clustering.clustering_methods)
+def test_cluster_coords(method):
+  coords, groups = create_clustered_coords([7, 5, 2, 1])
+  res = clustering.cluster_coords(coords=coords, threshold=0.5, method=method)
+
+  assert res["num_clusters"] == 4
+  # same partition as groups
+  assert len(set(zip(res["labels"].tolist(), groups.tolist()))) == 4
+  assert sorted(res["cluster_sizes"]) == [1, 2, 5, 7]
+
+  for k, medoid in enumerate(res["medoids"]):
+    members = np.flatnonzero(res["labels"] == k)
+    sums = [np.sum(calculate_rmsd_ase(coords[i], coords[members])) for i in members]
+    assert np.isclose(np.sum(calculate_rmsd_ase(coords[medoid], coords[members])), np.min(sums), rtol=1e-6)
+
+
+def test_find_cluster_medoids_small_clusters():
+  coords, _ = create_clustered_coords([3])
+  labels = np.array([1, 0, 1])
+  assert clustering.find_cluster_medoids(coords=coords, labels=labels) == [1, 0]
+
+
+@pytest.mark.parametrize("method", clustering.clustering_methods)
+def test_cluster_coords_approximate_medoids(method):
+  coords, _ = create_clustered_coords([7, 5, 2, 1])
+  expected = clustering.cluster_coords(coords=coords, threshold=0.5, method=method)
+  # all members are neighbors of each other: sums from the neighbor pairs are exact
+  res = clustering.cluster_coords(coords=coords, threshold=0.5, method=method, max_dense_cluster_size=1)
+  assert res["medoids"] == expected["medoids"]
+
+
+def test_calculate_rmsd_sums_from_pairs():
+  coords, _ = create_clustered_coords([6], noise=0.3)
+  threshold = 0.6
+  pairs = clustering.find_neighbor_pairs(coords=coords, threshold=threshold)
+  labels = np.zeros(len(coords), dtype=int)
+  rmsd = np.array([calculate_rmsd_ase(x, coords) for x in coords])
+  assert 0 < len(pairs["rows"]) < 15
+
+  # pairs that are not neighbors are counted as threshold
+  expected = np.sum(np.where(rmsd < threshold, rmsd, threshold), axis=1) - np.diag(rmsd)
+  res = clustering.calculate_rmsd_sums_from_pairs(pairs=pairs, labels=labels, threshold=threshold)
+  np.testing.assert_allclose(res, expected, rtol=1e-6)
@@ -0,0 +1,59 @@
+import numpy as np
+
+import constants as C
+import fchk_parser
+
+
+def format_fchk_array(label: str, data_type: str, values: list) -> list:
+  '''
+    Array section in Gaussian formchk formats: 6I12, 5E16.8, 5A12, 72L1.
+  '''
+  formats = {"I": "{:12d}", "R": "{:16.8E}", "C": "{:12s}", "L": "{}"}
+  num_per_line = fchk_parser.fchk_values_per_line[data_type]
+  res = [f"{label:40s}   {data_type}   N={len(values):12d}"]
+  for i in range(0, len(values), num_per_line):
+    res.append("".join(formats[data_type].format(x) for x in values[i:(i + num_per_line)]))
+  return res
+
+
+def write_fchk_file(file_path, atomic_nrs, coords_bohr, gradient, logicals):
+  lines = [
+    "synthetic molecule",
+    f"{'SP':10s}{'RB3LYP':30s}{'6-31G(d)':30s}",
+    f"{'Number of atoms':40s}   I     {len(atomic_nrs):12d}",
+    f"{'Charge':40s}   I     {0:12d}",
+  ]
+  lines += format_fchk_array("Atomic numbers", "I", list(atomic_nrs))
+  lines += format_fchk_array("Route", "C", ["#P B3LYP/6-31G(d) ", "SP"])
+  lines += format_fchk_array("Logical flags", "L", ["T" if x else "F" for x in logicals])
+  lines += format_fchk_array("Current cartesian coordinates", "R", list(coords_bohr.ravel()))
+  lines += [f"{'Total Energy':40s}   R     {-154.123456789:22.15E}"]
+  lines += format_fchk_array("Cartesian Gradient", "R", list(gradient.ravel()))
+  lines += [f"{'Multiplicity':40s}   I     {1:12d}"]
+  file_path.write_text("\n".join(lines) + "\n")
+  return file_path
+
+
+def test_read_fchk_file(tmp_path):
+  rng = np.random.default_rng(0)
+  atomic_nrs = rng.integers(1, 10, size=13)
+  coords_bohr = rng.normal(size=(13, 3)) * 3
+  gradient = rng.normal(size=(13, 3)) * 1e-3
+  # more than one line of 72 logical values
+  logicals = (rng.random(100) > 0.5).tolist()
+  path = write_fchk_file(tmp_path.joinpath("x.fchk"), atomic_nrs, coords_bohr, gradient, logicals)
+
+  res = fchk_parser.read_fchk_file(path)
+  assert res["method"] == "RB3LYP"
+  assert res["Logical flags"] == "".join("T" if x else "F" for x in logicals)
+  assert res["Route"].startswith("#P B3LYP")
+  assert res["Total Energy"] == -154.123456789
+  # scalars after the arrays are found, i.e. array lines are counted correctly
+  assert res["Multiplicity"] == 1
+
+  res = fchk_parser.read_fchk_file_as_arrays(path)
+  np.testing.assert_array_equal(res["atomic_nrs"], atomic_nrs)
+  np.testing.assert_allclose(res["coords"], coords_bohr * C.bohr_in_angstrom, rtol=1e-8)
+  np.testing.assert_allclose(res["gradient"], gradient, rtol=1e-8)
+  assert res["charge"] == 0
+  assert res["multiplicity"] == 1
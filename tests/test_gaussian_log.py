@@ -0,0 +1,101 @@
+from pathlib import Path
+
+import pytest
+
+import gaussian_utils as GU
+import utils as ut
+from gaussian_log import GaussianLog, GaussianLogIndex, count_marker_lines, gaussian_log_index_file_suffix, iter_optimization_steps
+
+
+def create_log_variants(log_dir: Path, tmp_path: Path) -> list:
+  '''
+    Synthetic logs plus CRLF and truncated copies.
+  '''
+  res = sorted(log_dir.glob("*.log"))
+  for path in list(res):
+    data = path.read_bytes()
+    res.append(tmp_path.joinpath(f"{path.stem}_crlf.log"))
+    res[-1].write_bytes(data.replace(b"\n", b"\r\n"))
+    for pct in [35, 60, 97]:
+      res.append(tmp_path.joinpath(f"{path.stem}_cut{pct}.log"))
+      res[-1].write_bytes(data[:(len(data) * pct // 100)])
+  return res
+
+
+def extract_or_error(func, *args, **kwargs):
+  try:
+    return func(*args, **kwargs)
+  except Exception:
+    return "error"
+
+
+def test_index_extractors_match_gaussian_log(log_dir, tmp_path):
+  for path in create_log_variants(log_dir, tmp_path):
+    log = GaussianLog(path)
+    with GaussianLogIndex(path) as index:
+      for step_nr in [0, 1, 2, 50]:
+        # only the selected step is decoded from index, i.e. truncated last step doesn't matter
+        expected = extract_or_error(GU.extract_selected_optimization_step_as_xyz, log, step_nr)
+        if expected != "error":
+          assert GU.extract_selected_optimization_step_as_xyz(index, step_nr) == expected, path.name
+
+      for max_step_nr in [0, 2]:
+        assert extract_or_error(GU.extract_scf_summary, index, True, max_step_nr) == \
+                extract_or_error(GU.extract_scf_summary, log, True, max_step_nr), path.name
+
+      assert extract_or_error(GU.extract_optimization_steps_as_xyz_from_index, index, True) == \
+              extract_or_error(GU.extract_optimization_steps_as_xyz, log, True), path.name
+
+
+@pytest.mark.parametrize("step_nr", [0, 2, 50])
+def test_process_one_log_file_selected_step(log_dir, tmp_path, step_nr):
+  for path in sorted(log_dir.glob("*.log")):
+    res = GU.process_one_log_file(
+                                  input_path=path,
+                                  output_dir=tmp_path,
+                                  extract_summary_step_nr=step_nr,
+                                  return_opt_step_xyz=True
+                                )
+    expected = GU.select_optimization_step(
+                      xyz_blocks=GU.extract_optimization_steps_as_xyz(file_path=path, collect_to_single_list=False),
+                      step_nr=step_nr
+                    )
+    assert res["opt_step_xyz"] == expected, path.name
+
+
+def test_extract_optimization_steps_by_idxs_sidecar(log_dir, tmp_path):
+  path = log_dir.joinpath("conf_00.log")
+  sidecar_path = ut.get_sidecar_file_path(path, gaussian_log_index_file_suffix)
+  xyz_steps = GU.extract_optimization_steps_as_xyz(file_path=path, collect_to_single_list=False)
+
+  res = GU.extract_optimization_steps_by_idxs(file_path=path, step_idxs=[0, -1, 1000])
+  assert res == {0: xyz_steps[0], -1: xyz_steps[-1]}
+  assert not sidecar_path.exists()
+
+  job_paths = GU.create_gaussian_job_files_from_xyz_steps(
+                                          input_path=path,
+                                          output_dir=tmp_path,
+                                          lines_before_xyz_coords=["%chk=x", "# opt", "", "conf", "", "0 1"],
+                                          step_nrs_to_write=[1, 2],
+                                          job_file_name_prefix=None
+                                        )
+  assert [x.name for x in job_paths] == ["job_1.gjf", "job_2.gjf"]
+  assert sidecar_path.exists()
+  assert job_paths[1].read_text().splitlines()[6:-1] == xyz_steps[1][2:]
+
+
+def test_streamed_optimization_steps_match_baseline(log_dir, baseline_dir, tmp_path):
+  expected_dir = baseline_dir.joinpath("process_one_log_file")
+  for name in ["conf_00", "conf_noconv"]:
+    path = log_dir.joinpath(f"{name}.log")
+    steps = list(iter_optimization_steps(file_path=path))
+    assert len(steps) == count_marker_lines(file_path=path, search_text="Standard orientation:")
+
+    # path: log is streamed step by step
+    output_path = tmp_path.joinpath(f"{name}_opt_steps.xyz")
+    GU.write_optimization_steps_from_gaussian_logfile(log_file_path=path, output_path=output_path)
+    assert output_path.read_bytes() == expected_dir.joinpath(output_path.name).read_bytes()
+
+    output_path = tmp_path.joinpath(f"{name}_last_step.xyz")
+    GU.write_last_optimization_step_from_gaussian_logfile(log_file_path=path, output_path=output_path)
+    assert output_path.read_bytes() == expected_dir.joinpath(output_path.name).read_bytes()
@@ -0,0 +1,85 @@
+import os
+import time
+
+import gaussian_utils as GU
+from gaussian_log_follower import GaussianLogFollower
+
+
+def set_mtime(path, seconds_ago: float):
+  t = time.time() - seconds_ago
+  os.utime(path, (t, t))
+
+
+def test_follower_matches_full_parse(log_dir, tmp_path):
+  source_path = log_dir.joinpath("conf_00.log")
+  data = source_path.read_bytes()
+  path = tmp_path.joinpath("running.log")
+  follower = GaussianLogFollower(file_path=path, quiet_period_seconds=60)
+
+  # written in pieces, incl. partial lines
+  for end in [0, len(data) // 3, len(data) // 3 + 7, 2 * len(data) // 3, len(data)]:
+    path.write_bytes(data[:end])
+    res = follower.poll()
+    assert res["terminated"] == ""
+
+  set_mtime(path, 120)
+  res = follower.poll()
+  assert res["terminated"].startswith("Normal termination")
+  assert res["optimization_converged"]
+
+  expected = GU.extract_optimization_steps_as_xyz(file_path=source_path, collect_to_single_list=False)
+  assert res["num_steps"] == len(expected)
+  assert res["energies"] == [x[1].split(",")[0] for x in expected]
+
+
+def test_follower_link1(log_dir, tmp_path):
+  data = log_dir.joinpath("conf_00.log").read_bytes()
+  path = tmp_path.joinpath("running.log")
+  follower = GaussianLogFollower(file_path=path, quiet_period_seconds=0)
+
+  path.write_bytes(data + b" Link1:  Proceeding to internal job step number  2.\n")
+  assert follower.poll()["terminated"] == ""
+
+  with open(path, "ab") as f:
+    f.write(b" Initial command:\n" + data)
+  res = follower.poll()
+  assert res["terminated"].startswith("Normal termination")
+  assert res["num_steps"] == 2 * GU.count_marker_lines(file_path=log_dir.joinpath("conf_00.log"), search_text="Standard orientation:")
+
+
+def test_follower_restarted_log(log_dir, tmp_path):
+  path = tmp_path.joinpath("running.log")
+  follower = GaussianLogFollower(file_path=path, quiet_period_seconds=0)
+  path.write_bytes(log_dir.joinpath("conf_00.log").read_bytes())
+  num_steps = follower.poll()["num_steps"]
+
+  # log replaced by a longer one: other inode
+  new_path = tmp_path.joinpath("new.log")
+  new_path.write_bytes(log_dir.joinpath("conf_01.log").read_bytes() * 2)
+  os.replace(new_path, path)
+  res = follower.poll()
+  assert res["num_steps"] == 2 * GU.count_marker_lines(file_path=log_dir.joinpath("conf_01.log"), search_text="Standard orientation:")
+  assert num_steps > 0
+
+
+def test_follower_modified_log(log_dir, tmp_path):
+  data = log_dir.joinpath("conf_00.log").read_bytes()
+  path = tmp_path.joinpath("running.log")
+  follower = GaussianLogFollower(file_path=path, quiet_period_seconds=60)
+  path.write_bytes(data)
+  expected = follower.poll()
+
+  # touched: not parsed again
+  parser = follower.parser
+  set_mtime(path, 10)
+  res = follower.poll()
+  assert follower.parser is parser
+  assert res["energies"] == expected["energies"]
+
+  # overwritten in place with other content of the same size
+  other_data = log_dir.joinpath("conf_01.log").read_bytes()
+  path.write_bytes(other_data[:len(data)].ljust(len(data), b"\n"))
+  set_mtime(path, 5)
+  res = follower.poll()
+  assert follower.parser is not parser
+  assert res["energies"] == GaussianLogFollower(file_path=path).poll()["energies"]
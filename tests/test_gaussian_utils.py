@@ -0,0 +1,219 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from gaussian_log import GaussianLog, GaussianLogIndex
+import ase_utils as au
+import gaussian_utils as GU
+import utils as ut
+import xyz_parser
+
+
+def assert_xyz_files_equal(path1: Path, path2: Path, atol: float=1e-8):
+  xyz1 = xyz_parser.read_xyz_file_as_arrays(path1, use_cache=False)
+  xyz2 = xyz_parser.read_xyz_file_as_arrays(path2, use_cache=False)
+  assert xyz1["descriptions"] == xyz2["descriptions"]
+  np.testing.assert_array_equal(xyz1["atomic_nrs"], xyz2["atomic_nrs"])
+  np.testing.assert_allclose(xyz1["coords"], xyz2["coords"], rtol=0, atol=atol)
+
+
+def test_process_many_log_files_relative_paths(log_dir, baseline_dir, tmp_path, monkeypatch):
+  monkeypatch.chdir(tmp_path)
+  out_dir = Path("out")
+  out_dir.mkdir()
+  input_paths = [
+    "./logs/conf_00.log",
+    "logs/conf_01.log",
+    "./logs/conf_02.log",
+    "logs/conf_noconv.log",
+    Path("logs/conf_energy.log"),
+  ]
+
+  GU.process_many_log_files(
+                            input_paths=input_paths,
+                            output_dir=out_dir,
+                            do_only_summary=True,
+                            write_last_opt_steps_file_path=out_dir.joinpath("last_opt_steps.xyz")
+                          )
+
+  summary = json.loads(out_dir.joinpath("aggregate.log").read_text())["summary"]
+  assert "error" not in summary
+  assert summary["num_experiments_successful"] == 5
+  assert summary["ranking"][0].endswith("source: conf_00.log")
+  assert summary["last_opt_steps_file"] == str(out_dir.joinpath("last_opt_steps_aligned.xyz"))
+
+  assert_xyz_files_equal(out_dir.joinpath("last_opt_steps.xyz"), baseline_dir.joinpath("last_opt_steps.xyz"))
+  assert_xyz_files_equal(out_dir.joinpath("last_opt_steps_aligned.xyz"), baseline_dir.joinpath("last_opt_steps_aligned.xyz"))
+
+
+def test_process_many_log_files_bulk_writer(log_dir, tmp_path):
+  input_paths = sorted(log_dir.glob("*.log"))
+  out_dirs = [tmp_path.joinpath("default"), tmp_path.joinpath("bulk")]
+
+  for out_dir, use_bulk_writer in zip(out_dirs, [False, True]):
+    out_dir.mkdir()
+    GU.process_many_log_files(
+                              input_paths=input_paths,
+                              output_dir=out_dir,
+                              do_only_summary=True,
+                              write_last_opt_steps_file_path=out_dir.joinpath("last_opt_steps.xyz"),
+                              use_bulk_writer=use_bulk_writer
+                            )
+
+  for name in ["last_opt_steps.xyz", "last_opt_steps_aligned.xyz"]:
+    assert_xyz_files_equal(out_dirs[0].joinpath(name), out_dirs[1].joinpath(name))
+    # fixed 8 decimals of the bulk writer
+    assert len(out_dirs[1].joinpath(name).read_text().splitlines()[2]) == 56
+
+  output_paths = [
+    au.write_aligned_xyz_file(
+                    input_path=out_dir.joinpath("last_opt_steps.xyz"),
+                    output_path=out_dir.joinpath("aligned.xyz"),
+                    use_bulk_writer=use_bulk_writer
+                  ) \
+      for out_dir, use_bulk_writer in zip(out_dirs, [False, True])
+  ]
+  assert_xyz_files_equal(*output_paths)
+  assert len(Path(output_paths[1]).read_text().splitlines()[2]) == 56
+
+
+def test_process_many_log_files_errors(log_dir, tmp_path):
+  input_paths = [log_dir.joinpath("conf_00.log"), log_dir.joinpath("missing.log")]
+
+  with pytest.raises(FileNotFoundError):
+    GU.process_many_log_files(input_paths=input_paths, output_dir=tmp_path, do_only_summary=True)
+
+  GU.process_many_log_files(input_paths=input_paths, output_dir=tmp_path, do_only_summary=True, workers=2)
+  summary = json.loads(tmp_path.joinpath("aggregate.log").read_text())["summary"]
+  assert summary["num_experiments_successful"] == 1
+  assert [x["input_path"] for x in summary["error"][0]["items_with_errors"]] == [str(input_paths[1])]
+
+
+baseline_log_names = ["conf_00", "conf_energy", "conf_noconv"]
+
+
+def test_process_one_log_file_matches_baseline(log_dir, baseline_dir, tmp_path, monkeypatch):
+  monkeypatch.chdir(log_dir.parent)
+  out_dir = Path("out")
+  out_dir.mkdir()
+  expected_dir = baseline_dir.joinpath("process_one_log_file")
+  expected = json.loads(expected_dir.joinpath("results.json").read_text())
+
+  for name, expected_res in zip(baseline_log_names, expected):
+    res = GU.process_one_log_file(input_path=Path(f"logs/{name}.log"), output_dir=out_dir)
+    assert res == expected_res
+
+  for path in expected_dir.glob("conf_*"):
+    assert out_dir.joinpath(path.name).read_bytes() == path.read_bytes(), path.name
+
+
+def test_extract_optimization_steps_as_arrays(log_dir, baseline_dir):
+  for name in ["conf_00", "conf_noconv"]:
+    path = log_dir.joinpath(f"{name}.log")
+    expected = xyz_parser.read_xyz_file_as_arrays(
+                              baseline_dir.joinpath("process_one_log_file", f"{name}_opt_steps.xyz"),
+                              use_cache=False
+                            )
+    expected_energies = [float(x.split(",")[0]) for x in expected["descriptions"]]
+
+    with GaussianLogIndex(path) as index:
+      for log in [path, GaussianLog(path), index]:
+        res = GU.extract_optimization_steps_as_arrays(file_path=log)
+        np.testing.assert_array_equal(res["atomic_nrs"], expected["atomic_nrs"])
+        np.testing.assert_array_equal(res["coords"], expected["coords"])
+        assert res["energies"].tolist() == expected_energies
+
+
+@pytest.mark.parametrize("compression", ["gz", "bz2", "xz"])
+def test_process_one_log_file_compressed(log_dir, baseline_dir, tmp_path, compression):
+  expected_dir = baseline_dir.joinpath("process_one_log_file")
+  expected = json.loads(expected_dir.joinpath("results.json").read_text())[0]
+  path = log_dir.joinpath("conf_00.log")
+  compressed_path = tmp_path.joinpath(f"conf_00.log.{compression}")
+  with ut.open_text_file(compressed_path, "w") as f:
+    f.write(path.read_text())
+
+  res = GU.process_one_log_file(input_path=compressed_path, output_dir=tmp_path)
+  assert res["results"]["scf_summary"] == expected["results"]["scf_summary"]
+  for file_name in ["conf_00.xyz", "conf_00_opt_steps.xyz", "conf_00_last_step.xyz", "conf_00_scf_summary.txt"]:
+    # descriptions name the source file, incl. compression suffix
+    text = tmp_path.joinpath(file_name).read_text().replace(compressed_path.name, path.name)
+    assert text == expected_dir.joinpath(file_name).read_text(), file_name
+
+  # compressed xyz output
+  xyz_data = xyz_parser.read_xyz_file(tmp_path.joinpath("conf_00_opt_steps.xyz"))
+  output_path = tmp_path.joinpath(f"opt_steps.xyz.{compression}")
+  xyz_parser.write_xyz_file_from_list_of_dicts(output_path=output_path, xyz_as_list_of_dicts=xyz_data)
+  assert [{**x, "source": ""} for x in xyz_parser.read_xyz_file(output_path)] == [{**x, "source": ""} for x in xyz_data]
+
+
+@pytest.mark.parametrize("step_nr", [0, 2])
+def test_energy_only_matches_full_summary(log_dir, tmp_path, step_nr):
+  input_paths = sorted(log_dir.glob("*.log"))
+  for path in input_paths:
+    expected = GU.process_one_log_file(input_path=path, do_only_summary=True, extract_summary_step_nr=step_nr)
+    res = GU.process_one_log_file(input_path=path, energy_only=True, extract_summary_step_nr=step_nr)
+    expected_summary = expected["results"]["scf_summary"]
+    for k, x in res["results"]["scf_summary"].items():
+      if k != "scf_summary_file":
+        assert x == expected_summary[k], (path.name, k)
+
+  summaries = []
+  for energy_only in [False, True]:
+    GU.process_many_log_files(
+                              input_paths=input_paths,
+                              output_dir=tmp_path,
+                              extract_summary_step_nr=step_nr,
+                              do_only_summary=True,
+                              energy_only=energy_only
+                            )
+    summaries.append(json.loads(tmp_path.joinpath("aggregate.log").read_text())["summary"])
+  assert summaries[1] == summaries[0]
+
+
+def test_process_many_log_files_journal(log_dir, tmp_path, monkeypatch):
+  input_paths = [log_dir.joinpath(x) for x in ["conf_00.log", "conf_01.log", "conf_02.log"]]
+  journal_path = tmp_path.joinpath("journal.jsonl")
+  kwargs = {"output_dir": tmp_path, "do_only_summary": True, "journal_path": journal_path}
+
+  GU.process_many_log_files(input_paths=input_paths, **kwargs)
+  expected = json.loads(tmp_path.joinpath("aggregate.log").read_text())
+
+  # interrupted run: last line written only partially, and the last file is missing
+  lines = journal_path.read_text().splitlines()
+  assert len(lines) == 3
+  journal_path.write_text("\n".join(lines[:2] + [lines[2][:20]]))
+
+  processed_paths = []
+  process_one_log_file = GU.process_one_log_file
+  def process_and_record(input_path, **options):
+    processed_paths.append(input_path)
+    return process_one_log_file(input_path=input_path, **options)
+  monkeypatch.setattr(GU, "process_one_log_file", process_and_record)
+
+  GU.process_many_log_files(input_paths=input_paths, **kwargs)
+  assert processed_paths == input_paths[2:]
+  assert json.loads(tmp_path.joinpath("aggregate.log").read_text()) == expected
+
+  # other options: journal lines are not used
+  GU.process_many_log_files(input_paths=input_paths, extract_summary_step_nr=2, **kwargs)
+  assert processed_paths == input_paths[2:] + input_paths
+
+
+def test_process_many_log_files_journal_skips_errors(log_dir, tmp_path):
+  late_path = tmp_path.joinpath("late.log")
+  input_paths = [log_dir.joinpath("conf_00.log"), late_path]
+  journal_path = tmp_path.joinpath("journal.jsonl")
+  kwargs = {"output_dir": tmp_path, "do_only_summary": True, "journal_path": journal_path, "workers": 2}
+
+  GU.process_many_log_files(input_paths=input_paths, **kwargs)
+  assert len(journal_path.read_text().splitlines()) == 1
+
+  # failed file is processed again on resume
+  late_path.write_bytes(log_dir.joinpath("conf_01.log").read_bytes())
+  GU.process_many_log_files(input_paths=input_paths, **kwargs)
+  summary = json.loads(tmp_path.joinpath("aggregate.log").read_text())["summary"]
+  assert summary["num_experiments_successful"] == 2
+  assert len(journal_path.read_text().splitlines()) == 2
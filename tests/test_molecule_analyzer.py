@@ -0,0 +1,35 @@
+import pytest
+
+import ase_utils as au
+from dataset import Dataset
+import features as ft
+import molecule_analyzer as ma
+import synthetic_files as sf
+
+
+@pytest.mark.parametrize("num_features", [0, 2])
+def test_calculate_dataset_list_streaming(tmp_path, monkeypatch, num_features):
+  elements = ["C", "C", "O", "H", "H"]
+  paths = [
+    sf.write_xyz_file(tmp_path.joinpath(f"{i}.xyz"), sf.create_random_coords(4 + i, len(elements), seed=i), elements) \
+      for i in range(3)
+  ]
+  dataset = Dataset(description="synthetic", file_paths=paths)
+  features_list = [ft.Distance(label="C1-C2", atom_idx1=0, atom_idx2=1), ft.Distance(label="C1-O3", atom_idx1=0, atom_idx2=2)][:num_features]
+  expected = ma.calculate_dataset_list(dataset_list=[dataset], features_list=features_list)[0]
+
+  # each file is read only once
+  read_paths = []
+  iter_ase_atoms_from_xyz_file = au.iter_ase_atoms_from_xyz_file
+  def iter_and_record(input_path, **kwargs):
+    read_paths.append(input_path)
+    return iter_ase_atoms_from_xyz_file(input_path=input_path, **kwargs)
+  monkeypatch.setattr(au, "iter_ase_atoms_from_xyz_file", iter_and_record)
+
+  res = ma.calculate_dataset_list_streaming(dataset_list=[dataset], features_list=features_list)[0]
+  assert read_paths == paths
+  assert "molecules" not in res
+  for k in ["dataset_description", "dataset_sources", "molecules_names", "features_info"]:
+    assert res[k] == expected[k]
+  assert [(x.name, x.labels, x.values) for x in res["calc_by_features"]] == \
+          [(x.name, x.labels, x.values) for x in expected["calc_by_features"]]
@@ -0,0 +1,69 @@
+import json
+import os
+
+import gaussian_utils as GU
+from result_cache import ResultCache
+
+
+def test_result_cache_get_put(tmp_path):
+  cache = ResultCache(cache_dir=tmp_path.joinpath("cache"))
+  path = tmp_path.joinpath("a.log")
+  path.write_text("a")
+  options = {"step_nr": 0}
+
+  assert cache.get(file_path=path, options=options) == None
+  assert cache.put(file_path=path, options=options, result={"results": {"x": 1}})
+  assert cache.get(file_path=path, options=options) == {"results": {"x": 1}}
+  assert cache.get(file_path=path, options={"step_nr": 1}) == None
+
+  # results with errors are not cached
+  other_path = tmp_path.joinpath("b.log")
+  other_path.write_text("b")
+  assert not cache.put(file_path=other_path, options=options, result={"results": {"scf_summary": {"error": "x"}}})
+  assert cache.get(file_path=other_path, options=options) == None
+  assert len(cache) == 1
+
+  # modified input file
+  path.write_text("aa")
+  assert cache.get(file_path=path, options=options) == None
+
+
+def test_result_cache_evicts_least_recently_used(tmp_path):
+  paths = [tmp_path.joinpath(f"{i}.log") for i in range(4)]
+  for x in paths:
+    x.write_text(x.name)
+
+  cache = ResultCache(cache_dir=tmp_path.joinpath("cache"))
+  options = {}
+  cache.put(file_path=paths[0], options=options, result={"v": 0})
+  entry_size = cache.total_size_bytes
+  cache.max_size_bytes = 3 * entry_size
+
+  cache.put(file_path=paths[1], options=options, result={"v": 1})
+  cache.put(file_path=paths[2], options=options, result={"v": 2})
+  assert cache.get(file_path=paths[0], options=options) == {"v": 0}
+  cache.put(file_path=paths[3], options=options, result={"v": 3})
+
+  assert len(cache) == 3
+  assert cache.total_size_bytes == sum(x.stat().st_size for x in cache.get_entry_paths())
+  assert [cache.get(file_path=x, options=options) for x in paths] == [{"v": 0}, None, {"v": 2}, {"v": 3}]
+
+  # usage order is restored from modification times of the entries
+  for i, x in enumerate([paths[2], paths[0], paths[3]]):
+    os.utime(cache.get_entry_path(x), ns=(i * 10**9, i * 10**9))
+  cache = ResultCache(cache_dir=tmp_path.joinpath("cache"), max_size_bytes=2 * entry_size)
+  cache.evict()
+  assert [cache.get(file_path=x, options=options) for x in paths] == [{"v": 0}, None, None, {"v": 3}]
+
+
+def test_process_many_log_files_cache(log_dir, tmp_path):
+  input_paths = [log_dir.joinpath(x) for x in ["conf_00.log", "conf_01.log", "missing.log"]]
+  cache = ResultCache(cache_dir=tmp_path.joinpath("cache"))
+  summaries = []
+  for _ in range(2):
+    GU.process_many_log_files(input_paths=input_paths, output_dir=tmp_path, do_only_summary=True, workers=2, cache=cache)
+    summaries.append(json.loads(tmp_path.joinpath("aggregate.log").read_text())["summary"])
+    assert len(cache) == 2
+
+  assert summaries[0] == summaries[1]
+  assert summaries[0]["num_experiments_successful"] == 2
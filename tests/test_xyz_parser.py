@@ -0,0 +1,158 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import ase_utils as au
+import constants as C
+import synthetic_files as sf
+import utils as ut
+import xyz_parser
+from gaussian_log import gaussian_log_index_file_suffix
+
+
+elements = ["C", "C", "O", "H", "H", "H", "H"]
+
+
+def create_xyz_file(tmp_path, num_structures: int=12, seed: int=0):
+  coords = sf.create_random_coords(num_structures=num_structures, num_atoms=len(elements), seed=seed)
+  return sf.write_xyz_file(tmp_path.joinpath("structures.xyz"), coords, elements)
+
+
+def test_xyz_index_sidecar(tmp_path):
+  path = create_xyz_file(tmp_path)
+  expected = xyz_parser.read_xyz_file(input_path=path)
+  sidecar_path = ut.get_sidecar_file_path(path, xyz_parser.xyz_index_file_suffix)
+  assert xyz_parser.xyz_index_file_suffix != gaussian_log_index_file_suffix
+
+  for _ in range(2):
+    with xyz_parser.XyzIndex(file_path=path, use_sidecar=True) as index:
+      assert len(index) == len(expected)
+      assert index[::5] == expected[::5]
+      assert index[-1] == expected[-1]
+    assert json.loads(sidecar_path.read_text())["version"] == xyz_parser.xyz_index_version
+
+  # sidecar of other format is rebuilt
+  sidecar = json.loads(sidecar_path.read_text())
+  sidecar.pop("start_lines")
+  sidecar_path.write_text(json.dumps(sidecar))
+  with xyz_parser.XyzIndex(file_path=path, use_sidecar=True) as index:
+    assert index.get_items([0, 3]) == [expected[0], expected[3]]
+  assert "start_lines" in json.loads(sidecar_path.read_text())
+
+
+def test_write_ase_atoms_to_xyz_file(tmp_path):
+  path = create_xyz_file(tmp_path)
+  mols = au.create_ase_atoms_list_from_xyz_file(input_path=path, name="structures")
+
+  output_path = au.write_ase_atoms_to_xyz_file(atoms_list=mols, output_path=tmp_path.joinpath("default.xyz"))
+  lines = Path(output_path).read_text().splitlines()
+  num_lines = len(elements) + 2
+  for i, mol in enumerate(mols):
+    assert lines[i * num_lines] == str(len(elements))
+    assert lines[(i * num_lines + 2):((i + 1) * num_lines)] == \
+            [xyz_parser.convert_xyz_coords_to_str(el, x, y, z) for el, (x, y, z) in zip(elements, mol.positions)]
+
+  bulk_path = au.write_ase_atoms_to_xyz_file(atoms_list=mols, output_path=tmp_path.joinpath("bulk.xyz"), use_bulk_writer=True)
+  xyz1 = xyz_parser.read_xyz_file_as_arrays(output_path, use_cache=False)
+  xyz2 = xyz_parser.read_xyz_file_as_arrays(bulk_path, use_cache=False)
+  assert xyz1["descriptions"] == xyz2["descriptions"]
+  np.testing.assert_allclose(xyz1["coords"], xyz2["coords"], rtol=0, atol=1e-8)
+  assert [len(x) for x in Path(bulk_path).read_text().splitlines()[2:num_lines]] == [56] * len(elements)
+
+
+def test_write_xyz_files_into_one(tmp_path, baseline_dir):
+  paths = [
+    sf.write_xyz_file(tmp_path.joinpath("a.xyz"), sf.create_random_coords(12, len(elements), seed=0), elements),
+    sf.write_xyz_file(tmp_path.joinpath("b.xyz"), sf.create_random_coords(5, len(elements), seed=1), elements),
+  ]
+  selection = [(paths[0], 2), (paths[1], [0, -1, 50]), (paths[0], None), (paths[1], 100)]
+
+  output_path = xyz_parser.write_xyz_files_into_one(selection, tmp_path.joinpath("default.xyz"))
+  assert Path(output_path).read_bytes() == baseline_dir.joinpath("xyz_files_into_one.xyz").read_bytes()
+
+  copy_path = xyz_parser.write_xyz_files_into_one(selection, tmp_path.joinpath("copy.xyz"), copy_bytes=True)
+  expected = xyz_parser.read_xyz_file(output_path, convert_coords_to_float=True)
+  res = xyz_parser.read_xyz_file(copy_path, convert_coords_to_float=True)
+  assert [{**x, "source": ""} for x in res] == [{**x, "source": ""} for x in expected]
+
+
+def test_read_xyz_file_as_arrays(tmp_path):
+  path = create_xyz_file(tmp_path)
+  # other atoms in the last block: not stacked
+  mixed_path = tmp_path.joinpath("mixed.xyz")
+  mixed_path.write_text(path.read_text() + "2\nlast\nH 0.0 0.0 0.0\nH 0.0 0.0 0.74\n")
+
+  for p in [path, mixed_path]:
+    expected = xyz_parser.read_xyz_file(input_path=p, convert_coords_to_float=True)
+    res = xyz_parser.read_xyz_file_as_arrays(input_path=p, use_cache=False)
+    assert res["stacked"] == (p == path)
+    assert res["descriptions"] == [x["description"] for x in expected]
+    assert res["start_lines"] == [x["start_line"] for x in expected]
+    for coords, xyz in zip(res["coords"], expected):
+      np.testing.assert_array_equal(coords, [x[1] for x in xyz["xyz_lines"]])
+    atomic_nrs = [res["atomic_nrs"]] * len(expected) if res["stacked"] else res["atomic_nrs"]
+    assert [[C.get_atomic_number(x[0]) for x in xyz["xyz_lines"]] for xyz in expected] == [x.tolist() for x in atomic_nrs]
+
+
+def test_xyz_arrays_cache(tmp_path):
+  path = create_xyz_file(tmp_path)
+  expected = xyz_parser.read_xyz_file_as_arrays(input_path=path, use_cache=False)
+  cache_paths = xyz_parser.get_xyz_arrays_cache_paths(path)
+
+  res = xyz_parser.read_xyz_file_as_arrays(input_path=path, min_cache_file_size=0)
+  assert all(x.is_file() for x in cache_paths.values())
+  # second read: memory-mapped cache
+  cached = xyz_parser.read_xyz_file_as_arrays(input_path=path, min_cache_file_size=0)
+  assert not cached["coords"].flags.writeable
+  for x in [res, cached]:
+    np.testing.assert_array_equal(x["coords"], expected["coords"])
+    np.testing.assert_array_equal(x["atomic_nrs"], expected["atomic_nrs"])
+    assert x["descriptions"] == expected["descriptions"]
+
+  # changed file: cache is rebuilt
+  other_dir = tmp_path.joinpath("other")
+  other_dir.mkdir()
+  other_path = create_xyz_file(other_dir, num_structures=5, seed=1)
+  path.write_text(other_path.read_text())
+  res = xyz_parser.read_xyz_file_as_arrays(input_path=path, min_cache_file_size=0)
+  np.testing.assert_array_equal(res["coords"], xyz_parser.read_xyz_file_as_arrays(input_path=other_path, use_cache=False)["coords"])
+
+
+@pytest.mark.parametrize("use_threads", [True, False])
+def test_create_ase_atoms_list_from_xyz_files_parallel(tmp_path, use_threads):
+  paths = []
+  for i in range(4):
+    file_dir = tmp_path.joinpath(str(i))
+    file_dir.mkdir()
+    paths.append(create_xyz_file(file_dir, num_structures=3 + i, seed=i))
+
+  expected = [mol for p in paths for mol in au.create_ase_atoms_list_from_xyz_file(input_path=p, name=p.stem)]
+  res = au.create_ase_atoms_list_from_xyz_files(input_paths=paths, workers=3, use_threads=use_threads)
+  assert len(res) == len(expected)
+  for mol, expected_mol in zip(res, expected):
+    assert mol.info == expected_mol.info
+    assert mol.get_chemical_symbols() == expected_mol.get_chemical_symbols()
+    np.testing.assert_array_equal(mol.positions, expected_mol.positions)
+
+
+def test_read_xyz_many_files_closes_index(tmp_path, monkeypatch):
+  path = create_xyz_file(tmp_path)
+  lines = path.read_text().splitlines()
+  lines[2] = "C x 0.0 0.0"
+  path.write_text("\n".join(lines) + "\n")
+
+  closed = []
+  close = xyz_parser.XyzIndex.close
+  def close_and_record(self):
+    closed.append(self.file_path)
+    close(self)
+  monkeypatch.setattr(xyz_parser.XyzIndex, "close", close_and_record)
+
+  with pytest.raises(ValueError):
+    xyz_parser.read_xyz_many_files([(path, [0, 1])], convert_coords_to_float=True)
+  assert len(closed) > 0
+  with pytest.raises(ValueError):
+    au.create_ase_atoms_list_from_xyz_file(input_path=path, name="structures", item_idxs=[0, 1])
+  assert len(closed) > 1
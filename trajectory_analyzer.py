@@ -16,6 +16,7 @@ class TrajectoryAnalyzer():
   base_trajectory: MultiItemFileSource
   trajectories_to_compare: List[MultiItemFileSource] = field(default_factory=list)
   metric_functions: List[Tuple[Callable, str]] = field(default_factory=list)
+  workers: int = 1 # trajectory files are read in parallel, see au.load_ase_atoms_lists()
 
   base_at_steps: List[Atoms] = field(init=False)
   mols_to_compare_at_steps: List[List[Atoms]] = field(init=False)
@@ -23,8 +24,12 @@ class TrajectoryAnalyzer():
 
 
   def __post_init__(self):
-    self.base_at_steps = au.extract_mols_from_xyz_files(sources=[self.base_trajectory])[0]
-    self.mols_to_compare_at_steps = au.extract_mols_from_xyz_files(sources=self.trajectories_to_compare)
+    mols = au.extract_mols_from_xyz_files(
+                    sources=[self.base_trajectory] + self.trajectories_to_compare,
+                    workers=self.workers
+                  )
+    self.base_at_steps = mols[0]
+    self.mols_to_compare_at_steps = mols[1:]
     if self.metric_functions and len(self.metric_functions) > 0:
       self.metrics = self.calulate_all_metrics(metric_funcs=self.metric_functions)
 
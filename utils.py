@@ -1,15 +1,71 @@
+import bz2
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import gzip
+import hashlib
 from itertools import chain
 import json
+import lzma
 import numpy as np
+import os
 from pathlib import Path
 import shutil
-from typing import Any, Dict, List, Tuple, Union
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Tuple, Union
+
+
+# Files with these suffixes are decompressed/compressed on the fly by open_text_file().
+compressed_file_openers = {
+    ".gz": gzip.open,
+    ".bz2": bz2.open,
+    ".xz": lzma.open,
+  }
 
 ################################################################
 # Generic functions
 ################################################################
 
 
+def copy_file_byte_ranges(
+                            source_path: Union[str, Path],
+                            target_file: IO,
+                            byte_ranges: List[Tuple[int, int]],
+                            chunk_size: int=2**24
+                          ) -> int:
+  '''
+    Copies (offset, length) byte ranges of source_path into target_file (opened in binary mode),
+    without decoding: os.sendfile() where available, otherwise read/write in chunks.
+    Returns number of bytes copied.
+  '''
+  target_file.flush()
+  target_fd = target_file.fileno()
+  use_sendfile = hasattr(os, "sendfile")
+  res = 0
+  with open(source_path, "rb") as f:
+    for offset, length in byte_ranges:
+      end = offset + length
+      while offset < end and use_sendfile:
+        try:
+          num_bytes = os.sendfile(target_fd, f.fileno(), offset, min(end - offset, chunk_size))
+        except OSError:
+          # e.g. file system without sendfile support
+          use_sendfile = False
+          break
+        if num_bytes == 0:
+          end = offset # source is shorter than expected
+        offset += num_bytes
+        res += num_bytes
+
+      f.seek(offset)
+      while offset < end:
+        data = f.read(min(end - offset, chunk_size))
+        if len(data) == 0:
+          break
+        target_file.write(data)
+        offset += len(data)
+        res += len(data)
+
+  return res
+
+
 def copy_files(
                 files_to_copy: List[Path],
                 target_folder: Union[str, Path],
@@ -52,13 +108,43 @@ def get_block_start_line_nrs(
   return [i for i,x in enumerate(lines) if search_text in x]
 
 
+def get_file_hash(file_path: Union[str, Path], chunk_size: int=2**20) -> str:
+  '''
+    Returns sha256 hex digest of the file content.
+  '''
+  res = hashlib.sha256()
+  with open(file_path, "rb") as f:
+    for chunk in iter(lambda: f.read(chunk_size), b""):
+      res.update(chunk)
+
+  return res.hexdigest()
+
+
+def get_file_signature(file_path: Union[str, Path]) -> Dict:
+  '''
+    Returns size and modification time of the file:
+      {"size": int, "mtime": int (nanoseconds)}
+    Used to detect whether the file has changed.
+  '''
+  stat = Path(file_path).stat()
+  return {
+          "size": stat.st_size,
+          "mtime": stat.st_mtime_ns
+        }
+
+
 def get_file_paths_in_dir(
                           search_dir: Union[str, Path],
                           file_extension: str
                         ) -> List[Path]:
+  '''
+    Compressed files match as well: file_extension=".log" matches "x.log" and "x.log.gz".
+  '''
 
   return [x for x in Path(search_dir).iterdir() \
-                if x.is_file() and x.suffix.endswith(file_extension)]
+                if x.is_file() \
+                  and (x.suffix.endswith(file_extension) \
+                        or get_file_suffix(x).endswith(file_extension))]
 
 
 def get_file_paths_in_many_dirs(
@@ -71,6 +157,30 @@ def get_file_paths_in_many_dirs(
     )
 
 
+def get_file_stem(file_path: Union[str, Path]) -> str:
+  '''
+    Same as Path.stem, but ignores compression suffix: "x.log.gz" -> "x"
+  '''
+  file_path = Path(file_path)
+  return Path(file_path.stem).stem if is_compressed_file(file_path) else file_path.stem
+
+
+def get_file_suffix(file_path: Union[str, Path]) -> str:
+  '''
+    Same as Path.suffix, but ignores compression suffix: "x.log.gz" -> ".log"
+  '''
+  file_path = Path(file_path)
+  return Path(file_path.stem).suffix if is_compressed_file(file_path) else file_path.suffix
+
+
+def get_sidecar_file_path(file_path: Union[str, Path], sidecar_suffix: str) -> Path:
+  '''
+    Path of a companion file next to file_path: "x.log" -> "x.log{sidecar_suffix}"
+  '''
+  file_path = Path(file_path)
+  return file_path.with_name(f"{file_path.name}{sidecar_suffix}")
+
+
 def get_line_nrs_starts_with_text(
                               lines: List[str],
                               search_text: str,
@@ -84,6 +194,10 @@ def get_list_slice_by_idxs(input_list: List[Any], idxs: List[int]) -> List[Any]:
   return [input_list[i] for i in idxs if abs(i) < input_length]
 
 
+def is_compressed_file(file_path: Union[str, Path]) -> bool:
+  return Path(file_path).suffix.lower() in compressed_file_openers
+
+
 def is_within_tolerance(value1: float, value2: float, tolerance: float) -> bool:
   return abs(value1 - value2) < tolerance
 
@@ -92,30 +206,133 @@ def linspace_idxs(start_idx: int, end_idx: int, num_items: int) -> List[int]:
   return list(np.linspace(start_idx, end_idx, num=num_items, dtype=int))
 
 
+def map_parallel(
+                  func: Callable,
+                  items: Iterable[Any],
+                  workers: int=1,
+                  chunksize: int=1,
+                  use_threads: bool=False
+                ) -> Iterator[Any]:
+  '''
+    Same as map(func, items), but if workers > 1 then runs in a process pool.
+    Results are returned in the input order.
+    func must be picklable, i.e. module level function or functools.partial of it.
+
+    use_threads: thread pool instead of process pool, for I/O bound func,
+      e.g. reading many small files from network storage.
+  '''
+
+  if workers == None or workers <= 1:
+    yield from map(func, items)
+  elif use_threads:
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+      yield from executor.map(func, items)
+  else:
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+      yield from executor.map(func, items, chunksize=chunksize)
+
+
+def map_parallel_as_completed(
+                  func: Callable,
+                  items: Iterable[Any],
+                  workers: int=1,
+                  use_threads: bool=False
+                ) -> Iterator[Tuple[int, Any]]:
+  '''
+    Same as map_parallel(), but yields (item idx, result) as soon as each item is completed,
+    i.e. not in the input order.
+  '''
+
+  if workers == None or workers <= 1:
+    yield from enumerate(map(func, items))
+  else:
+    executor_class = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+      futures = {executor.submit(func, x): i for i, x in enumerate(items)}
+      for future in as_completed(futures):
+        yield futures[future], future.result()
+
+
+def open_text_file(file_path: Union[str, Path], mode: str="r") -> IO:
+  '''
+    Same as open(file_path, mode), but files with compression suffix
+    (.gz, .bz2, .xz) are decompressed/compressed on the fly.
+  '''
+  opener = compressed_file_openers.get(Path(file_path).suffix.lower(), None)
+  if opener != None:
+    return opener(file_path, f"{mode}t")
+
+  return open(file_path, mode)
+
+
 def read_text_file_as_lines(file_path: Union[str, Path]) -> List[str]:
-  with open(file_path) as f:
+  with open_text_file(file_path) as f:
     lines = f.readlines()
 
   return lines
 
 
 def read_json_file_to_dict(file_path: Union[str, Path]) -> Dict:
-  with open(file_path) as f:
+  with open_text_file(file_path) as f:
     res = json.load(f)
 
   return res
   
 
+def read_sidecar_file(
+                      file_path: Union[str, Path],
+                      sidecar_suffix: str,
+                      version: int
+                    ) -> Union[Dict, None]:
+  '''
+    Reads json sidecar file of file_path, written by write_sidecar_file().
+    Returns None if sidecar doesn't exist, is of different version,
+    or file_path has changed since (size, modification time).
+  '''
+  try:
+    data = read_json_file_to_dict(get_sidecar_file_path(file_path, sidecar_suffix))
+    is_valid = data["version"] == version \
+                and data["signature"] == get_file_signature(file_path)
+  except (OSError, ValueError, KeyError, TypeError):
+    is_valid = False
+
+  return data if is_valid else None
+
+
 def to_json_str(data: Any) -> str:
   return json.dumps(data, sort_keys=False, indent=4)
 
 
 def write_text_file(file_name: Union[str, Path], text: str) -> str:
   input_path = Path(file_name)
-  _ = input_path.write_text(text)
+  with open_text_file(input_path, "w") as f:
+    f.write(text)
   return str(input_path)
 
 
+def write_sidecar_file(
+                      file_path: Union[str, Path],
+                      sidecar_suffix: str,
+                      version: int,
+                      data: Dict
+                    ) -> Union[Path, None]:
+  '''
+    Writes data as json sidecar file next to file_path, together with version and signature of file_path.
+    Returns path of the sidecar, or None if it could not be written, e.g. read-only directory.
+  '''
+  sidecar_data = {
+    "version": version,
+    "file_name": Path(file_path).name,
+    "signature": get_file_signature(file_path),
+    **data,
+  }
+
+  try:
+    return Path(write_text_file(get_sidecar_file_path(file_path, sidecar_suffix), json.dumps(sidecar_data)))
+  except OSError:
+    return None
+
+
 def write_text_file_json(file_name: Union[str, Path], data: Any) -> str:
   return write_text_file(file_name, to_json_str(data))
 
@@ -125,7 +342,7 @@ def write_text_file_from_lines(
                                 lines: List[str]
                                 ) -> str:
 
-  with open(file_path, 'w') as f:
+  with open_text_file(file_path, 'w') as f:
     for line in lines:
       if isinstance(line, str):
         f.write(line)
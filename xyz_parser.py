@@ -1,16 +1,45 @@
 import copy
+from dataclasses import dataclass, field
 from datetime import datetime
-from itertools import chain
+import io
+from itertools import chain, islice
 import json
+import mmap
 import numpy as np
 import os
 from pathlib import Path
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Dict, Iterator, List, Tuple, Union
 import utils as ut
 
 import constants as C
 
 
+# Sidecar file of XyzIndex: "x.xyz" -> "x.xyz.molli_xyz_index.json",
+# distinct from the index of Gaussian log files (gaussian_log.gaussian_log_index_file_suffix).
+xyz_index_file_suffix = ".molli_xyz_index.json"
+
+# Increase when the format of the sidecar index changes: old files are then rebuilt.
+xyz_index_version = 2
+xyz_index_keys = ["offsets", "lengths", "start_lines"]
+
+# Binary cache of read_xyz_file_as_arrays(): "x.xyz" -> "x.xyz.molli_arrays.json",
+# "x.xyz.molli_coords.npy", "x.xyz.molli_atomic_nrs.npy"
+xyz_arrays_cache_file_suffixes = {
+    "meta": ".molli_arrays.json",
+    "coords": ".molli_coords.npy",
+    "atomic_nrs": ".molli_atomic_nrs.npy",
+  }
+
+xyz_arrays_cache_version = 1
+
+# Smaller files are parsed every time: reading text is fast enough.
+xyz_arrays_cache_min_file_size = 2**24
+
+# Atom line of write_xyz_arrays(): x, y, z end at the same columns (20, 38, 56)
+# as in convert_xyz_coords_to_str(), with fixed 8 decimals.
+xyz_atom_line_format = "%-2s%18.8f%18.8f%18.8f"
+
+
 def convert_xyz_coords_to_str(
                                 element: str,
                                 x: float,
@@ -34,6 +63,18 @@ def convert_xyz_coords_to_str(
   return f"{element}{space_1}{x_str}{space_2}{y_str}{space_3}{z_str}"
 
 
+def convert_xyz_dicts_to_text(xyz_as_list_of_dicts: List[Dict]) -> str:
+  '''
+    Same text as written by write_xyz_file_from_list_of_dicts(), xyz_lines as strings.
+  '''
+  res = []
+  for xyz_dict in xyz_as_list_of_dicts:
+    res.append(f"{xyz_dict['num_atoms']}\n{xyz_dict['description']}\n")
+    res.extend(x if x.endswith("\n") else f"{x}\n" for x in xyz_dict["xyz_lines"])
+
+  return "".join(res)
+
+
 def convert_xyz_lines_to_dict(
                               xyz_data: List[str],
                               convert_coords_to_float: bool=False,
@@ -50,6 +91,34 @@ def convert_xyz_lines_to_dict(
         }
 
 
+def convert_xyz_lines_to_arrays(xyz_lines: List[str]) -> Dict:
+  '''
+    Converts atom lines "element x y z" in bulk:
+    one split for all lines, one numpy conversion for all coordinates.
+    Returns Dictionary {
+      "atomic_nrs": np.ndarray (num_atoms,)
+      "coords": np.ndarray (num_atoms, 3)
+    }
+  '''
+
+  tokens = " ".join(xyz_lines).split()
+  if len(tokens) != 4 * len(xyz_lines):
+    # extra columns, e.g. charges or forces: first 4 columns only
+    tokens = list(chain.from_iterable(x.split()[:4] for x in xyz_lines))
+
+  elements = tokens[0::4]
+  element_to_atomic_nr = {x: C.get_atomic_number(x) for x in set(elements)}
+  atomic_nrs = np.array([element_to_atomic_nr[x] for x in elements], dtype=int)
+
+  del tokens[0::4]
+  coords = np.fromstring(" ".join(tokens), sep=" ").reshape(-1, 3)
+
+  return {
+    "atomic_nrs": atomic_nrs,
+    "coords": coords,
+  }
+
+
 def convert_xyz_str_to_coords(xyz_row: str) -> Tuple:
 
   element, x, y, z = xyz_row.strip().split()[:4]
@@ -61,6 +130,162 @@ def convert_xyz_str_to_coords(xyz_row: str) -> Tuple:
   return (element, [x, y, z])
 
 
+def convert_xyz_block_lines_to_dict(
+                              lines: List[str],
+                              start_line: int,
+                              idx: int,
+                              source: str,
+                              convert_coords_to_float: bool=False,
+                            ) -> Dict:
+  '''
+    lines: one xyz block, starting with the number of atoms line.
+    Returns the same dictionary as items of read_xyz_file().
+  '''
+
+  num_atoms = int(lines[0].strip())
+  description = lines[1].strip() if len(lines) > 1 else ""
+
+  if convert_coords_to_float:
+    xyz_lines = [convert_xyz_str_to_coords(x) for x in lines[2:(num_atoms + 2)]]
+  else:
+    xyz_lines = [x.lstrip() for x in lines[2:(num_atoms + 2)]]
+
+  return {
+          "num_atoms": num_atoms,
+          "description": description,
+          "xyz_lines": xyz_lines,
+          "start_line": start_line,
+          "idx": idx,
+          "source": source,
+        }
+
+
+def get_selected_xyz_idxs(
+                            idx: Union[int, List[int], None],
+                            num_xyz_blocks: int
+                          ) -> List[int]:
+  '''
+    Selection of read_xyz_many_files(): idx can be int, list or tuple of ints,
+    out of range idxs in list are skipped. Otherwise (incl. int out of range) all xyz blocks.
+  '''
+  if isinstance(idx, int) and abs(idx) < num_xyz_blocks:
+    return [idx]
+  elif isinstance(idx, list) or isinstance(idx, tuple):
+    return [i for i in idx if isinstance(i, int) and abs(i) < num_xyz_blocks]
+
+  return list(range(num_xyz_blocks))
+
+
+def index_xyz_frames(
+                      mapped_file: mmap.mmap,
+                      chunk_size: int=2**26
+                    ) -> Dict[str, List[int]]:
+  '''
+    Finds xyz blocks the same way as read_xyz_file(), but on bytes of memory-mapped file:
+    newlines are located with numpy in chunks, and only the number of atoms lines are decoded.
+    Returns Dictionary {
+      "offsets": byte offset of each xyz block,
+      "lengths": length of each xyz block in bytes,
+      "start_lines": line nr of each xyz block,
+    }
+  '''
+
+  file_size = len(mapped_file)
+  offsets = []
+  lengths = []
+  start_lines = []
+
+  num_lines_to_skip = 0 # lines of the current xyz block not yet seen
+  line_nr = 0
+  for chunk_start in range(0, file_size, chunk_size):
+    chunk = np.frombuffer(mapped_file, dtype=np.uint8, count=min(chunk_size, file_size - chunk_start), offset=chunk_start)
+    # start offsets of the lines in this chunk
+    line_starts = np.flatnonzero(chunk == 10) + (chunk_start + 1)
+    if chunk_start == 0:
+      line_starts = np.concatenate(([0], line_starts))
+    if len(line_starts) > 0 and line_starts[-1] >= file_size:
+      line_starts = line_starts[:-1]
+
+    i = 0
+    num_chunk_lines = len(line_starts)
+    while i < num_chunk_lines:
+      if num_lines_to_skip > 0:
+        skip = min(num_lines_to_skip, num_chunk_lines - i)
+        num_lines_to_skip -= skip
+        i += skip
+        continue
+
+      offset = int(line_starts[i])
+      if len(lengths) < len(offsets):
+        # previous xyz block ends at the start of this line
+        lengths.append(offset - offsets[-1])
+
+      end = mapped_file.find(b"\n", offset)
+      first_line = mapped_file[offset:(file_size if end < 0 else end)].strip()
+      # first line must be numeric: number of atoms
+      if first_line.isdigit():
+        offsets.append(offset)
+        start_lines.append(line_nr + i)
+        num_lines_to_skip = int(first_line) + 2
+      else: # empty or non-numeric line
+        i += 1
+
+    line_nr += num_chunk_lines
+
+  if len(lengths) < len(offsets):
+    # last xyz block ends at the end of the file
+    lengths.append(file_size - offsets[-1])
+
+  return {
+    "offsets": offsets,
+    "lengths": lengths,
+    "start_lines": start_lines,
+  }
+
+
+def iter_xyz_frames(
+                    input_path: Union[str, Path],
+                    as_arrays: bool=True,
+                    convert_coords_to_float: bool=False,
+                  ) -> Iterator[Dict]:
+  '''
+    Streaming version of read_xyz_file(): reads the file line by line and yields one xyz block at a time,
+    memory use is bounded by the size of one xyz block.
+
+    as_arrays=True: xyz_lines are replaced by numpy arrays (see convert_xyz_lines_to_arrays()):
+      keys: 'num_atoms', 'description', 'atomic_nrs', 'coords', 'start_line', 'idx', 'source'
+    as_arrays=False: same dictionaries as in read_xyz_file().
+  '''
+
+  source = Path(input_path).name
+  idx = 0
+  line_nr = 0
+  with ut.open_text_file(input_path) as f:
+    for line in f:
+      first_line = line.strip()
+      # first line must be numeric: number of atoms
+      if not first_line.isdigit(): # empty or non-numeric line
+        line_nr += 1
+        continue
+
+      lines = [line] + list(islice(f, int(first_line) + 1))
+      xyz = convert_xyz_block_lines_to_dict(
+                                lines=lines,
+                                start_line=line_nr,
+                                idx=idx,
+                                source=source,
+                                convert_coords_to_float=convert_coords_to_float and not as_arrays
+                              )
+
+      if as_arrays:
+        xyz.update(convert_xyz_lines_to_arrays(xyz.pop("xyz_lines")))
+
+      yield xyz
+
+      line_nr += len(lines)
+      idx += 1
+
+
 def read_xyz_file(
                   input_path: Union[str, Path],
                   convert_coords_to_float: bool=False,
@@ -91,24 +316,17 @@ def read_xyz_file(
     first_line = lines[start_line].strip()
     # first line must be numeric: number of atoms
     if first_line.isdigit():
-      num_atoms = int(lines[start_line].strip())
-      description = lines[start_line + 1].strip()
+      num_atoms = int(first_line)
       end_line = start_line + num_atoms + 2
 
-      if convert_coords_to_float:
-        xyz_lines = [convert_xyz_str_to_coords(x) for x in lines[(start_line + 2):end_line]]
-      else:
-        xyz_lines = [x.lstrip() for x in lines[(start_line + 2):end_line]]
-
       res.append(
-          {
-            "num_atoms": num_atoms,
-            "description": description,
-            "xyz_lines": xyz_lines,
-            "start_line": start_line,
-            "idx": idx,
-            "source": Path(input_path).name,
-            }
+          convert_xyz_block_lines_to_dict(
+                                lines=lines[start_line:end_line],
+                                start_line=start_line,
+                                idx=idx,
+                                source=Path(input_path).name,
+                                convert_coords_to_float=convert_coords_to_float
+                              )
         )
 
       start_line = end_line
@@ -120,6 +338,161 @@ def read_xyz_file(
   return res
 
 
+def get_xyz_arrays_cache_paths(input_path: Union[str, Path]) -> Dict[str, Path]:
+  return {
+    k: ut.get_sidecar_file_path(file_path=input_path, sidecar_suffix=x) \
+      for k, x in xyz_arrays_cache_file_suffixes.items()
+  }
+
+
+def read_xyz_arrays_cache(input_path: Union[str, Path]) -> Union[Dict, None]:
+  '''
+    Returns result of read_xyz_file_as_flat_arrays() from the binary cache written by write_xyz_arrays_cache(),
+    arrays are memory-mapped. Returns None if cache doesn't exist or input_path has changed since.
+  '''
+  meta = ut.read_sidecar_file(
+                              file_path=input_path,
+                              sidecar_suffix=xyz_arrays_cache_file_suffixes["meta"],
+                              version=xyz_arrays_cache_version
+                            )
+  if meta == None:
+    return None
+
+  cache_paths = get_xyz_arrays_cache_paths(input_path)
+  try:
+    coords = np.load(cache_paths["coords"], mmap_mode="r")
+    atomic_nrs = np.load(cache_paths["atomic_nrs"], mmap_mode="r")
+  except (OSError, ValueError):
+    return None
+
+  if len(coords) != sum(meta["frame_num_atoms"]) or len(atomic_nrs) != len(coords):
+    return None
+
+  return {
+    "coords": coords,
+    "atomic_nrs": atomic_nrs,
+    "frame_num_atoms": meta["frame_num_atoms"],
+    "descriptions": meta["descriptions"],
+    "start_lines": meta["start_lines"],
+    "source": Path(input_path).name,
+  }
+
+
+def read_xyz_file_as_arrays(
+                            input_path: Union[str, Path],
+                            use_cache: bool=True,
+                            min_cache_file_size: int=xyz_arrays_cache_min_file_size
+                          ) -> Dict:
+  '''
+    Numeric version of read_xyz_file(): atom lines of all xyz blocks are converted in bulk with numpy,
+    without intermediate dictionaries and tuples per atom.
+    Xyz blocks are found the same way as in read_xyz_file().
+
+    Returns Dictionary {
+      "coords": np.ndarray (num_frames, num_atoms, 3)
+      "atomic_nrs": np.ndarray (num_atoms,)
+      "descriptions": List[str], 2nd line of each xyz block
+      "start_lines": List[int], line nr of each xyz block
+      "stacked": True
+      "source": file name
+    }
+
+    If xyz blocks have different atoms (number or elements),
+    then "coords" and "atomic_nrs" are lists of arrays, one per xyz block, and "stacked" is False.
+
+    use_cache: files of at least min_cache_file_size bytes are parsed only once: arrays are saved
+      next to the file as .npy (see xyz_arrays_cache_file_suffixes) and memory-mapped on later reads.
+      Cache is rebuilt if the file has changed (size, modification time). Arrays from cache are read-only.
+  '''
+
+  use_cache = use_cache and Path(input_path).stat().st_size >= min_cache_file_size
+  xyz_data = read_xyz_arrays_cache(input_path=input_path) if use_cache else None
+
+  if xyz_data == None:
+    xyz_data = read_xyz_file_as_flat_arrays(input_path=input_path)
+    if use_cache:
+      write_xyz_arrays_cache(input_path=input_path, xyz_data=xyz_data)
+
+  all_atomic_nrs = xyz_data["atomic_nrs"]
+  all_coords = xyz_data["coords"]
+  frame_num_atoms = xyz_data["frame_num_atoms"]
+
+  num_frames = len(frame_num_atoms)
+  num_atoms = frame_num_atoms[0] if num_frames > 0 else 0
+  stacked = all(x == num_atoms for x in frame_num_atoms)
+  if stacked and num_frames > 0:
+    frame_atomic_nrs = all_atomic_nrs.reshape(num_frames, num_atoms)
+    stacked = bool((frame_atomic_nrs == frame_atomic_nrs[0]).all())
+
+  if stacked:
+    coords = all_coords.reshape(num_frames, num_atoms, 3)
+    atomic_nrs = all_atomic_nrs[:num_atoms]
+  else:
+    split_idxs = np.cumsum(frame_num_atoms)[:-1]
+    coords = np.split(all_coords, split_idxs)
+    atomic_nrs = np.split(all_atomic_nrs, split_idxs)
+
+  return {
+    "coords": coords,
+    "atomic_nrs": atomic_nrs,
+    "descriptions": xyz_data["descriptions"],
+    "start_lines": xyz_data["start_lines"],
+    "stacked": stacked,
+    "source": xyz_data["source"],
+  }
+
+
+def read_xyz_file_as_flat_arrays(input_path: Union[str, Path]) -> Dict:
+  '''
+    Parses xyz file, atoms of all xyz blocks in one array, see read_xyz_file_as_arrays().
+    Returns Dictionary {
+      "coords": np.ndarray (total num atoms, 3)
+      "atomic_nrs": np.ndarray (total num atoms,)
+      "frame_num_atoms": List[int], number of atoms in each xyz block
+      "descriptions", "start_lines", "source": see read_xyz_file_as_arrays()
+    }
+  '''
+
+  lines = ut.read_text_file_as_lines(file_path=input_path)
+  num_lines = len(lines)
+  descriptions = []
+  start_lines = []
+  atom_line_bounds = []
+  start_line = 0
+  while start_line < num_lines:
+    first_line = lines[start_line].strip()
+    # first line must be numeric: number of atoms
+    if first_line.isdigit():
+      num_atoms = int(first_line)
+      end_line = start_line + num_atoms + 2
+      descriptions.append(lines[start_line + 1].strip() if start_line + 1 < num_lines else "")
+      start_lines.append(start_line)
+      atom_line_bounds.append((start_line + 2, end_line))
+      start_line = end_line
+    else: # empty or non-numeric line
+      start_line += 1
+
+  if len(atom_line_bounds) > 0 and atom_line_bounds[-1][1] > num_lines:
+    # last xyz block is truncated
+    start, _ = atom_line_bounds[-1]
+    atom_line_bounds[-1] = (min(start, num_lines), num_lines)
+
+  frame_num_atoms = [end - start for start, end in atom_line_bounds]
+  atom_lines = list(chain.from_iterable(lines[start:end] for start, end in atom_line_bounds))
+
+  # all atom lines at once
+  atom_arrays = convert_xyz_lines_to_arrays(atom_lines)
+
+  return {
+    "coords": atom_arrays["coords"],
+    "atomic_nrs": atom_arrays["atomic_nrs"],
+    "frame_num_atoms": frame_num_atoms,
+    "descriptions": descriptions,
+    "start_lines": start_lines,
+    "source": Path(input_path).name,
+  }
+
+
 def read_xyz_many_files(
                   list_of_input_path_and_idx_tuples: List[Tuple[Union[str, Path], Union[int, List[int]]]],
                   convert_coords_to_float: bool=False,
@@ -133,21 +506,20 @@ def read_xyz_many_files(
   ''' 
   res = []
   for p, idx in list_of_input_path_and_idx_tuples:
+    is_idx_specified = isinstance(idx, int) or isinstance(idx, list) or isinstance(idx, tuple)
+
+    if is_idx_specified and not ut.is_compressed_file(p):
+      # only the selected xyz blocks are decoded
+      with XyzIndex(file_path=p, convert_coords_to_float=convert_coords_to_float) as xyz_index:
+        res.extend(xyz_index[i] for i in get_selected_xyz_idxs(idx, len(xyz_index)))
+      continue
+
     xyz_file_data = read_xyz_file(
                       input_path=p,
                       convert_coords_to_float=convert_coords_to_float
                       )
 
-    num_xyz_blocks = len(xyz_file_data)
-
-    if isinstance(idx, int) and abs(idx) < num_xyz_blocks:
-      res.append(xyz_file_data[idx])
-    elif isinstance(idx, list) or isinstance(idx, tuple):
-      for i in idx:
-        if isinstance(i, int) and abs(i) < num_xyz_blocks:
-          res.append(xyz_file_data[i])
-    else:
-      res.extend(xyz_file_data)
+    res.extend(xyz_file_data[i] for i in get_selected_xyz_idxs(idx, len(xyz_file_data)))
 
   return res
 
@@ -174,6 +546,79 @@ def split_xyz_lines_elements_coords_from_tuple(xyz_lines: List[Tuple[str, List[f
         }
 
 
+def write_xyz_arrays_cache(input_path: Union[str, Path], xyz_data: Dict) -> bool:
+  '''
+    Writes result of read_xyz_file_as_flat_arrays() as binary cache next to input_path.
+    Returns False if cache could not be written, e.g. read-only directory.
+  '''
+  cache_paths = get_xyz_arrays_cache_paths(input_path)
+  try:
+    for k in ["coords", "atomic_nrs"]:
+      # write to temporary file first, interrupted write must not leave a broken cache file
+      tmp_path = cache_paths[k].with_name(f"{cache_paths[k].name}.tmp")
+      with open(tmp_path, "wb") as f:
+        np.save(f, np.ascontiguousarray(xyz_data[k]))
+      os.replace(tmp_path, cache_paths[k])
+  except OSError:
+    return False
+
+  # meta last: it validates the cache
+  meta_path = ut.write_sidecar_file(
+                              file_path=input_path,
+                              sidecar_suffix=xyz_arrays_cache_file_suffixes["meta"],
+                              version=xyz_arrays_cache_version,
+                              data={
+                                "frame_num_atoms": xyz_data["frame_num_atoms"],
+                                "descriptions": xyz_data["descriptions"],
+                                "start_lines": xyz_data["start_lines"],
+                              }
+                            )
+
+  return meta_path != None
+
+
+def write_xyz_arrays(
+                      output_path: Union[str, Path],
+                      symbols: List[List[str]],
+                      coords: Union[np.ndarray, List[np.ndarray]],
+                      descriptions: List[str],
+                      chunk_size: int=2**22
+                    ) -> str:
+  '''
+    Bulk xyz writer, e.g. for au.write_ase_atoms_to_xyz_file(use_bulk_writer=True):
+    each xyz block is formatted with one string formatting operation
+    (see xyz_atom_line_format) and text is written in chunks of about chunk_size characters.
+    symbols: elements of each xyz block.
+    coords: (num_frames, num_atoms, 3) array or list of (num_atoms, 3) arrays.
+    Returns output_path.
+  '''
+
+  block_formats = {}
+  with ut.open_text_file(output_path, "w") as f:
+    chunk = []
+    chunk_len = 0
+    for frame_symbols, frame_coords, description in zip(symbols, coords, descriptions):
+      num_atoms = len(frame_symbols)
+      if num_atoms not in block_formats:
+        block_formats[num_atoms] = "\n".join([xyz_atom_line_format] * num_atoms)
+
+      values = np.empty((num_atoms, 4), dtype=object)
+      values[:, 0] = frame_symbols
+      values[:, 1:] = frame_coords
+      text = f"{num_atoms}\n{description}\n{block_formats[num_atoms] % tuple(values.ravel())}\n"
+
+      chunk.append(text)
+      chunk_len += len(text)
+      if chunk_len >= chunk_size:
+        f.write("".join(chunk))
+        chunk = []
+        chunk_len = 0
+
+    f.write("".join(chunk))
+
+  return str(output_path)
+
+
 def write_xyz_file_from_list_of_dicts(
                               output_path: Union[str, Path],
                               xyz_as_list_of_dicts: List[Dict]
@@ -197,6 +642,7 @@ def write_xyz_file_from_list_of_dicts(
 def write_xyz_files_into_one(
       list_of_input_path_and_idx_tuples: List[Tuple[Union[str, Path], Union[int, List[int]]]],
       output_path: Union[str, Path],
+      copy_bytes: bool=False,
     ) -> str:
   '''
     Reads input xyz files and aggregates them into one xyz file.
@@ -206,15 +652,196 @@ def write_xyz_files_into_one(
     Writes the resulting data into one xyz file specified by output_path.
     Returns full path of the output file, if successful.
     Otherwise returns error message as string.
+
+    copy_bytes: if True, then selected xyz blocks are copied byte by byte as they are
+      in the input files, located by XyzIndex, i.e. lines are not decoded (much faster).
+      Compressed input files are parsed, compressed output file is written from parsed blocks.
+      If False, then blocks are parsed and written with normalized whitespace,
+      see write_xyz_file_from_list_of_dicts().
+      default = False
   ''' 
 
-  xyz_data = read_xyz_many_files(
-    list_of_input_path_and_idx_tuples=list_of_input_path_and_idx_tuples,
-    convert_coords_to_float=False
-    )
+  if not copy_bytes or ut.is_compressed_file(output_path):
+    xyz_data = read_xyz_many_files(
+      list_of_input_path_and_idx_tuples=list_of_input_path_and_idx_tuples,
+      convert_coords_to_float=False
+      )
+
+    return write_xyz_file_from_list_of_dicts(
+            output_path=output_path,
+            xyz_as_list_of_dicts=xyz_data
+            )
+
+  with open(output_path, "wb") as f:
+    for p, idx in list_of_input_path_and_idx_tuples:
+      if ut.is_compressed_file(p):
+        xyz_data = read_xyz_many_files(list_of_input_path_and_idx_tuples=[(p, idx)])
+        f.write(convert_xyz_dicts_to_text(xyz_data).encode())
+        continue
+
+      with XyzIndex(file_path=p) as xyz_index:
+        byte_ranges = []
+        for i in get_selected_xyz_idxs(idx, len(xyz_index)):
+          offset, length = xyz_index.get_frame_byte_range(i)
+          if len(byte_ranges) > 0 and sum(byte_ranges[-1]) == offset:
+            # adjacent xyz blocks are copied as one range
+            byte_ranges[-1] = (byte_ranges[-1][0], byte_ranges[-1][1] + length)
+          else:
+            byte_ranges.append((offset, length))
+
+        # last line of the input file without newline: added after the last xyz block
+        file_size = xyz_index.file_size
+        is_newline_missing = file_size > 0 and xyz_index.get_mapped_file()[(file_size - 1):] != b"\n"
+        ranges_to_copy = []
+        for offset, length in byte_ranges:
+          ranges_to_copy.append((offset, length))
+          if is_newline_missing and offset + length == file_size:
+            ut.copy_file_byte_ranges(source_path=p, target_file=f, byte_ranges=ranges_to_copy)
+            f.write(b"\n")
+            ranges_to_copy = []
+
+        ut.copy_file_byte_ranges(source_path=p, target_file=f, byte_ranges=ranges_to_copy)
+
+  return str(output_path)
+
+
+@dataclass
+class XyzIndex():
+  '''
+    Byte offsets of xyz blocks in memory-mapped xyz file: only the selected blocks
+    are decoded, e.g. index[5], index[::10], index.get_items([0, 50, -1]).
+    Items are the same dictionaries as in read_xyz_file().
+
+    Use as context manager, or call close(), to release the memory map.
+    Compressed files are not supported.
+
+    use_sidecar: if True, then index is saved next to the xyz file (xyz_index_file_suffix)
+      and loaded from there next time. Sidecar is rebuilt if the xyz file has changed.
+  '''
+  file_path: Path
+  use_sidecar: bool = False
+  convert_coords_to_float: bool = False
+  file_size: int = field(init=False)
+  offsets: List[int] = field(init=False, repr=False)
+  lengths: List[int] = field(init=False, repr=False)
+  start_lines: List[int] = field(init=False, repr=False)
+  mapped_file: mmap.mmap = field(init=False, repr=False, default=None)
+
+
+  def __post_init__(self):
+    self.file_path = Path(self.file_path)
+    if ut.is_compressed_file(self.file_path):
+      raise ValueError(f"Compressed file can't be memory-mapped: {self.file_path.name}, use read_xyz_file() instead.")
+
+    data = ut.read_sidecar_file(
+                                file_path=self.file_path,
+                                sidecar_suffix=xyz_index_file_suffix,
+                                version=xyz_index_version
+                              ) if self.use_sidecar else None
+
+    if data != None and any(not isinstance(data.get(k, None), list) for k in xyz_index_keys):
+      data = None
+
+    if data == None:
+      self.file_size = self.file_path.stat().st_size
+      data = index_xyz_frames(mapped_file=self.get_mapped_file()) \
+              if self.file_size > 0 \
+              else {"offsets": [], "lengths": [], "start_lines": []}
+
+      if self.use_sidecar:
+        ut.write_sidecar_file(
+                              file_path=self.file_path,
+                              sidecar_suffix=xyz_index_file_suffix,
+                              version=xyz_index_version,
+                              data=data
+                            )
+    else:
+      self.file_size = data["signature"]["size"]
+
+    self.offsets = data["offsets"]
+    self.lengths = data["lengths"]
+    self.start_lines = data["start_lines"]
+
+
+  def __enter__(self):
+    return self
+
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+
+  def __getitem__(self, i: Union[int, slice]) -> Union[Dict, List[Dict]]:
+    if isinstance(i, slice):
+      return self.get_items(range(len(self))[i])
+
+    return self.get_item(i)
+
+
+  def __len__(self) -> int:
+    return len(self.offsets)
+
+
+  def close(self):
+    if self.mapped_file != None:
+      self.mapped_file.close()
+      self.mapped_file = None
+
+
+  def get_item(self, idx: int) -> Dict:
+    '''
+      Decodes xyz block idx, negative idx counts from the end.
+    '''
+    idx = range(len(self))[idx]
+
+    return convert_xyz_block_lines_to_dict(
+                                lines=self.read_lines(idx),
+                                start_line=self.start_lines[idx],
+                                idx=idx,
+                                source=self.file_path.name,
+                                convert_coords_to_float=self.convert_coords_to_float
+                              )
+
+
+  def get_frame_byte_range(self, idx: int) -> Tuple[int, int]:
+    '''
+      Returns (offset, length) of xyz block idx in bytes: number of atoms line,
+      description and atom lines only, without following non-xyz lines.
+    '''
+    idx = range(len(self))[idx]
+    offset = self.offsets[idx]
+    end = offset + self.lengths[idx]
+    mapped_file = self.get_mapped_file()
+
+    block = mapped_file[offset:end]
+    num_lines = int(block.split(b"\n", 1)[0].strip()) + 2
+    if block.count(b"\n") <= num_lines:
+      # usual case: xyz blocks follow each other directly, or truncated last block
+      return offset, end - offset
+
+    line_end = 0
+    for _ in range(num_lines):
+      line_end = block.find(b"\n", line_end) + 1
+
+    return offset, line_end
+
+
+  def get_items(self, idxs: List[int]) -> List[Dict]:
+    return [self.get_item(i) for i in idxs]
+
+
+  def get_mapped_file(self) -> mmap.mmap:
+    if self.mapped_file == None:
+      with open(self.file_path, "rb") as f:
+        self.mapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    return self.mapped_file
 
-  return write_xyz_file_from_list_of_dicts(
-          output_path=output_path,
-          xyz_as_list_of_dicts=xyz_data
-          )
 
+  def read_lines(self, idx: int) -> List[str]:
+    '''
+      Lines of xyz block idx, as in ut.read_text_file_as_lines().
+    '''
+    offset = self.offsets[idx]
+    text = self.get_mapped_file()[offset:(offset + self.lengths[idx])].decode()
+    return io.StringIO(text, newline=None).readlines()